@@ -0,0 +1,107 @@
+"""Runs the benchmarks and compares their results with a baseline.
+
+Every ``bench_*`` module of this package defines ``run()``, which returns
+seconds keyed by measurement names. The runner collects them, prints them
+and optionally saves them in a JSON file. Given a baseline saved by an
+earlier run, it also prints the ratio of each measurement to the baseline
+and exits with status 1 if any of them is slower by more than the
+threshold. Run from the repository root::
+
+    python -m benchmarks -o baseline.json
+    python -m benchmarks -k trainer_loop -k reporter --compare baseline.json
+
+"""
+import argparse
+import importlib
+import json
+import os
+import pkgutil
+import platform
+import sys
+import time
+
+import torch
+
+import benchmarks
+from benchmarks.common import print_results
+from karas.version import __version__
+
+
+def find_modules(patterns=None):
+    """Returns the names of the benchmark modules matching any pattern."""
+    names = sorted(name for _, name, _ in pkgutil.iter_modules(benchmarks.__path__) if name.startswith('bench_'))
+    if patterns:
+        names = [name for name in names if any(pattern in name for pattern in patterns)]
+    return names
+
+
+def run_modules(names):
+    results = {}
+    for name in names:
+        print('running {}'.format(name), file=sys.stderr)
+        module = importlib.import_module('benchmarks.' + name)
+        results.update(module.run())
+    return results
+
+
+def environment():
+    return {'karas': __version__,
+            'torch': torch.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'num_threads': torch.get_num_threads(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def compare(results, baseline, threshold):
+    """Prints the ratios to the baseline and returns the regressed names."""
+    regressions = []
+    width = max(len(name) for name in results)
+    for name, seconds in sorted(results.items()):
+        if name not in baseline:
+            print('{:{}}  {:12.3f} us  (new)'.format(name, width, seconds * 1e6))
+            continue
+        ratio = seconds / baseline[name]
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print('{:{}}  {:12.3f} us  x{:.2f}{}'.format(name, width, seconds * 1e6, ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.split('\n')[0])
+    parser.add_argument('-k', dest='patterns', action='append',
+                        help='only run the modules whose names contain the pattern; may be repeated')
+    parser.add_argument('-o', '--output', help='JSON file to save the results to')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON file of the results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression (default: 0.1)')
+    args = parser.parse_args(argv)
+
+    names = find_modules(args.patterns)
+    if not names:
+        parser.error('no benchmark module matches the patterns')
+    results = run_modules(names)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=4, sort_keys=True)
+
+    if args.compare is None:
+        print_results(results)
+        return 0
+
+    with open(args.compare) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print('{} regressions over {:.0%}'.format(len(regressions), args.threshold))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
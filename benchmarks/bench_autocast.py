@@ -0,0 +1,64 @@
+"""Compares the training throughput of the example ``Net`` in float32 and in
+the bfloat16 autocast mode of :class:`StandardUpdater` on CPU.
+
+The data are random MNIST-shaped batches, so only the update is measured.
+bfloat16 is only faster on CPUs with native bfloat16 instructions (e.g.
+AVX512-BF16 or AMX). Run from the repository root::
+
+    python -m benchmarks.bench_autocast
+
+"""
+import timeit
+
+import torch
+import torch.nn as nn
+
+from examples.net import Net
+from karas.reporter import Reporter
+from karas.training.updaters import StandardUpdater
+
+BATCH_SIZE = 64
+NUM_UPDATES = 20
+
+CONFIGS = {
+    'float32': {},
+    'float32_channels_last': {'channels_last': True},
+    'bfloat16': {'autocast': True},
+    'bfloat16_channels_last': {'autocast': True, 'channels_last': True},
+}
+
+
+def make_updater(options):
+    torch.manual_seed(0)
+    net = Net()
+    optimizer = torch.optim.SGD(net.parameters(), lr=0.01, momentum=0.5)
+    updater = StandardUpdater(net, nn.NLLLoss(), device='cpu', optimizers={'net': optimizer}, **options)
+    updater.reporter = Reporter()
+    return updater
+
+
+def samples_per_second(options, repeat=3):
+    updater = make_updater(options)
+    batch = (torch.randn(BATCH_SIZE, 1, 28, 28), torch.randint(0, 10, (BATCH_SIZE,)))
+    for _ in range(3):  # warm up oneDNN kernels
+        updater.update(batch)
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        for _ in range(NUM_UPDATES):
+            updater.update(batch)
+        best = min(best, timeit.default_timer() - start)
+    return NUM_UPDATES * BATCH_SIZE / best
+
+
+def run():
+    """Returns the time per sample of each configuration in seconds."""
+    return {'autocast/%s' % name: 1.0 / samples_per_second(options) for name, options in CONFIGS.items()}
+
+
+if __name__ == '__main__':
+    results = run()
+    baseline = results['autocast/float32']
+    for name, seconds in sorted(results.items()):
+        print('{:36}  {:10.1f} samples/sec  x{:.2f}'.format(name, 1.0 / seconds, baseline / seconds))
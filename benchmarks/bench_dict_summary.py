@@ -0,0 +1,73 @@
+"""Compares DictSummary with the former per-key implementation.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_dict_summary
+
+"""
+import collections
+
+import numpy
+import six
+import torch
+
+from benchmarks.common import measure, print_results
+from karas.reporter import DictSummary
+
+KEY_COUNTS = (10, 100, 1000)
+
+
+class LegacySummary(object):
+
+    def __init__(self):
+        self._x = 0.0
+        self._x2 = 0.0
+        self._n = 0
+
+    def add(self, value, weight=1):
+        self._x += weight * value
+        self._x2 += weight * value * value
+        self._n += weight
+
+
+class LegacyDictSummary(object):
+    """The implementation of ``DictSummary`` before the vectorized one."""
+
+    def __init__(self):
+        self._summaries = collections.defaultdict(LegacySummary)
+
+    def add(self, d):
+        summaries = self._summaries
+        for k, v in six.iteritems(d):
+            w = 1
+            if isinstance(v, tuple):
+                w = v[1]
+                v = v[0]
+            if isinstance(v, torch.Tensor):
+                v = v.cpu().numpy()
+            if numpy.isscalar(v) or getattr(v, 'ndim', -1) == 0:
+                summaries[k].add(v, weight=w)
+
+
+def make_observation(num_keys):
+    observation = {}
+    for i in range(num_keys):
+        if i % 2:
+            observation['train/scalar/key%d' % i] = torch.rand(())
+        else:
+            observation['train/scalar/key%d' % i] = float(i)
+    return observation
+
+
+def run():
+    results = {}
+    for num_keys in KEY_COUNTS:
+        observation = make_observation(num_keys)
+        for name, cls in (('legacy', LegacyDictSummary), ('vectorized', DictSummary)):
+            summary = cls()
+            results['dict_summary.add/%s/%d' % (name, num_keys)] = measure(lambda: summary.add(observation))
+    return results
+
+
+if __name__ == '__main__':
+    print_results(run())
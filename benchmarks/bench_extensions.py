@@ -0,0 +1,104 @@
+"""Measures the cost of each built-in extension in the training loop.
+
+Each measurement runs a trainer whose updater only reports a few scalars,
+with one extension registered, and the time per iteration is compared with
+a trainer without extensions. The extensions are called on every iteration,
+except those writing files or evaluating a model, which are called every
+100 iterations as noted in their names. Output streams are discarded and
+files are written to a temporary directory. Run from the repository root::
+
+    python -m benchmarks.bench_extensions
+
+"""
+import contextlib
+import io
+import shutil
+import tempfile
+import timeit
+import warnings
+
+import torch
+from torch.optim import lr_scheduler
+from torch.utils.data import DataLoader, TensorDataset
+
+import karas.training.updater as updater_module
+from benchmarks.common import print_results
+from karas.training import extensions
+from karas.training.trainer import Trainer
+
+NUM_ITERATIONS = 500
+NUM_KEYS = 10
+
+
+class ReportingUpdater(updater_module.Updater):
+    """Updater reporting scalars without computing anything."""
+
+    def __init__(self, model, **kwargs):
+        super(ReportingUpdater, self).__init__(**kwargs)
+        self.model = model
+        self.values = {'loss': 1.0}
+        self.values.update(('key%d' % i, float(i)) for i in range(NUM_KEYS - 1))
+
+    def update(self, batch):
+        with self.reporter.scope('scalar'):
+            self.reporter.report(self.values)
+
+
+def make_extensions(out):
+    stream = io.StringIO()
+    return {
+        'log_report': lambda opt: [(extensions.LogReport(trigger=(1, 'iteration'), log_name=None), None)],
+        'log_report/stream': lambda opt: [(extensions.LogReport(trigger=(1, 'iteration'), stream=True), None)],
+        'print_report': lambda opt: [(extensions.LogReport(trigger=(1, 'iteration'), log_name=None), None),
+                                     (extensions.PrintReport(['epoch', 'iteration', 'loss'], out=stream), None)],
+        'progress_bar': lambda opt: [(extensions.ProgressBar(update_interval=1, out=stream), None)],
+        'dashboard': lambda opt: [(extensions.LogReport(trigger=(1, 'iteration'), log_name=None), None),
+                                  (extensions.Dashboard(['epoch', 'iteration', 'loss'], out=stream), None)],
+        'lr_observer': lambda opt: [(extensions.LrObserver(), None)],
+        'lr_scheduler': lambda opt: [(extensions.LrScheduler(lr_scheduler.StepLR(opt, step_size=10)), None)],
+        'tensorboard': lambda opt: [(extensions.TensorBoard(out=out + '/tb'), None)],
+        'tensorboard/async': lambda opt: [(extensions.TensorBoard(out=out + '/tb_async', async_write=True), None)],
+        'snapshot/100': lambda opt: [(extensions.Snapshot(format='state_dict'), (100, 'iteration'))],
+        'evaluator/100': lambda opt: [(extensions.Evaluator(), (100, 'iteration'))],
+    }
+
+
+def make_trainer(out, entries=None):
+    model = torch.nn.Linear(4, 2)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+    dataset = TensorDataset(torch.randn(64, 4), torch.randint(0, 2, (64,)))
+    loaders = {'train': list(range(NUM_ITERATIONS)), 'test': DataLoader(dataset, batch_size=64)}
+    updater = ReportingUpdater(model, device='cpu', optimizers={'model': optimizer})
+    trainer = Trainer(updater, (NUM_ITERATIONS, 'iteration'), loaders, out=out)
+    if entries is not None:
+        for extension, trigger in entries(optimizer):
+            trainer.extend(extension, trigger=trigger)
+    return trainer
+
+
+def time_per_iteration(out, entries=None, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        trainer = make_trainer(out, entries)
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            start = timeit.default_timer()
+            trainer.run()
+            elapsed = timeit.default_timer() - start
+        best = min(best, elapsed / trainer.iteration)
+    return best
+
+
+def run():
+    out = tempfile.mkdtemp()
+    try:
+        results = {'extension/none': time_per_iteration(out)}
+        for name, entries in make_extensions(out).items():
+            results['extension/%s' % name] = time_per_iteration(out, entries)
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    print_results(run())
@@ -0,0 +1,53 @@
+"""Measures the per-iteration cost of matching keys against observation tags.
+
+The built-in extensions and triggers used to call :func:`karas.compare_key`
+for every (key, tag) pair on every iteration. They now share the compiled
+:class:`karas.KeyMatcher`. Run from the repository root::
+
+    python -m benchmarks.bench_key_matching
+
+"""
+from benchmarks.common import measure, print_results
+from karas import KeyMatcher, compare_key
+
+NUM_TAGS = 200
+
+
+def make_observation(num_tags):
+    observation = {}
+    for i in range(num_tags):
+        mode = 'test' if i % 4 == 0 else 'train'
+        observation['%s/scalar/main/key%d' % (mode, i)] = float(i)
+    return observation
+
+
+def make_keys():
+    # keys of a LogReport, a TensorBoard, an EarlyStoppingTrigger and a
+    # BestValueTrigger, as in the example
+    log_keys = ['epoch', 'iteration', 'main/key1', 'test/main/key0', 'scalar/main/key2', 'elapsed_time']
+    return [log_keys, log_keys, ['test/main/key4'], ['main/key8']]
+
+
+def run():
+    observation = make_observation(NUM_TAGS)
+    keys = make_keys()
+    matchers = [KeyMatcher(k) for k in keys]
+
+    def legacy():
+        for ks in keys:
+            for tag in observation:
+                for key in ks:
+                    compare_key(key, tag)
+
+    def compiled():
+        for matcher in matchers:
+            matcher.select(observation)
+
+    return {
+        'key_matching/compare_key/%d' % NUM_TAGS: measure(legacy),
+        'key_matching/key_matcher/%d' % NUM_TAGS: measure(compiled),
+    }
+
+
+if __name__ == '__main__':
+    print_results(run())
@@ -0,0 +1,96 @@
+"""Measures the overhead of karas on top of a plain PyTorch training loop.
+
+A small multi-layer perceptron is trained on a synthetic in-memory dataset
+by a hand-written loop and by a trainer, without and with the usual
+logging extensions. The difference of the times per iteration is the cost
+of karas. Run from the repository root::
+
+    python -m benchmarks.bench_overhead
+
+"""
+import contextlib
+import io
+import shutil
+import tempfile
+import timeit
+
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, TensorDataset
+
+from benchmarks.common import print_results
+from karas.training import extensions
+from karas.training.trainer import Trainer
+from karas.training.updaters import StandardUpdater
+
+NUM_SAMPLES = 8192
+BATCH_SIZE = 64
+NUM_EPOCHS = 2
+
+
+def make_model():
+    torch.manual_seed(0)
+    return torch.nn.Sequential(torch.nn.Linear(32, 256), torch.nn.ReLU(), torch.nn.Linear(256, 10))
+
+
+def make_loader():
+    dataset = TensorDataset(torch.randn(NUM_SAMPLES, 32), torch.randint(0, 10, (NUM_SAMPLES,)))
+    return DataLoader(dataset, batch_size=BATCH_SIZE, shuffle=True)
+
+
+def plain_loop():
+    model = make_model()
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.01)
+    loader = make_loader()
+    iterations = 0
+    start = timeit.default_timer()
+    for _ in range(NUM_EPOCHS):
+        for input, target in loader:
+            loss = F.cross_entropy(model(input), target)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            iterations += 1
+    return (timeit.default_timer() - start) / iterations
+
+
+def karas_loop(out, with_extensions):
+    model = make_model()
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.01)
+    updater = StandardUpdater(model, F.cross_entropy, device='cpu', optimizers={'model': optimizer})
+    # the iteration counter repeats at epoch boundaries, so stop by iterations
+    length = NUM_EPOCHS * (NUM_SAMPLES // BATCH_SIZE)
+    trainer = Trainer(updater, (length, 'iteration'), {'train': make_loader()}, out=out)
+    if with_extensions:
+        trainer.extend(extensions.LogReport(trigger=(100, 'iteration'), stream=True))
+        trainer.extend(extensions.Dashboard(['epoch', 'iteration', 'loss'], out=io.StringIO()))
+        trainer.extend(extensions.LrObserver(), trigger=(100, 'iteration'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = timeit.default_timer()
+        trainer.run()
+        elapsed = timeit.default_timer() - start
+    return elapsed / trainer.iteration
+
+
+def best(func, *args, **kwargs):
+    return min(func(*args, **kwargs) for _ in range(3))
+
+
+def run():
+    out = tempfile.mkdtemp()
+    try:
+        return {
+            'overhead/plain_loop': best(plain_loop),
+            'overhead/trainer': best(karas_loop, out, False),
+            'overhead/trainer+extensions': best(karas_loop, out, True),
+        }
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    results = run()
+    print_results(results)
+    baseline = results['overhead/plain_loop']
+    for name in ('overhead/trainer', 'overhead/trainer+extensions'):
+        print('{}: {:+.1%} over the plain loop'.format(name, results[name] / baseline - 1))
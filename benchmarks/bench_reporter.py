@@ -0,0 +1,45 @@
+"""Measures the cost of reporting values through nested scopes.
+
+Each measurement reports a dictionary of scalar tensors under the scopes
+``train/scalar``, as an updater does on every iteration. The ``read``
+measurements also read the observation after every report, as extensions
+called on every iteration do, which flushes the deferred mode each time. Run from the repository root::
+
+    python -m benchmarks.bench_reporter
+
+"""
+import torch
+
+from benchmarks.common import measure, print_results
+from karas.reporter import Reporter
+
+KEY_COUNTS = (1, 10, 100)
+
+
+def make_values(num_keys):
+    return {'key%d' % i: torch.rand(()) for i in range(num_keys)}
+
+
+def run():
+    results = {}
+    for num_keys in KEY_COUNTS:
+        values = make_values(num_keys)
+        for name, deferred in (('immediate', False), ('deferred', True)):
+            reporter = Reporter(deferred=deferred)
+
+            def report():
+                with reporter.scope('train'), reporter.scope('scalar'):
+                    reporter.report(values)
+
+            def report_and_read():
+                report()
+                return reporter.observation
+
+            results['reporter.report/%s/%d' % (name, num_keys)] = measure(report)
+            reporter.reset()
+            results['reporter.report+read/%s/%d' % (name, num_keys)] = measure(report_and_read)
+    return results
+
+
+if __name__ == '__main__':
+    print_results(run())
@@ -0,0 +1,94 @@
+"""Measures the startup cost of a training job.
+
+Each measurement runs in a fresh interpreter. The import time is measured
+after ``torch`` is imported, so it is the cost of karas itself, and it is
+compared with importing every extension module, as the package did before
+its extensions were loaded lazily. The time to the first step is measured
+after the model and its optimizer are built. It covers importing karas,
+building a trainer with a training loader and a multi-worker test loader
+and running one iteration, and it is compared with starting every loader
+when the trainer is built. Run from the repository root::
+
+    python -m benchmarks.bench_startup
+
+"""
+import os
+import subprocess
+import sys
+
+from benchmarks.common import print_results
+
+REPEAT = 5
+
+_IMPORT = """
+import time
+import torch
+start = time.perf_counter()
+import karas.training.trainer
+import karas.training.extensions
+{extra}
+print(time.perf_counter() - start)
+"""
+
+_EAGER_EXTENSIONS = """
+for name in karas.training.extensions.__all__:
+    getattr(karas.training.extensions, name)
+"""
+
+_FIRST_STEP = """
+import contextlib
+import io
+import tempfile
+import time
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+if __name__ == '__main__':
+    dataset = TensorDataset(torch.randn(256, 8), torch.randint(0, 2, (256,)))
+    model = torch.nn.Linear(8, 2)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+
+    start = time.perf_counter()
+    from karas.training.extensions import LogReport
+    from karas.training.trainer import Trainer
+    from karas.training.updaters import StandardUpdater
+
+    loaders = {{'train': DataLoader(dataset, batch_size=32, shuffle=True),
+               'test': DataLoader(dataset, batch_size=32, num_workers=2)}}
+    updater = StandardUpdater(model, torch.nn.functional.cross_entropy, device='cpu',
+                              optimizers={{'model': optimizer}})
+    trainer = Trainer(updater, (1, 'iteration'), loaders, out=tempfile.mkdtemp())
+    trainer.extend(LogReport(log_name=None), trigger=(1, 'epoch'))
+    {extra}
+    with contextlib.redirect_stdout(io.StringIO()):
+        trainer.run()
+    print(time.perf_counter() - start)
+"""
+
+_EAGER_LOADERS = """
+    started = [iter(loader) for loader in loaders.values()]
+"""
+
+
+def _run_script(script, repeat=REPEAT):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+    best = float('inf')
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', script], env=env, cwd=root)
+        best = min(best, float(output.decode().split()[-1]))
+    return best
+
+
+def run():
+    return {
+        'startup/import/lazy': _run_script(_IMPORT.format(extra='')),
+        'startup/import/eager': _run_script(_IMPORT.format(extra=_EAGER_EXTENSIONS)),
+        'startup/first_step/lazy': _run_script(_FIRST_STEP.format(extra='')),
+        'startup/first_step/eager': _run_script(_FIRST_STEP.format(extra=_EAGER_LOADERS)),
+    }
+
+
+if __name__ == '__main__':
+    print_results(run())
@@ -0,0 +1,50 @@
+"""Compares the time to iterate an epoch of an in-memory dataset with a
+:class:`DataLoader` and with a :class:`TensorLoader`.
+
+The dataset has the shape of MNIST, 60000 samples of ``1 x 28 x 28``
+floats with integer labels, and is shuffled into batches of 64 samples,
+as in the example. The DataLoader reads a :class:`TensorDataset` in the
+main process and with two workers, whose startup is part of the epoch.
+Run from the repository root::
+
+    python -m benchmarks.bench_tensor_loader
+
+"""
+import torch
+from torch.utils.data import DataLoader
+from torch.utils.data import TensorDataset
+
+from benchmarks.common import measure
+from benchmarks.common import print_results
+from karas.datasets import TensorLoader
+from karas.iterators.iterator import Iterator
+
+NUM_SAMPLES = 60000
+BATCH_SIZE = 64
+
+
+def _epoch(loader):
+    iterator = Iterator(loader)
+    while iterator.has_next():
+        next(iterator)
+
+
+def run():
+    """Returns the time per batch of each loader in seconds."""
+    torch.manual_seed(0)
+    images = torch.randn(NUM_SAMPLES, 1, 28, 28)
+    labels = torch.randint(0, 10, (NUM_SAMPLES,))
+    dataset = TensorDataset(images, labels)
+    loaders = {
+        'dataloader': DataLoader(dataset, batch_size=BATCH_SIZE, shuffle=True),
+        'dataloader_2_workers': DataLoader(dataset, batch_size=BATCH_SIZE, shuffle=True, num_workers=2),
+        'tensor_loader': TensorLoader(images, labels, batch_size=BATCH_SIZE, shuffle=True),
+    }
+    results = {}
+    for name, loader in loaders.items():
+        results['tensor_loader/%s' % name] = measure(lambda: _epoch(loader), number=1, repeat=3) / len(loader)
+    return results
+
+
+if __name__ == '__main__':
+    print_results(run())
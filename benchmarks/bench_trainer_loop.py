@@ -0,0 +1,80 @@
+"""Measures the overhead of the training loop with registered extensions.
+
+The extensions do nothing and the updater does nothing, so the time per
+iteration is the cost of the loop and of deciding which extensions to call.
+Interval triggers are scheduled by the trainer, while the same triggers
+wrapped in plain functions are polled on every iteration. Run from the
+repository root::
+
+    python -m benchmarks.bench_trainer_loop
+
+"""
+import contextlib
+import io
+import timeit
+
+import karas.training.updater as updater_module
+from benchmarks.common import print_results
+from karas.profiler import Profiler
+from karas.training.extension import Extension
+from karas.training.trainer import Trainer
+from karas.training.triggers import IntervalTrigger
+
+EXTENSION_COUNTS = (5, 20, 100)
+NUM_BATCHES = 1000
+NUM_EPOCHS = 5
+
+
+class NullUpdater(updater_module.Updater):
+
+    def update(self, batch):
+        pass
+
+
+class NullExtension(Extension):
+
+    def __call__(self, trainer):
+        pass
+
+
+def _polled(trigger):
+    return lambda trainer: trigger(trainer)
+
+
+def make_trainer(num_extensions, polled, profiled=False):
+    updater = NullUpdater(device='cpu', optimizers={})
+    loaders = {'train': list(range(NUM_BATCHES))}
+    profiler = Profiler() if profiled else None
+    trainer = Trainer(updater, (NUM_EPOCHS, 'epoch'), loaders, profiler=profiler)
+    for i in range(num_extensions):
+        if i % 2:
+            trigger = IntervalTrigger(100 * (i + 1), 'iteration')
+        else:
+            trigger = IntervalTrigger(0.25 * (i + 1), 'epoch')
+        trainer.extend(NullExtension(), name='null_%d' % i, trigger=_polled(trigger) if polled else trigger)
+    return trainer
+
+
+def time_per_iteration(num_extensions, polled, profiled=False, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        trainer = make_trainer(num_extensions, polled, profiled)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = timeit.default_timer()
+            trainer.run()
+            elapsed = timeit.default_timer() - start
+        best = min(best, elapsed / trainer.iteration)
+    return best
+
+
+def run():
+    results = {'trainer_loop/no_extension': time_per_iteration(0, False)}
+    for num_extensions in EXTENSION_COUNTS:
+        results['trainer_loop/polled/%d' % num_extensions] = time_per_iteration(num_extensions, True)
+        results['trainer_loop/scheduled/%d' % num_extensions] = time_per_iteration(num_extensions, False)
+        results['trainer_loop/profiled/%d' % num_extensions] = time_per_iteration(num_extensions, False, True)
+    return results
+
+
+if __name__ == '__main__':
+    print_results(run())
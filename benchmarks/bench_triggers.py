@@ -0,0 +1,74 @@
+"""Measures the cost of one call of each built-in trigger.
+
+The triggers are called with a stand-in trainer whose counters advance by
+one iteration per call, so interval triggers only fire once per interval,
+and the observation holds the monitored key among other scalars. Run from
+the repository root::
+
+    python -m benchmarks.bench_triggers
+
+"""
+import contextlib
+import io
+
+from benchmarks.common import measure, print_results
+from karas.reporter import Reporter
+from karas.training.triggers import EarlyStoppingTrigger
+from karas.training.triggers import IntervalTrigger
+from karas.training.triggers import MaxValueTrigger
+from karas.training.triggers import MinValueTrigger
+
+KEY_COUNTS = (10, 100)
+ITERATIONS_PER_EPOCH = 100
+
+
+class FakeTrainer(object):
+    """Stand-in for a trainer, advancing one iteration per :meth:`step`."""
+
+    def __init__(self, num_keys):
+        self.reporter = Reporter()
+        with self.reporter.scope('train'), self.reporter.scope('scalar'):
+            self.reporter.report({'key%d' % i: float(i) for i in range(num_keys)})
+            self.reporter.report({'loss': 1.0})
+        self.observation = self.reporter.observation
+        self.iteration = 0
+        self.epoch = 0
+        self.epoch_detail = 0.
+        self.previous_epoch_detail = None
+
+    def step(self):
+        self.previous_epoch_detail = self.epoch_detail
+        self.iteration += 1
+        self.epoch_detail = self.iteration / ITERATIONS_PER_EPOCH
+        self.epoch = self.iteration // ITERATIONS_PER_EPOCH
+
+
+def make_triggers():
+    return {
+        'interval/iteration': lambda: IntervalTrigger(10, 'iteration'),
+        'interval/epoch': lambda: IntervalTrigger(1, 'epoch'),
+        'max_value': lambda: MaxValueTrigger('loss', trigger=(1, 'epoch')),
+        'min_value': lambda: MinValueTrigger('loss', trigger=(1, 'epoch')),
+        'early_stopping': lambda: EarlyStoppingTrigger(monitor='loss', verbose=False,
+                                                       max_trigger=(10 ** 9, 'iteration')),
+    }
+
+
+def run():
+    results = {}
+    for num_keys in KEY_COUNTS:
+        for name, make in make_triggers().items():
+            trainer = FakeTrainer(num_keys)
+            with contextlib.redirect_stdout(io.StringIO()):
+                trigger = make()
+
+            def call():
+                trainer.step()
+                trigger(trainer)
+
+            results['trigger/%s/%d' % (name, num_keys)] = measure(call)
+    return results
+
+
+if __name__ == '__main__':
+    print_results(run())
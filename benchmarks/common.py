@@ -0,0 +1,23 @@
+import timeit
+
+
+def measure(func, number=None, repeat=5):
+    """Returns the best wall time of one call of ``func`` in seconds.
+
+    Args:
+        func: Callable without arguments to measure.
+        number (int): Number of calls per measurement. If it is None, it is
+            chosen by :meth:`timeit.Timer.autorange`.
+        repeat (int): Number of measurements. The fastest one is used.
+
+    """
+    timer = timeit.Timer(func)
+    if number is None:
+        number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def print_results(results):
+    width = max(len(name) for name in results)
+    for name, seconds in sorted(results.items()):
+        print('{:{}}  {:12.3f} us'.format(name, width, seconds * 1e6))
@@ -1,5 +1,4 @@
 import torch
-from extension import Eval
 from net import Net
 from torch.optim import SGD, lr_scheduler
 from torch.utils.data import DataLoader
@@ -9,12 +8,13 @@ from updater import Updater
 
 import karas
 # from karas.dataloader import DataLoader
+from karas.datasets import CachedDataset
 from karas.training.extension import *
+from karas.training.extensions import Dashboard
+from karas.training.extensions import Evaluator
 from karas.training.extensions import LogReport
 from karas.training.extensions import LrObserver
 from karas.training.extensions import LrScheduler
-from karas.training.extensions import PrintReport
-from karas.training.extensions import ProgressBar
 from karas.training.extensions import Snapshot
 from karas.training.extensions import TensorBoard
 from karas.training.trainer import Trainer
@@ -24,17 +24,17 @@ from karas.training.triggers import MaxValueTrigger
 resume = False
 
 loaders = {}
-loaders['train'] = DataLoader(MNIST('../data', train=True, download=True,
-                                    transform=transforms.Compose([
-                                        transforms.ToTensor(),
-                                        # transforms.Normalize((0.1307,), (0.3081,))
-                                    ])), batch_size=16)
-
-loaders['test'] = DataLoader(MNIST('../data', train=False, download=True,
-                                   transform=transforms.Compose([
-                                       transforms.ToTensor(),
-                                       # transforms.Normalize((0.1307,), (0.3081,))
-                                   ])))
+loaders['train'] = DataLoader(CachedDataset(MNIST('../data', train=True, download=True,
+                                                  transform=transforms.Compose([
+                                                      transforms.ToTensor(),
+                                                      # transforms.Normalize((0.1307,), (0.3081,))
+                                                  ])), root='../data/cache'), batch_size=16)
+
+loaders['test'] = DataLoader(CachedDataset(MNIST('../data', train=False, download=True,
+                                                 transform=transforms.Compose([
+                                                     transforms.ToTensor(),
+                                                     # transforms.Normalize((0.1307,), (0.3081,))
+                                                 ])), root='../data/cache'))
 
 keys = ['epoch', 'iteration', 'loss', 'test/net/lr', 'test/accuracy', 'elapsed_time']
 
@@ -44,18 +44,17 @@ opt = SGD(net.parameters(), lr=0.01, momentum=0.5)
 
 stopper = EarlyStoppingTrigger(monitor='test/accuracy', patients=3, max_trigger=(10, 'epoch'))
 updater = Updater(model=net, optimizers={'net': opt}, device=device)
-trainer = Trainer(updater, stop_trigger=stopper, loaders=loaders)
+trainer = Trainer(updater, stop_trigger=stopper, loaders=loaders, deferred_report=True)
 
 # add extensions
 trainer.extend(Snapshot(filename='snapshot_iter_{.iteration}.pkl'), priority=PRIORITY_READER, trigger=(1, 'epoch'))
-trainer.extend(Snapshot(net, 'net_{.iteration}.pth'), priority=PRIORITY_READER, trigger=MaxValueTrigger(key='accuracy'))
-trainer.extend(Eval(), priority=PRIORITY_WRITER, trigger=(1, 'epoch'))
-trainer.extend(LogReport(keys), trigger=(100, 'iteration'))
-trainer.extend(TensorBoard(), trigger=(10, 'iteration'))
-trainer.extend(PrintReport(keys), trigger=(100, 'iteration'))
+trainer.extend(Snapshot(net, 'net_{.iteration}.pth'), priority=PRIORITY_READER, trigger=MaxValueTrigger(key='test/accuracy'))
+trainer.extend(Evaluator('test', mode='thread'), priority=PRIORITY_WRITER, trigger=(1, 'epoch'))
+trainer.extend(LogReport(keys, trigger=(100, 'iteration')))
+trainer.extend(TensorBoard(async_write=True, rate_limits={'images/input': 100}), trigger=(10, 'iteration'))
 trainer.extend(LrObserver(), trigger=(100, 'iteration'))
 trainer.extend(LrScheduler(lr_scheduler.StepLR(opt, step_size=2, gamma=0.5)), trigger=(1, 'epoch'))
-trainer.extend(ProgressBar(update_interval=10))
+trainer.extend(Dashboard(keys))
 
 if resume:
     trainer = karas.deserialize('output/snapshot_iter_1000.pkl')
@@ -25,7 +25,7 @@ class Updater(updater.Updater):
         self.optimizers['net'].step()
 
         with self.reporter.scope('scalar'):
-            self.reporter.report({'loss': loss.item()})
+            self.reporter.report({'loss': loss})
 
         with self.reporter.scope('images'):
             self.reporter.report({'input': input})
@@ -49,3 +49,54 @@ class KeyEntry(object):
 
 def compare_key(key, tag):
     return KeyEntry(key) == KeyEntry(tag)
+
+
+class KeyMatcher(object):
+    """Compiled set of key patterns matched against observation tags.
+
+    The patterns are parsed into :class:`KeyEntry` objects once, and the
+    patterns matching a tag are resolved the first time the tag is seen and
+    memoized. Matching an observation whose tags have all been seen before
+    costs one dictionary lookup per tag.
+
+    Args:
+        keys (iterable of strs): Key patterns in the format accepted by
+            :func:`compare_key`.
+
+    """
+
+    def __init__(self, keys):
+        self._keys = tuple(keys)
+        self._entries = [KeyEntry(key) for key in self._keys]
+        self._cache = {}
+
+    @property
+    def keys(self):
+        return self._keys
+
+    def match(self, tag):
+        """Returns the tuple of the patterns matching ``tag``."""
+        try:
+            return self._cache[tag]
+        except KeyError:
+            entry = KeyEntry(tag)
+            matched = tuple(key for key, pattern in zip(self._keys, self._entries) if pattern == entry)
+            self._cache[tag] = matched
+            return matched
+
+    def select(self, observation):
+        """Returns the ``(key, tag)`` pairs of matching items of ``observation``.
+
+        Args:
+            observation (dict): Dictionary of observed values keyed by tags.
+
+        """
+        cache = self._cache
+        pairs = []
+        for tag in observation:
+            matched = cache.get(tag)
+            if matched is None:
+                matched = self.match(tag)
+            for key in matched:
+                pairs.append((key, tag))
+        return pairs
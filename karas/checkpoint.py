@@ -0,0 +1,478 @@
+import io
+import json
+import lzma
+import os
+import pickle
+import struct
+import zlib
+from concurrent import futures
+
+import numpy
+import six
+import torch
+
+MAGIC = b'KARASIDX'
+VERSION = 1
+ALIGNMENT = 64
+
+MANIFEST = 'manifest.json'
+
+_PREAMBLE = struct.Struct('<8sIQ')  # magic, version, length of the header
+_CODECS = {'zlib': (zlib.compress, zlib.decompress),
+           'lzma': (lzma.compress, lzma.decompress)}
+
+
+def save(components, path, meta=None):
+    """Saves components in the indexed checkpoint format.
+
+    The file starts with a JSON header indexing the components and the
+    tensors, followed by the raw data of the tensors, each aligned to 64
+    bytes, and the pickles of the components, in which tensors are
+    replaced by references to the data. A component can thus be loaded
+    without reading the others, and its tensors can be memory-mapped. See
+    :class:`CheckpointReader`.
+
+    Args:
+        components (dict): Picklable objects keyed by names, such as
+            ``state_dict`` of modules and optimizers. Their tensors are
+            saved as contiguous CPU tensors.
+        path (str): Path of the file to write.
+        meta (dict): JSON-serializable values stored in the header, such
+            as the iteration, which are read without loading any component.
+
+    """
+    payloads, tensors, _ = _pickle_components(components)
+
+    offset = 0
+    tensor_index = []
+    arrays = []
+    for tensor in tensors:
+        array = _bytes_of(tensor)
+        tensor_index.append(_describe(tensor, offset=offset, nbytes=array.nbytes))
+        arrays.append(array)
+        offset = _align(offset + array.nbytes)
+
+    component_index = {}
+    for name, payload in six.iteritems(payloads):
+        component_index[name] = {'offset': offset, 'nbytes': len(payload)}
+        offset += len(payload)
+
+    header = json.dumps({'meta': meta or {}, 'components': component_index, 'tensors': tensor_index}).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        base = _align(_PREAMBLE.size + len(header))
+        f.write(b'\0' * (base - f.tell()))
+        for entry, array in zip(tensor_index, arrays):
+            f.write(b'\0' * (base + entry['offset'] - f.tell()))
+            f.write(memoryview(array))
+        for name, payload in six.iteritems(payloads):
+            f.write(b'\0' * (base + component_index[name]['offset'] - f.tell()))
+            f.write(payload)
+
+
+def load(path, name=None, mmap=True):
+    """Loads a component, or all of them, of an indexed checkpoint.
+
+    Args:
+        path (str): Path of the checkpoint.
+        name (str): Name of the component. If it is None, all the
+            components are loaded and nested by :func:`assemble`.
+        mmap (bool): Whether the tensors are memory-mapped from the file.
+
+    """
+    reader = CheckpointReader(path, mmap=mmap)
+    if name is None:
+        return assemble({name: reader.load(name) for name in reader.keys()})
+    return reader.load(name)
+
+
+class CheckpointReader(object):
+    """Reader of the checkpoints written by :func:`save`.
+
+    Only the header is read when the reader is created. Each component is
+    unpickled on demand, and its tensors are either read from the file or
+    memory-mapped, in which case their data are only read from the disk
+    when they are accessed. The mapping is copy-on-write, so modifying the
+    tensors does not modify the file.
+
+    Args:
+        path (str): Path of the checkpoint.
+        mmap (bool): Whether the tensors are memory-mapped from the file.
+
+    """
+
+    def __init__(self, path, mmap=True):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError('{} is not an indexed checkpoint'.format(path))
+            if version > VERSION:
+                raise ValueError('{} has an unsupported version {}'.format(path, version))
+            header = json.loads(f.read(length).decode('utf-8'))
+        self.meta = header['meta']
+        self._components = header['components']
+        self._tensors = header['tensors']
+        self._base = _align(_PREAMBLE.size + length)
+        self._map = numpy.memmap(path, dtype=numpy.uint8, mode='c') if mmap and self._tensors else None
+
+    def keys(self):
+        """Returns the names of the components."""
+        return list(self._components)
+
+    def __contains__(self, name):
+        return name in self._components
+
+    def load(self, name):
+        """Loads a component."""
+        if name not in self._components:
+            raise KeyError('no component named {} in {}'.format(name, self.path))
+        entry = self._components[name]
+        with open(self.path, 'rb') as f:
+            f.seek(self._base + entry['offset'])
+            payload = f.read(entry['nbytes'])
+            return _Unpickler(io.BytesIO(payload), self, f).load()
+
+    def _tensor(self, index, f):
+        entry = self._tensors[index]
+        start = self._base + entry['offset']
+        if self._map is not None:
+            data = torch.from_numpy(self._map[start:start + entry['nbytes']])
+        else:
+            data = torch.empty(entry['nbytes'], dtype=torch.uint8)
+            position = f.tell()
+            f.seek(start)
+            f.readinto(data.numpy())
+            f.seek(position)
+        return data.view(getattr(torch, entry['dtype'])).view(entry['shape'])
+
+
+def save_sharded(components, directory, meta=None, shard_size=256 * 2 ** 20, compression=None, max_workers=None):
+    """Saves components as shards written in parallel.
+
+    The tensors and the pickles of the components, laid out as by
+    :func:`save`, are packed in order into shards of about ``shard_size``
+    bytes, a larger tensor having a shard of its own. The shards are
+    compressed and written by a pool of threads, which release the GIL
+    while compressing and writing, so a large checkpoint is written at the
+    bandwidth of the disk. The manifest indexing the shards is written last
+    and atomically replaces the previous one, so the directory holds a
+    complete checkpoint as soon as it has a manifest. See
+    :class:`ShardedCheckpointReader`.
+
+    Args:
+        components (dict): Picklable objects keyed by names. See
+            :func:`save`.
+        directory (str): Directory of the shards and the manifest. It is
+            created if it does not exist.
+        meta (dict): JSON-serializable values stored in the manifest.
+        shard_size (int): Number of bytes above which a shard is closed.
+        compression (str): ``'zlib'`` or ``'lzma'`` to compress each shard,
+            or None to store them raw.
+        max_workers (int): Number of threads writing the shards.
+
+    """
+    if compression is not None and compression not in _CODECS:
+        raise ValueError('unknown compression: {}'.format(compression))
+    payloads, tensors, references = _pickle_components(components)
+
+    shards = []  # pieces of each shard, as pairs of an offset and an array
+    sizes = []
+
+    def place(array):
+        if not shards or (sizes[-1] > 0 and sizes[-1] + array.nbytes > shard_size):
+            shards.append([])
+            sizes.append(0)
+        offset = sizes[-1]
+        shards[-1].append((offset, array))
+        sizes[-1] = _align(offset + array.nbytes)
+        return {'shard': len(shards) - 1, 'offset': offset, 'nbytes': array.nbytes}
+
+    tensor_index = []
+    for tensor in tensors:
+        tensor_index.append(_describe(tensor, **place(_bytes_of(tensor))))
+    component_index = {}
+    for name, payload in six.iteritems(payloads):
+        component_index[name] = place(numpy.frombuffer(payload, dtype=numpy.uint8))
+        component_index[name]['tensors'] = references[name]
+
+    try:
+        os.makedirs(directory)
+    except OSError:
+        pass
+    manifest = os.path.join(directory, MANIFEST)
+    if os.path.exists(manifest):
+        # the shards are overwritten in place
+        os.remove(manifest)
+
+    files = ['shard_{:05d}.bin'.format(i) for i in six.moves.range(len(shards))]
+    with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        stored = list(executor.map(_write_shard, [os.path.join(directory, fn) for fn in files], shards,
+                                   [compression] * len(shards)))
+
+    shard_index = [{'file': fn, 'nbytes': nbytes, 'stored': size} for fn, nbytes, size in zip(files, sizes, stored)]
+    header = {'version': VERSION, 'meta': meta or {}, 'compression': compression, 'shards': shard_index,
+              'components': component_index, 'tensors': tensor_index}
+    with open(manifest + '.tmp', 'w') as f:
+        json.dump(header, f)
+    os.replace(manifest + '.tmp', manifest)
+
+
+def load_sharded(directory, name=None, max_workers=None):
+    """Loads a component, or all of them, of a sharded checkpoint.
+
+    Args:
+        directory (str): Directory of the checkpoint.
+        name (str): Name of the component. If it is None, all the
+            components are loaded and nested by :func:`assemble`.
+        max_workers (int): Number of threads reading the shards.
+
+    """
+    reader = ShardedCheckpointReader(directory, max_workers=max_workers)
+    if name is None:
+        return assemble(reader.load_all())
+    return reader.load(name)
+
+
+class ShardedCheckpointReader(object):
+    """Reader of the checkpoints written by :func:`save_sharded`.
+
+    Only the manifest is read when the reader is created. Loading
+    components reads and decompresses the shards holding them and their
+    tensors in parallel, and the tensors are copied out of the shards, so
+    that each of them owns its storage, as :func:`torch.set_rng_state`
+    expects. A tensor referred to several times is copied once.
+
+    Args:
+        directory (str): Directory of the checkpoint.
+        max_workers (int): Number of threads reading the shards.
+
+    """
+
+    def __init__(self, directory, max_workers=None):
+        self.directory = directory
+        manifest = os.path.join(directory, MANIFEST)
+        if not os.path.exists(manifest):
+            raise ValueError('{} has no manifest, it is not a complete sharded checkpoint'.format(directory))
+        with open(manifest) as f:
+            header = json.load(f)
+        if header['version'] > VERSION:
+            raise ValueError('{} has an unsupported version {}'.format(directory, header['version']))
+        self.meta = header['meta']
+        self._compression = header['compression']
+        self._shards = header['shards']
+        self._components = header['components']
+        self._tensors = header['tensors']
+        self._max_workers = max_workers
+
+    def keys(self):
+        """Returns the names of the components."""
+        return list(self._components)
+
+    def __contains__(self, name):
+        return name in self._components
+
+    def load(self, name):
+        """Loads a component."""
+        return self.load_all([name])[name]
+
+    def load_all(self, names=None):
+        """Loads components, reading their shards in parallel.
+
+        Args:
+            names (list of strs): Names of the components. If it is None,
+                all the components are loaded.
+
+        Returns:
+            dict: Components keyed by their names.
+
+        """
+        if names is None:
+            names = self.keys()
+        for name in names:
+            if name not in self._components:
+                raise KeyError('no component named {} in {}'.format(name, self.directory))
+
+        needed = set()
+        for name in names:
+            entry = self._components[name]
+            needed.add(entry['shard'])
+            needed.update(self._tensors[index]['shard'] for index in entry['tensors'])
+        needed = sorted(needed)
+        with futures.ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            buffers = dict(zip(needed, executor.map(self._read_shard, needed)))
+
+        components = {}
+        loaded = {}
+        for name in names:
+            payload = _slice(buffers, self._components[name]).numpy().tobytes()
+            components[name] = _Unpickler(io.BytesIO(payload), self, (buffers, loaded)).load()
+        return components
+
+    def _read_shard(self, index):
+        shard = self._shards[index]
+        with open(os.path.join(self.directory, shard['file']), 'rb') as f:
+            if self._compression is None:
+                buffer = torch.empty(shard['nbytes'], dtype=torch.uint8)
+                f.readinto(buffer.numpy())
+                return buffer
+            data = _CODECS[self._compression][1](f.read())
+        buffer = torch.empty(len(data), dtype=torch.uint8)
+        buffer.numpy()[:] = numpy.frombuffer(data, dtype=numpy.uint8)
+        return buffer
+
+    def _tensor(self, index, data):
+        buffers, loaded = data
+        tensor = loaded.get(index)
+        if tensor is None:
+            entry = self._tensors[index]
+            tensor = _slice(buffers, entry).view(getattr(torch, entry['dtype'])).view(entry['shape']).clone()
+            loaded[index] = tensor
+        return tensor
+
+
+def trainer_components(state):
+    """Splits the ``state_dict`` of a trainer into components.
+
+    Every model and optimizer of the updater and every extension is a
+    component of its own, named by its path in the state, e.g.
+    ``'updater/models/net'`` and ``'extensions/LogReport'``. Entries of the
+    state of the updater that are not dictionaries of named states, and the
+    other entries of the state, are components named by their paths, and an
+    empty group, such as the extensions of a trainer without any, is a
+    component holding an empty dictionary. A ``'/'`` in a key is escaped as
+    ``'%2F'``, and a ``'%'`` as ``'%25'``, so that :func:`assemble` restores
+    the keys.
+
+    """
+    components = {}
+    for key, value in six.iteritems(state):
+        if key == 'updater' and isinstance(value, dict) and value:
+            for kind, states in six.iteritems(value):
+                _split(components, states, 'updater', kind)
+        elif key == 'extensions':
+            _split(components, value, 'extensions')
+        else:
+            components[_join(key)] = value
+    return components
+
+
+def _split(components, states, *keys):
+    if isinstance(states, dict) and states:
+        for name, component in six.iteritems(states):
+            components[_join(*(keys + (name,)))] = component
+    else:
+        # kept whole, so that assemble restores even an empty group
+        components[_join(*keys)] = states
+
+
+def assemble(components):
+    """Nests the components named by paths, inverting :func:`trainer_components`."""
+    state = {}
+    for name, value in six.iteritems(components):
+        keys = [_unescape(key) for key in name.split('/')]
+        node = state
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+        node[keys[-1]] = value
+    return state
+
+
+def _join(*keys):
+    return '/'.join(key.replace('%', '%25').replace('/', '%2F') for key in keys)
+
+
+def _unescape(key):
+    return key.replace('%2F', '/').replace('%25', '%')
+
+
+def _pickle_components(components):
+    # returns the pickles, the tensors they refer to and, per component, the
+    # indices of its tensors
+    tensors = []
+    memo = {}
+    payloads = {}
+    references = {}
+    for name, value in six.iteritems(components):
+        buffer = io.BytesIO()
+        pickler = _Pickler(buffer, tensors, memo)
+        pickler.dump(value)
+        payloads[name] = buffer.getvalue()
+        references[name] = sorted(pickler.references)
+    return payloads, tensors, references
+
+
+def _bytes_of(tensor):
+    tensor = tensor.detach().cpu()
+    flat = tensor.reshape(-1)
+    if flat.stride(0) != 1:
+        # e.g. expanded or single-element tensors with odd strides
+        flat = torch.empty(flat.numel(), dtype=flat.dtype).copy_(flat)
+    return flat.view(torch.uint8).numpy()
+
+
+def _write_shard(path, pieces, compression):
+    # returns the number of bytes written
+    if compression is None:
+        with open(path, 'wb') as f:
+            for offset, array in pieces:
+                f.write(b'\0' * (offset - f.tell()))
+                f.write(memoryview(array))
+            return f.tell()
+
+    offset, array = pieces[-1]
+    data = bytearray(offset + array.nbytes)
+    for offset, array in pieces:
+        data[offset:offset + array.nbytes] = memoryview(array)
+    data = _CODECS[compression][0](data)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def _slice(buffers, entry):
+    offset = entry['offset']
+    return buffers[entry['shard']][offset:offset + entry['nbytes']]
+
+
+def _describe(tensor, **entry):
+    entry.update(dtype=str(tensor.dtype)[len('torch.'):], shape=list(tensor.shape))
+    return entry
+
+
+class _Pickler(pickle.Pickler):
+
+    def __init__(self, file, tensors, memo):
+        super(_Pickler, self).__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._tensors = tensors
+        self._tensor_memo = memo
+        self.references = set()
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, torch.Tensor):
+            return None
+        index = self._tensor_memo.get(id(obj))
+        if index is None:
+            index = self._tensor_memo[id(obj)] = len(self._tensors)
+            self._tensors.append(obj)  # also keeps the id valid
+        self.references.add(index)
+        return ('tensor', index)
+
+
+class _Unpickler(pickle.Unpickler):
+
+    def __init__(self, file, reader, data_file):
+        super(_Unpickler, self).__init__(file)
+        self._reader = reader
+        self._data_file = data_file
+
+    def persistent_load(self, pid):
+        kind, index = pid
+        if kind != 'tensor':
+            raise pickle.UnpicklingError('unknown persistent id {}'.format(kind))
+        return self._reader._tensor(index, self._data_file)
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
@@ -0,0 +1,4 @@
+from karas.datasets.cache import CachedDataset
+from karas.datasets.cache import CachedLoader
+from karas.datasets.cache import compute_fingerprint
+from karas.datasets.tensor_loader import TensorLoader
@@ -0,0 +1,390 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy
+import six
+import torch
+from torch.utils.data import DataLoader
+from torch.utils.data import Dataset
+
+_ADDRESS = re.compile(r' at 0x[0-9a-fA-F]+')
+
+
+def compute_fingerprint(obj, *extra):
+    """Returns a digest identifying a dataset or a loader with its transforms.
+
+    The digest covers the type, the representation and the length of the
+    object, with the memory addresses removed from the representation, the
+    raw contents of the first and the last samples of a dataset, and the
+    representations of the extra values. A :class:`DataLoader` is
+    identified by its dataset, its batch size, whether it drops the last
+    batch and the types of its sampler and its collate function. Datasets
+    whose representation does not reflect their transforms should be given
+    extra values describing them, or an explicit fingerprint.
+
+    Args:
+        obj: Dataset or loader.
+        extra: Values distinguishing the object further, such as a version.
+
+    Returns:
+        str: Hexadecimal digest.
+
+    """
+    digest = hashlib.sha1()
+    for part in _describe(obj) + [repr(value) for value in extra]:
+        digest.update(_ADDRESS.sub('', part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:20]
+
+
+def _describe(obj):
+    if isinstance(obj, DataLoader):
+        return _describe(obj.dataset) + [repr(obj.batch_size), repr(obj.drop_last), _qualname(obj.sampler),
+                                         _qualname(obj.collate_fn)]
+    parts = [_qualname(obj), repr(obj)]
+    if hasattr(obj, '__len__') and hasattr(obj, '__getitem__'):
+        parts.append(str(len(obj)))
+        for index in sorted({0, len(obj) - 1}):
+            if index >= 0:
+                _, fields = _flatten(obj[index])
+                parts.extend(_to_numpy(value).tobytes().hex() for value in fields)
+    return parts
+
+
+def _qualname(obj):
+    if not hasattr(obj, '__qualname__'):
+        obj = type(obj)
+    return '{}.{}'.format(obj.__module__, obj.__qualname__)
+
+
+class CachedDataset(Dataset):
+    """Dataset reading the transformed samples of another one from a cache.
+
+    The samples are stored in memory-mapped files under a directory named
+    after the fingerprint of the dataset, one file per field of the
+    samples. A sample is materialized the first time it is accessed, by the
+    process accessing it, and read back as views of the files afterwards,
+    so later epochs, the worker processes of a loader and later runs skip
+    the transforms. The samples must be tuples, lists, dictionaries or
+    single values of tensors, arrays or scalars of fixed shapes, and the
+    transforms must be deterministic. The tensors of the cached samples
+    share the memory of the files and must not be modified in place.
+
+    Args:
+        dataset: Map-style dataset to cache.
+        root (str): Directory of the caches.
+        fingerprint (str): Name of the cache. If it is None, it is computed
+            by :func:`compute_fingerprint`.
+
+    """
+
+    def __init__(self, dataset, root='.cache', fingerprint=None):
+        self.dataset = dataset
+        self.fingerprint = compute_fingerprint(dataset) if fingerprint is None else fingerprint
+        self.path = os.path.join(root, self.fingerprint)
+        if not os.path.exists(os.path.join(self.path, 'meta.json')):
+            structure, fields = _flatten(dataset[0])
+            _create(self.path, structure, [_field_spec(value, False) for value in fields], len(dataset),
+                    filled=True)
+        self._storage = None
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, index):
+        storage = self._open()
+        if index < 0:
+            index += len(self)
+        if storage.filled[index]:
+            return storage.read(index)
+
+        sample = self.dataset[index]
+        storage.write(index, sample)
+        storage.filled[index] = 1
+        return sample
+
+    @property
+    def complete(self):
+        """Whether all the samples are cached."""
+        return bool(self._open().filled.all())
+
+    def _open(self):
+        if self._storage is None:
+            self._storage = _Storage.open(self.path, 'r+')
+        return self._storage
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_storage'] = None
+        return state
+
+
+class CachedLoader(object):
+    """Loader replaying the collated batches of a deterministic loader.
+
+    On the first pass, the batches of the loader are yielded as usual and
+    stored in memory-mapped files, one file per field, under a directory
+    named after the fingerprint of the loader. The cache is published when
+    the pass completes. Later passes, including those of later runs, read
+    each batch as a view of the files without running the loader. The views
+    are mapped copy-on-write, so modifying a batch in place does not modify
+    the cache. It implements ``sample_batches`` and ``load_batches``, so
+    :class:`~karas.iterators.iterator.Iterator` resumes it and shards it
+    without loading the skipped batches.
+
+    The batches must be tensors, or tuples, lists or dictionaries of
+    tensors, and the same at every pass, i.e. the loader must neither
+    shuffle nor apply random transforms. The order of the cached batches
+    can be shuffled instead.
+
+    Args:
+        loader: Loader to cache. It must have a length.
+        root (str): Directory of the caches.
+        fingerprint (str): Name of the cache. If it is None, it is computed
+            by :func:`compute_fingerprint`.
+        shuffle (bool): Whether the order of the cached batches is shuffled
+            at every epoch, with the global random generator.
+
+    """
+
+    def __init__(self, loader, root='.cache', fingerprint=None, shuffle=False):
+        self.loader = loader
+        self.root = root
+        self.fingerprint = compute_fingerprint(loader) if fingerprint is None else fingerprint
+        self.path = os.path.join(root, self.fingerprint)
+        self.shuffle = shuffle
+        self._storage = None
+
+    @property
+    def complete(self):
+        """Whether the batches are cached."""
+        return self._storage is not None or os.path.exists(os.path.join(self.path, 'meta.json'))
+
+    def __len__(self):
+        if self.complete:
+            return len(self._open().sizes)
+        return len(self.loader)
+
+    def __iter__(self):
+        if not self.complete:
+            return self._record()
+        return self.load_batches(self.sample_batches())
+
+    def sample_batches(self):
+        """Returns the index batches of an epoch, caching the batches first if needed."""
+        if not self.complete:
+            for _ in self._record():
+                pass
+        offsets = self._open().offsets
+        order = six.moves.range(len(offsets) - 1)
+        if self.shuffle:
+            order = torch.randperm(len(offsets) - 1).tolist()
+        return [list(six.moves.range(offsets[i], offsets[i + 1])) for i in order]
+
+    def load_batches(self, batches):
+        """Returns an iterator over the cached batches of the given indices."""
+        storage = self._open()
+        for batch in batches:
+            if len(batch) > 0 and batch[-1] - batch[0] + 1 == len(batch):
+                yield storage.read(slice(batch[0], batch[-1] + 1))
+            else:
+                yield storage.read(numpy.asarray(batch, dtype=numpy.int64))
+
+    def _open(self):
+        if self._storage is None:
+            self._storage = _Storage.open(self.path, 'c')
+        return self._storage
+
+    def _record(self):
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        temp = tempfile.mkdtemp(prefix=self.fingerprint + '.', dir=self.root)
+        storage = None
+        sizes = []
+        try:
+            for batch in self.loader:
+                if storage is None:
+                    structure, fields = _flatten(batch)
+                    specs = [_field_spec(value, True) for value in fields]
+                    capacity = len(self.loader) * len(fields[0])
+                    storage = _Storage.create(temp, structure, specs, capacity)
+                size = len(_flatten(batch)[1][0])
+                length = sum(sizes)
+                if length + size > storage.capacity:
+                    storage.grow(max(2 * storage.capacity, length + size))
+                storage.write(slice(length, length + size), batch)
+                sizes.append(size)
+                yield batch
+
+            if storage is None:
+                raise ValueError('the loader has no batch to cache')
+            storage.finish(sum(sizes), sizes)
+            storage = None
+            _publish(temp, self.path)
+        finally:
+            if os.path.isdir(temp):
+                shutil.rmtree(temp)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_storage'] = None
+        return state
+
+
+class _Storage(object):
+    """Memory-mapped fields of the samples of a cache."""
+
+    def __init__(self, path, meta, mode):
+        self.path = path
+        self.meta = meta
+        self.structure = meta['structure']
+        self.specs = meta['fields']
+        self.capacity = meta['capacity']
+        self.sizes = meta.get('sizes')
+        self.offsets = None if self.sizes is None else numpy.concatenate(([0], numpy.cumsum(self.sizes))).tolist()
+        self._mode = mode
+        self.columns = [self._map(i, spec) for i, spec in enumerate(self.specs)]
+        self.filled = None
+        if meta.get('filled'):
+            self.filled = numpy.memmap(os.path.join(path, 'filled.bin'), dtype=numpy.uint8, mode=mode,
+                                       shape=(self.capacity,))
+
+    @classmethod
+    def create(cls, path, structure, specs, capacity, filled=False):
+        meta = {'structure': structure, 'fields': specs, 'capacity': capacity, 'filled': filled}
+        names = ['field_{}.bin'.format(i) for i in range(len(specs))] + (['filled.bin'] if filled else [])
+        row_bytes = [_row_bytes(spec) for spec in specs] + [1]
+        for name, nbytes in zip(names, row_bytes):
+            with open(os.path.join(path, name), 'wb') as f:
+                f.truncate(capacity * nbytes)
+        return cls(path, meta, 'r+')
+
+    @classmethod
+    def open(cls, path, mode):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        return cls(path, meta, mode)
+
+    def _map(self, index, spec):
+        return numpy.memmap(os.path.join(self.path, 'field_{}.bin'.format(index)), dtype=spec['dtype'],
+                            mode=self._mode, shape=(self.capacity,) + tuple(spec['shape']))
+
+    def read(self, index):
+        fields = [_from_numpy(spec, column[index]) for spec, column in zip(self.specs, self.columns)]
+        return _unflatten(self.structure, fields)
+
+    def write(self, index, value):
+        _, fields = _flatten(value)
+        for column, field in zip(self.columns, fields):
+            column[index] = _to_numpy(field)
+
+    def grow(self, capacity):
+        for column in self.columns:
+            column.flush()
+        for i, spec in enumerate(self.specs):
+            with open(os.path.join(self.path, 'field_{}.bin'.format(i)), 'r+b') as f:
+                f.truncate(capacity * _row_bytes(spec))
+        self.capacity = capacity
+        self.columns = [self._map(i, spec) for i, spec in enumerate(self.specs)]
+
+    def finish(self, length, sizes=None):
+        """Shrinks the files to the length and writes the metadata."""
+        if length != self.capacity:
+            self.grow(length)
+        for column in self.columns:
+            column.flush()
+        meta = dict(self.meta, capacity=length, sizes=sizes)
+        self.columns = []
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+
+def _create(path, structure, specs, length, filled):
+    root = os.path.dirname(path) or '.'
+    if not os.path.isdir(root):
+        os.makedirs(root)
+    temp = tempfile.mkdtemp(prefix=os.path.basename(path) + '.', dir=root)
+    try:
+        _Storage.create(temp, structure, specs, length, filled).finish(length)
+        _publish(temp, path)
+    finally:
+        if os.path.isdir(temp):
+            shutil.rmtree(temp)
+
+
+def _publish(temp, path):
+    try:
+        os.rename(temp, path)
+    except OSError:
+        # another process published the same cache first
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            raise
+
+
+def _flatten(value):
+    if isinstance(value, dict):
+        keys = list(value)
+        return ['dict', keys], [value[key] for key in keys]
+    if isinstance(value, tuple):
+        return ['tuple'], list(value)
+    if isinstance(value, list):
+        return ['list'], list(value)
+    return ['single'], [value]
+
+
+def _unflatten(structure, fields):
+    kind = structure[0]
+    if kind == 'dict':
+        return dict(zip(structure[1], fields))
+    if kind == 'tuple':
+        return tuple(fields)
+    if kind == 'list':
+        return list(fields)
+    return fields[0]
+
+
+def _field_spec(value, batched):
+    if isinstance(value, torch.Tensor):
+        kind = 'tensor'
+    elif isinstance(value, numpy.ndarray):
+        kind = 'ndarray'
+    elif isinstance(value, (bool, numpy.bool_)):
+        kind = 'bool'
+    elif isinstance(value, six.integer_types + (numpy.integer,)):
+        kind = 'int'
+    elif isinstance(value, (float, numpy.floating)):
+        kind = 'float'
+    else:
+        raise TypeError('values of type {} cannot be cached'.format(type(value).__name__))
+    if batched and kind not in ('tensor', 'ndarray'):
+        raise TypeError('the fields of a batch must be tensors or arrays')
+    array = _to_numpy(value)
+    shape = list(array.shape[1:] if batched else array.shape)
+    return {'kind': kind, 'dtype': array.dtype.str, 'shape': shape}
+
+
+def _to_numpy(value):
+    if isinstance(value, torch.Tensor):
+        return value.detach().cpu().numpy()
+    return numpy.asarray(value)
+
+
+def _from_numpy(spec, array):
+    kind = spec['kind']
+    if kind == 'tensor':
+        return torch.from_numpy(array)
+    if kind == 'ndarray':
+        return array
+    if kind == 'int':
+        return int(array)
+    if kind == 'float':
+        return float(array)
+    return bool(array)
+
+
+def _row_bytes(spec):
+    return numpy.dtype(spec['dtype']).itemsize * int(numpy.prod(spec['shape'], dtype=numpy.int64))
@@ -0,0 +1,94 @@
+import torch
+from torch.utils.data import DataLoader
+
+
+class TensorLoader(object):
+    """Loader slicing batches out of tensors held on a device.
+
+    The whole dataset is kept as contiguous tensors sharing their first
+    dimension, and a batch is taken from each tensor by one index selection,
+    or by a view when the loader does not shuffle. There is no per-sample
+    ``__getitem__``, no collation and no worker process, which is the
+    fastest way to iterate datasets that fit in the memory of the device.
+
+    Like a :class:`~torch.utils.data.DataLoader`, each batch is a list with
+    one tensor per given tensor, and the order of an epoch is drawn from the
+    global random generator unless a generator is given, so the trainer
+    reproduces it on resume. It implements ``sample_batches`` and
+    ``load_batches``, so :class:`~karas.iterators.iterator.Iterator` resumes
+    it within an epoch and shards it.
+
+    Args:
+        tensors (tensors): Tensors of the samples, indexed by their first
+            dimension.
+        batch_size (int): Number of samples of a batch.
+        shuffle (bool): Whether the samples are shuffled at every epoch.
+        drop_last (bool): Whether the last incomplete batch is dropped.
+        device: Device the tensors are moved to. If it is None, they stay on
+            their device.
+        generator (torch.Generator): CPU generator of the orders. If it is
+            None, the global random generator is used.
+
+    """
+
+    def __init__(self, *tensors, batch_size=1, shuffle=False, drop_last=False, device=None, generator=None):
+        if not tensors:
+            raise ValueError('at least one tensor is required')
+        size = tensors[0].shape[0]
+        if any(tensor.shape[0] != size for tensor in tensors):
+            raise ValueError('the tensors must have the same size in their first dimension')
+
+        if device is not None:
+            tensors = [tensor.to(device) for tensor in tensors]
+        self.tensors = [tensor.contiguous() for tensor in tensors]
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+
+    @classmethod
+    def from_dataset(cls, dataset, batch_size=1, shuffle=False, drop_last=False, device=None, generator=None):
+        """Builds a loader holding all the samples of a map-style dataset.
+
+        The samples are loaded once and collated into one batch by
+        :class:`~torch.utils.data.DataLoader`. Each sample must be a tuple or
+        a list of tensors or numbers.
+
+        """
+        loader = DataLoader(dataset, batch_size=len(dataset))
+        return cls(*next(iter(loader)), batch_size=batch_size, shuffle=shuffle, drop_last=drop_last,
+                   device=device, generator=generator)
+
+    def __len__(self):
+        size = self.tensors[0].shape[0]
+        if self.drop_last:
+            return size // self.batch_size
+        return -(-size // self.batch_size)
+
+    def __iter__(self):
+        return self.load_batches(self.sample_batches())
+
+    def sample_batches(self):
+        """Returns the index batches of a new epoch as CPU tensors."""
+        size = self.tensors[0].shape[0]
+        if self.shuffle:
+            order = torch.randperm(size, generator=self.generator)
+        else:
+            order = torch.arange(size)
+        batches = list(torch.split(order, self.batch_size))
+        if self.drop_last and batches and len(batches[-1]) < self.batch_size:
+            batches.pop()
+        return batches
+
+    def load_batches(self, batches):
+        """Returns an iterator over the batches of the given indices."""
+        tensors = self.tensors
+        device = tensors[0].device
+        for batch in batches:
+            batch = torch.as_tensor(batch, dtype=torch.int64)
+            if not self.shuffle and len(batch) > 0 and int(batch[-1]) - int(batch[0]) + 1 == len(batch):
+                start = int(batch[0])
+                yield [tensor[start:start + len(batch)] for tensor in tensors]
+            else:
+                index = batch.to(device, non_blocking=True)
+                yield [tensor.index_select(0, index) for tensor in tensors]
@@ -0,0 +1,80 @@
+import os
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+
+def is_initialized():
+    """Returns whether the default process group is initialized."""
+    return dist.is_available() and dist.is_initialized()
+
+
+def get_rank():
+    """Returns the rank of the process, or 0 without a process group."""
+    return dist.get_rank() if is_initialized() else 0
+
+
+def get_world_size():
+    """Returns the number of processes, or 1 without a process group."""
+    return dist.get_world_size() if is_initialized() else 1
+
+
+def is_main_process():
+    """Returns whether the process has rank 0."""
+    return get_rank() == 0
+
+
+def broadcast_object(obj, src=0):
+    """Returns ``obj`` of the process ``src`` on every process."""
+    if get_world_size() == 1:
+        return obj
+    objects = [obj]
+    dist.broadcast_object_list(objects, src=src)
+    return objects[0]
+
+
+def all_gather_object(obj):
+    """Returns the list of ``obj`` of every process, ordered by ranks."""
+    if get_world_size() == 1:
+        return [obj]
+    objects = [None] * get_world_size()
+    dist.all_gather_object(objects, obj)
+    return objects
+
+
+def launch(main, nprocs, args=(), backend='gloo', master_addr='127.0.0.1', master_port=29500, num_threads=None):
+    """Runs a function in local processes joined in a process group.
+
+    Each process initializes the default process group with its rank, calls
+    ``main(*args)`` and destroys the group. A :class:`Trainer` built inside
+    ``main`` then trains in the data-parallel mode. With the gloo backend,
+    this trains on the CPUs of one machine.
+
+    Args:
+        main: Function to run. It must be picklable, i.e. defined at the top
+            level of a module.
+        nprocs (int): Number of processes.
+        args (tuple): Arguments of ``main``.
+        backend (str): Backend of the process group.
+        master_addr (str): Address of the rank 0 process.
+        master_port (int): Port of the rank 0 process.
+        num_threads (int): Number of intra-op threads of each process. If it
+            is None, the cores are divided equally among the processes.
+
+    """
+    if num_threads is None:
+        num_threads = max(1, (os.cpu_count() or 1) // nprocs)
+    mp.spawn(_run, args=(main, nprocs, args, backend, master_addr, master_port, num_threads), nprocs=nprocs,
+             join=True)
+
+
+def _run(rank, main, world_size, args, backend, master_addr, master_port, num_threads):
+    os.environ['MASTER_ADDR'] = master_addr
+    os.environ['MASTER_PORT'] = str(master_port)
+    torch.set_num_threads(num_threads)
+    dist.init_process_group(backend, rank=rank, world_size=world_size)
+    try:
+        main(*args)
+    finally:
+        dist.destroy_process_group()
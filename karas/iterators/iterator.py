@@ -1,33 +1,159 @@
+import copy
+import inspect
+import queue
+import threading
+
+import torch
+from torch.utils.data import DataLoader, IterableDataset, SequentialSampler
+
+from karas import distributed
+
+
 class Iterator(object):
-    def __init__(self, dataloader, repeat=False):
-        self._iterator = iter(dataloader)
+    """Iterator over the batches of a loader with epoch accounting.
+
+    When the loader can replay a given order of batches, the iterator records
+    the index batches of the current epoch and the number of batches already
+    consumed. Restoring the state then resumes at the next batch without
+    loading any of the skipped ones, for shuffled and multi-worker loaders
+    alike. Map-style :class:`~torch.utils.data.DataLoader` objects are
+    supported out of the box, and other loaders can opt in by implementing
+    ``sample_batches()``, which draws the index batches of a new epoch, and
+    ``load_batches(batches)``, which returns an iterator over the data of the
+    given index batches. Other loaders are fast-forwarded by iterating them.
+    The loader is only started when the first batch is requested, so
+    iterators over loaders that are never used cost nothing.
+
+    Args:
+        dataloader: Loader to iterate.
+        repeat (bool): Whether the iteration continues after an epoch.
+        prefetch (int): Number of batches fetched ahead on a background
+            thread. If it is 0, batches are fetched when they are requested.
+            The epoch counters only advance when a batch is consumed, so they
+            are the same as without prefetching. As the background thread
+            must not draw from the global random generator, which the
+            training thread uses at the same time, the orders of the batches
+            and the seeds of the workers are drawn from a generator of the
+            iterator, seeded from the global one at construction and saved
+            by :meth:`state_dict`. It requires a loader that can replay index
+            batches and whose sampler takes a ``generator``, as the samplers
+            of PyTorch do. The states of other loaders cannot be restored
+            while prefetching.
+        pin_memory (bool): Whether prefetched tensors are copied to pinned
+            memory. It is ignored when CUDA is not available.
+        device: Device to which prefetched tensors are transferred ahead of
+            time. If it is None, the tensors are not transferred.
+        shard (bool): Whether each process of the default process group
+            iterates its own share of the batches. Every process draws the
+            same order of index batches, pads it by repeating the first ones
+            to a multiple of the number of processes and takes every
+            ``world_size``-th batch starting from its rank, so all processes
+            run the same number of iterations per epoch. The order is drawn
+            with the global random generator seeded by a seed shared at
+            construction and the epoch number, which leaves the generator
+            untouched. It requires a loader that can replay index batches.
+            Without a process group of several processes, it has no effect.
+
+    """
+
+    def __init__(self, dataloader, repeat=False, prefetch=0, pin_memory=False, device=None, shard=False):
         self._loader = dataloader
         self._repeat = repeat
+        self._prefetch = prefetch
+        self._pin_memory = pin_memory
+        self._device = device
+        self._shard = None
+        if shard and distributed.get_world_size() > 1:
+            seed = distributed.broadcast_object(int(torch.randint(2 ** 62, ()).item()))
+            self._shard = (seed, distributed.get_rank(), distributed.get_world_size())
+        self._generator = None
+        self._generator_state = None
+        if prefetch > 0:
+            self._generator = torch.Generator()
+            self._generator.manual_seed(int(torch.randint(2 ** 62, ()).item()))
+            self._generator_state = self._generator.get_state()
+        self._source = None
+        self._cursor = None
+        self._prefetcher = None
         self.reset()
 
     def reset(self):
-        self._iterator = iter(self._loader)
+        self.close()
+        self._batches = None
+        self._consumed = 0
         self._previous_epoch_detail = -1.
         self._epoch = 0
         self._position = 0
         self._is_new_epoch = False
+        # the loader is started by the first batch
+        self._cursor = None
 
     def __next__(self):
         self._previous_epoch_detail = self.epoch_detail
 
-        try:
-            batch = next(self._iterator)
-            self._position += 1
-            self._is_new_epoch = False
-        except:
-            self._iterator = iter(self._loader)
-            batch = next(self._iterator)
+        batch, is_new_epoch, self._batches, generator_state = self._fetch()
+        if generator_state is not None:
+            self._generator_state = generator_state
+        if is_new_epoch:
+            self._consumed = 0
             self._epoch += 1
             self._position = 0
             self._is_new_epoch = True
+        else:
+            self._position += 1
+            self._is_new_epoch = False
 
+        self._consumed += 1
         return batch
 
+    def _fetch(self):
+        if self._prefetch > 0:
+            if self._prefetcher is None:
+                self._prefetcher = _Prefetcher(self._take_cursor(), self._prefetch, self._pin_memory,
+                                               self._device)
+            return self._prefetcher.get()
+        if self._cursor is None:
+            self._cursor = self._new_cursor()
+        return self._cursor.next()
+
+    def _new_cursor(self):
+        """Makes a cursor at the current position of the consumer."""
+        source = self._batch_source()
+        if self._shard is not None:
+            # the next epoch drawn by the cursor
+            source.epoch = self._epoch if self._batches is None else self._epoch + 1
+        return _Cursor(self._loader, source, self._batches, self._consumed)
+
+    def _take_cursor(self):
+        cursor = self._cursor if self._cursor is not None else self._new_cursor()
+        self._cursor = None
+        return cursor
+
+    def close(self):
+        """Stops the prefetching thread and drops the prefetched batches.
+
+        Prefetching restarts from the next batch to consume when the iterator
+        is advanced again.
+        """
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
+
+    def _batch_source(self):
+        if self._source is None:
+            if hasattr(self._loader, 'sample_batches'):
+                self._source = self._loader
+            elif _is_replayable(self._loader):
+                self._source = _DataLoaderSource(self._loader, self._generator)
+            elif self._shard is not None:
+                raise ValueError('sharding requires a loader that can replay index batches, such as a map-style '
+                                 'DataLoader')
+            else:
+                self._source = False
+            if self._shard is not None:
+                self._source = _ShardedSource(self._source, *self._shard)
+        return self._source or None
+
     @property
     def is_new_epoch(self):
         return
@@ -38,7 +164,7 @@ class Iterator(object):
 
     @property
     def epoch_detail(self):
-        return self._epoch + self.position / len(self._loader)
+        return self._epoch + self.position / len(self)
 
     @property
     def previous_epoch_detail(self):
@@ -52,17 +178,54 @@ class Iterator(object):
 
     @property
     def iteration(self):
-        return self.epoch * len(self._loader) + self.position
+        return self.epoch * len(self) + self.position
 
     def has_next(self):
         if self._repeat:
             return True
         else:
-            return len(self._loader) > self._position
+            return len(self) > self._position
 
     def __len__(self):
+        if self._shard is not None:
+            return -(-len(self._loader) // self._shard[2])
         return len(self._loader)
 
+    def state_dict(self):
+        """Returns the counters of the iterator.
+
+        The loader is not part of the state. It is given again by the user
+        code when the iterator is rebuilt. The index batches of the current
+        epoch are included when the loader can replay them.
+        """
+        state = {'epoch': self._epoch,
+                 'position': self._position,
+                 'consumed': self._consumed,
+                 'is_new_epoch': self._is_new_epoch,
+                 'previous_epoch_detail': self._previous_epoch_detail}
+        if self._batches is not None:
+            state['batches'] = _pack_batches(self._batches)
+        if self._generator_state is not None:
+            state['generator'] = self._generator_state
+        return state
+
+    def load_state_dict(self, state):
+        self.close()
+        if self._prefetch > 0:
+            if getattr(self._batch_source(), 'generator', None) is None:
+                raise ValueError('the state of a prefetching iterator can only be restored for a loader that can '
+                                 'replay index batches drawn by a sampler taking a generator')
+            if 'generator' in state:
+                self._generator_state = state['generator']
+                self._generator.set_state(self._generator_state)
+        self._epoch = state['epoch']
+        self._position = state['position']
+        self._consumed = state.get('consumed', self._position)
+        self._is_new_epoch = state['is_new_epoch']
+        self._previous_epoch_detail = state['previous_epoch_detail']
+        self._batches = _unpack_batches(state['batches']) if 'batches' in state else None
+        self._cursor = None
+
     def __getstate__(self):
         state = {}
         state['_position'] = self._position
@@ -71,16 +234,296 @@ class Iterator(object):
         state['_is_new_epoch'] = self._is_new_epoch
         state['_previous_epoch_detail'] = self._previous_epoch_detail
         state['_repeat'] = self._repeat
+        state['_consumed'] = self._consumed
+        state['_batches'] = self._batches
+        state['_prefetch'] = self._prefetch
+        state['_pin_memory'] = self._pin_memory
+        state['_device'] = self._device
+        state['_shard'] = self._shard
+        state['_generator_state'] = self._generator_state
         return state
 
     def __setstate__(self, state):
         self._loader = state['_loader']
-        self._iterator = iter(self._loader)
-        self._position = state['_position']
-        for i in range(self._position):
-            next(self._iterator)
         self._position = state['_position']
         self._epoch = state['_epoch']
         self._is_new_epoch = state['_is_new_epoch']
         self._previous_epoch_detail = state['_previous_epoch_detail']
         self._repeat = state['_repeat']
+        self._consumed = state.get('_consumed', self._position)
+        self._batches = state.get('_batches')
+        self._prefetch = state.get('_prefetch', 0)
+        self._pin_memory = state.get('_pin_memory', False)
+        self._device = state.get('_device')
+        self._shard = state.get('_shard')
+        self._generator_state = state.get('_generator_state')
+        self._generator = None
+        if self._generator_state is not None:
+            self._generator = torch.Generator()
+            self._generator.set_state(self._generator_state)
+        self._source = None
+        self._prefetcher = None
+        self._cursor = None
+
+
+class _Cursor(object):
+    """Position in the batches of a loader, across epochs.
+
+    :meth:`next` returns each batch together with whether it starts a new
+    epoch, the index batches of its epoch (None if the loader cannot replay
+    them) and the state of the generator of the source right after drawing
+    them (None if the source has no generator or if they were not drawn by
+    this cursor).
+
+    """
+
+    def __init__(self, loader, source, batches, consumed):
+        self._loader = loader
+        self._source = source
+        self._batches = batches
+        self._consumed = consumed
+        self._generator_state = None
+        self._start()
+
+    def _start(self):
+        """Starts iterating the current epoch after the consumed batches."""
+        if self._source is None:
+            self._iterator = iter(self._loader)
+            for i in range(self._consumed):
+                next(self._iterator)
+            return
+
+        if self._batches is None:
+            self._batches = self._source.sample_batches()
+            generator = getattr(self._source, 'generator', None)
+            if generator is not None:
+                self._generator_state = generator.get_state()
+        self._iterator = self._source.load_batches(self._batches[self._consumed:])
+
+    def next(self):
+        try:
+            batch = next(self._iterator)
+            is_new_epoch = False
+        except StopIteration:
+            self._batches = None
+            self._consumed = 0
+            self._start()
+            batch = next(self._iterator)
+            is_new_epoch = True
+
+        self._consumed += 1
+        return batch, is_new_epoch, self._batches, self._generator_state
+
+
+class _Prefetcher(object):
+    """Fetches and stages the batches of a cursor on a background thread."""
+
+    def __init__(self, cursor, size, pin_memory, device):
+        self._cursor = cursor
+        self._pin_memory = pin_memory and torch.cuda.is_available()
+        self._device = None if device is None else torch.device(device)
+        self._queue = queue.Queue(maxsize=size)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        stream = None
+        if self._device is not None and self._device.type == 'cuda':
+            stream = torch.cuda.Stream(self._device)
+        try:
+            while not self._closed.is_set():
+                batch, is_new_epoch, batches, generator_state = self._cursor.next()
+                if stream is None:
+                    batch = self._stage(batch)
+                else:
+                    with torch.cuda.stream(stream):
+                        batch = self._stage(batch)
+                    stream.synchronize()
+                self._put((batch, is_new_epoch, batches, generator_state))
+        except BaseException as e:
+            self._put(_Failure(e))
+
+    def _stage(self, batch):
+        if isinstance(batch, torch.Tensor):
+            if self._pin_memory and batch.device.type == 'cpu':
+                batch = batch.pin_memory()
+            if self._device is not None:
+                batch = batch.to(self._device, non_blocking=True)
+            return batch
+        if isinstance(batch, dict):
+            return type(batch)((key, self._stage(value)) for key, value in batch.items())
+        if isinstance(batch, tuple) and hasattr(batch, '_fields'):
+            return type(batch)(*(self._stage(value) for value in batch))
+        if isinstance(batch, (list, tuple)):
+            return type(batch)(self._stage(value) for value in batch)
+        return batch
+
+    def _put(self, item):
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def get(self):
+        item = self._queue.get()
+        if isinstance(item, _Failure):
+            self._closed.set()
+            raise item.error
+        return item
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
+
+
+class _Failure(object):
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _is_replayable(loader):
+    return (isinstance(loader, DataLoader) and loader.batch_sampler is not None
+            and not isinstance(loader.dataset, IterableDataset))
+
+
+def _pack_batches(batches):
+    sizes = torch.tensor([len(batch) for batch in batches], dtype=torch.int64)
+    if len(batches) == 0:
+        return {'indices': torch.zeros(0, dtype=torch.int64), 'sizes': sizes}
+    indices = torch.cat([torch.as_tensor(batch, dtype=torch.int64) for batch in batches])
+    return {'indices': indices, 'sizes': sizes}
+
+
+def _unpack_batches(packed):
+    return [batch.tolist() for batch in torch.split(packed['indices'], packed['sizes'].tolist())]
+
+
+class _ReplayBatchSampler(object):
+    """Batch sampler yielding the index batches assigned to it."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __iter__(self):
+        return iter(self.batches)
+
+    def __len__(self):
+        return len(self.batches)
+
+
+class _DataLoaderSource(object):
+    """Replays recorded index batches through a copy of a DataLoader.
+
+    The index batches are drawn from the batch sampler of the given loader,
+    so shuffling consumes the random generators exactly as the loader does.
+    They are loaded by a copy of the loader that shares its dataset, collate
+    function and worker settings but takes its batches from a replay sampler.
+    Starting the copy draws the base seed of its workers, which is done
+    without advancing the global random generator, so that the shuffles of
+    the next epochs do not depend on whether an epoch was resumed.
+
+    When a generator is given and the sampler of the loader takes one, the
+    index batches and the seeds are drawn from the generator instead, through
+    a copy of the batch sampler, and :attr:`generator` is the generator.
+    Otherwise it is None.
+
+    """
+
+    def __init__(self, loader, generator=None):
+        self._loader = loader
+        self._batch_sampler = loader.batch_sampler
+        self.generator = None
+        if generator is not None:
+            batch_sampler = _with_generator(loader.batch_sampler, generator)
+            if batch_sampler is not None:
+                self._batch_sampler = batch_sampler
+                self.generator = generator
+        self._sampler = _ReplayBatchSampler()
+        self._replay = _clone_loader(loader, self._sampler, self.generator)
+
+    def sample_batches(self):
+        return [list(batch) for batch in self._batch_sampler]
+
+    def load_batches(self, batches):
+        self._sampler.batches = batches
+        if self.generator is not None:
+            return iter(self._replay)
+        with torch.random.fork_rng(devices=[]):
+            return iter(self._replay)
+
+
+class _ShardedSource(object):
+    """Source yielding the share of a process of the batches of another one.
+
+    The batches of each epoch are drawn under a seed derived from the shared
+    seed and :attr:`epoch`, which the iterator sets to the next epoch a new
+    cursor draws. Drawing them increments it. When the other source draws
+    from a generator, the generator is seeded instead of the global one.
+
+    """
+
+    def __init__(self, source, seed, rank, world_size):
+        self._source = source
+        self._seed = seed
+        self._rank = rank
+        self._world_size = world_size
+        self.generator = getattr(source, 'generator', None)
+        self.epoch = 0
+
+    def sample_batches(self):
+        if self.generator is not None:
+            self.generator.manual_seed(self._seed + self.epoch)
+            batches = list(self._source.sample_batches())
+        else:
+            with torch.random.fork_rng(devices=[]):
+                torch.manual_seed(self._seed + self.epoch)
+                batches = list(self._source.sample_batches())
+        self.epoch += 1
+
+        count = -(-len(batches) // self._world_size)
+        padded = batches
+        while len(padded) < count * self._world_size:
+            padded = padded + batches[:count * self._world_size - len(padded)]
+        return padded[self._rank::self._world_size]
+
+    def load_batches(self, batches):
+        return self._source.load_batches(batches)
+
+
+def _with_generator(batch_sampler, generator):
+    """Copies a batch sampler drawing from a generator, or returns None."""
+    sampler = getattr(batch_sampler, 'sampler', None)
+    if sampler is None:
+        return None
+    if not isinstance(sampler, SequentialSampler):
+        if not hasattr(sampler, 'generator'):
+            return None
+        sampler = copy.copy(sampler)
+        sampler.generator = generator
+    batch_sampler = copy.copy(batch_sampler)
+    batch_sampler.sampler = sampler
+    return batch_sampler
+
+
+def _clone_loader(loader, batch_sampler, generator=None):
+    kwargs = {'batch_sampler': batch_sampler,
+              'num_workers': loader.num_workers,
+              'collate_fn': loader.collate_fn,
+              'pin_memory': loader.pin_memory,
+              'timeout': loader.timeout,
+              'worker_init_fn': loader.worker_init_fn,
+              'multiprocessing_context': loader.multiprocessing_context,
+              'generator': loader.generator if generator is None else generator,
+              'persistent_workers': getattr(loader, 'persistent_workers', False),
+              'pin_memory_device': getattr(loader, 'pin_memory_device', '')}
+    if loader.num_workers > 0:
+        kwargs['prefetch_factor'] = getattr(loader, 'prefetch_factor', 2)
+
+    parameters = inspect.signature(DataLoader.__init__).parameters
+    kwargs = {key: value for key, value in kwargs.items() if key in parameters}
+    return DataLoader(loader.dataset, **kwargs)
@@ -0,0 +1,393 @@
+import json
+import os
+
+import numpy
+import six
+import torch
+from numpy.lib.stride_tricks import sliding_window_view
+from six.moves import collections_abc
+
+_FILLS = {numpy.dtype(bool): False,
+          numpy.dtype(numpy.int64): 0,
+          numpy.dtype(numpy.float64): numpy.nan,
+          numpy.dtype(object): None}
+
+
+class MetricStore(object):
+    """Columnar history of metric rows.
+
+    Each key of the appended rows has its own column, a NumPy array grown
+    geometrically, along with a mask of the rows holding a value for it.
+    Booleans, integers and floats are stored in ``bool``, ``int64`` and
+    ``float64`` columns, a column mixing integers and floats is promoted to
+    ``float64``, and other values are stored in object columns. A numeric
+    value costs 9 bytes, instead of an entry of a dictionary per row.
+
+    If a directory is given, the numeric columns and their masks are
+    memory-mapped raw files in it, described by ``index.json``, which is
+    rewritten by :meth:`flush`. The files of an existing store are opened
+    with :meth:`load`. Object columns are always kept in memory.
+
+    See the following example::
+
+        >>> store = MetricStore()
+        >>> store.append({'iteration': 100, 'main/loss': 0.5})
+        >>> store.append({'iteration': 200, 'main/loss': 0.25})
+        >>> store.column('main/loss')
+        array([0.5 , 0.25])
+        >>> store.rows[store.argmin('main/loss')]
+        {'iteration': 200, 'main/loss': 0.25}
+
+    Args:
+        path (str): Directory of the column files. If it is None, the
+            columns are kept in memory.
+        capacity (int): Initial number of rows of the columns.
+
+    """
+
+    def __init__(self, path=None, capacity=64):
+        self._path = path
+        self._initial_capacity = max(1, capacity)
+        if path is not None and not os.path.isdir(path):
+            os.makedirs(path)
+        self._reset()
+
+    def _reset(self):
+        self._keys = []
+        self._columns = {}
+        self._masks = {}
+        self._files = {}
+        self._next_file = 0
+        self._length = 0
+        self._capacity = self._initial_capacity
+
+    @classmethod
+    def load(cls, path):
+        """Opens the store flushed to a directory, to read or to extend it."""
+        with open(os.path.join(path, 'index.json')) as f:
+            index = json.load(f)
+        store = cls(path, capacity=index['capacity'])
+        store._length = index['length']
+        for entry in index['columns']:
+            key = entry['key']
+            dtype = numpy.dtype(entry['dtype'])
+            store._keys.append(key)
+            store._files[key] = (entry['data'], entry['mask'])
+            store._next_file = max(store._next_file, int(entry['data'].split('.')[0]) + 1)
+            store._columns[key] = store._map(entry['data'], dtype, store._capacity)
+            store._masks[key] = store._map(entry['mask'], numpy.dtype(bool), store._capacity)
+        return store
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def rows(self):
+        """Read-only sequence of the rows as dictionaries."""
+        return _RowView(self)
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, key):
+        return key in self._columns
+
+    def keys(self):
+        """Returns the list of the keys, in the order of their first values."""
+        return list(self._keys)
+
+    def append(self, row):
+        """Appends a row.
+
+        Args:
+            row (dict): Values keyed by names. Zero-dimensional tensors and
+                arrays are stored as Python scalars.
+
+        """
+        n = self._length
+        if n == self._capacity:
+            self._grow(2 * self._capacity)
+
+        for key, value in six.iteritems(row):
+            if isinstance(value, (torch.Tensor, numpy.ndarray)) and value.ndim == 0:
+                value = value.item()
+            dtype = _dtype_of(value)
+            column = self._columns.get(key)
+            if column is None:
+                column = self._add_column(key, dtype)
+            elif column.dtype != dtype:
+                promoted = _promote(column.dtype, dtype)
+                if promoted != column.dtype:
+                    column = self._convert(key, promoted)
+            column[n] = value
+            self._masks[key][n] = True
+        self._length = n + 1
+
+    def row(self, index):
+        """Returns a row as a dictionary of Python scalars."""
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('row index out of range')
+        columns = self._columns
+        masks = self._masks
+        return {key: _to_python(columns[key][index]) for key in self._keys if masks[key][index]}
+
+    def column(self, key, start=None, stop=None):
+        """Returns a view of the values of a key in a range of rows.
+
+        The rows without a value for the key hold NaN in a float column,
+        zero or False in an integer or boolean column and None in an object
+        column. See :meth:`mask`.
+
+        Args:
+            key (str): Key of the column.
+            start (int): First row of the range.
+            stop (int): Row past the end of the range.
+
+        """
+        return self._columns[key][:self._length][start:stop]
+
+    def mask(self, key, start=None, stop=None):
+        """Returns a view of the mask of the rows holding a value for a key."""
+        return self._masks[key][:self._length][start:stop]
+
+    def values(self, key, start=None, stop=None):
+        """Returns the array of the values of a key, skipping rows without one."""
+        return self.column(key, start, stop)[self.mask(key, start, stop)]
+
+    def rolling(self, key, window, reduce='mean'):
+        """Reduces the values of a key over a sliding window.
+
+        Args:
+            key (str): Key of the column.
+            window (int): Number of consecutive values in a window.
+            reduce (str): ``'mean'``, ``'sum'``, ``'min'``, ``'max'`` or
+                ``'std'``.
+
+        Returns:
+            numpy.ndarray: One reduced value per window, so ``window - 1``
+            fewer than the values of the key.
+
+        """
+        if reduce not in ('mean', 'sum', 'min', 'max', 'std'):
+            raise ValueError('reduce must be one of \'mean\', \'sum\', \'min\', \'max\' and \'std\'')
+        values = self.values(key).astype(numpy.float64)
+        if len(values) < window:
+            return numpy.empty(0)
+        return getattr(sliding_window_view(values, window), reduce)(axis=1)
+
+    def argmax(self, key):
+        """Returns the index of the row holding the largest value of a key."""
+        return self._arg(key, numpy.argmax)
+
+    def argmin(self, key):
+        """Returns the index of the row holding the smallest value of a key."""
+        return self._arg(key, numpy.argmin)
+
+    def _arg(self, key, function):
+        rows = numpy.flatnonzero(self.mask(key))
+        if len(rows) == 0:
+            raise ValueError('{} has no value'.format(key))
+        return int(rows[function(self.column(key)[rows])])
+
+    def drop(self, count):
+        """Removes the oldest rows.
+
+        The remaining rows are moved to the front of the columns, which keep
+        their capacity.
+
+        Args:
+            count (int): Number of rows to remove.
+
+        """
+        count = min(count, self._length)
+        if count <= 0:
+            return
+        n = self._length
+        for key in self._keys:
+            column = self._columns[key]
+            mask = self._masks[key]
+            column[:n - count] = column[count:n]
+            column[n - count:n] = _FILLS[column.dtype]
+            mask[:n - count] = mask[count:n]
+            mask[n - count:n] = False
+        self._length = n - count
+
+    def clear(self):
+        """Removes all the rows and the column files."""
+        for data, mask in six.itervalues(self._files):
+            for name in (data, mask):
+                os.remove(os.path.join(self._path, name))
+        self._reset()
+        if self._path is not None:
+            self.flush()
+
+    def flush(self):
+        """Writes the memory-mapped columns and the index to the disk."""
+        if self._path is None:
+            return
+        columns = []
+        for key in self._keys:
+            if key not in self._files:
+                continue
+            self._columns[key].flush()
+            self._masks[key].flush()
+            data, mask = self._files[key]
+            columns.append({'key': key, 'dtype': self._columns[key].dtype.name, 'data': data, 'mask': mask})
+        index = {'length': self._length, 'capacity': self._capacity, 'columns': columns}
+        path = os.path.join(self._path, 'index.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(index, f)
+        os.replace(path + '.tmp', path)
+
+    def state_dict(self):
+        n = self._length
+        values = []
+        for key in self._keys:
+            column = self._columns[key][:n]
+            if column.dtype == object:
+                values.append(list(column))
+            else:
+                values.append(torch.from_numpy(numpy.array(column)))
+        return {'length': n,
+                'keys': list(self._keys),
+                'values': values,
+                'masks': [torch.from_numpy(numpy.array(self._masks[key][:n])) for key in self._keys]}
+
+    def load_state_dict(self, state):
+        self.clear()
+        n = state['length']
+        capacity = self._initial_capacity
+        while capacity < n:
+            capacity *= 2
+        self._capacity = capacity
+        for key, values, mask in zip(state['keys'], state['values'], state['masks']):
+            if isinstance(values, torch.Tensor):
+                values = values.numpy()
+            else:
+                values = numpy.array(values + [None], dtype=object)[:-1]
+            column = self._add_column(key, values.dtype)
+            column[:n] = values
+            self._masks[key][:n] = mask.numpy()
+        self._length = n
+
+    def _add_column(self, key, dtype):
+        self._keys.append(key)
+        self._allocate(key, dtype)
+        return self._columns[key]
+
+    def _allocate(self, key, dtype):
+        capacity = self._capacity
+        if self._path is None or dtype == object:
+            self._columns[key] = numpy.full(capacity, _FILLS[dtype], dtype=dtype)
+            if key not in self._masks:
+                self._masks[key] = numpy.zeros(capacity, dtype=bool)
+            return
+
+        if key in self._files:
+            data, mask = self._files[key]
+        else:
+            data, mask = '{}.data'.format(self._next_file), '{}.mask'.format(self._next_file)
+            self._next_file += 1
+            self._files[key] = (data, mask)
+            for name in (data, mask):
+                open(os.path.join(self._path, name), 'wb').close()
+        column = self._map(data, dtype, capacity)
+        column[:] = _FILLS[dtype]
+        self._columns[key] = column
+        if key not in self._masks:
+            self._masks[key] = self._map(mask, numpy.dtype(bool), capacity)
+
+    def _map(self, name, dtype, capacity):
+        path = os.path.join(self._path, name)
+        with open(path, 'r+b') as f:
+            f.truncate(capacity * dtype.itemsize)
+        return numpy.memmap(path, dtype=dtype, mode='r+', shape=(capacity,))
+
+    def _convert(self, key, dtype):
+        previous = self._columns[key][:self._length]
+        mask = self._masks[key][:self._length]
+        values = numpy.where(mask, previous, _FILLS[dtype]) if dtype != object else previous.astype(object)
+        if dtype == object:
+            values[~mask] = None
+        else:
+            values = values.astype(dtype)
+        if key in self._files and dtype == object:
+            # object columns live in memory only
+            data, mask_file = self._files.pop(key)
+            self._masks[key] = numpy.array(self._masks[key])
+            for name in (data, mask_file):
+                os.remove(os.path.join(self._path, name))
+        self._allocate(key, dtype)
+        self._columns[key][:self._length] = values
+        return self._columns[key]
+
+    def _grow(self, capacity):
+        n = self._length
+        self._capacity = capacity
+        for key in self._keys:
+            column = self._columns[key]
+            mask = self._masks[key]
+            if key in self._files:
+                data, mask_file = self._files[key]
+                column.flush()
+                mask.flush()
+                grown = self._map(data, column.dtype, capacity)
+                grown[n:] = _FILLS[column.dtype]
+                self._columns[key] = grown
+                self._masks[key] = self._map(mask_file, numpy.dtype(bool), capacity)
+            else:
+                grown = numpy.full(capacity, _FILLS[column.dtype], dtype=column.dtype)
+                grown[:n] = column[:n]
+                self._columns[key] = grown
+                grown_mask = numpy.zeros(capacity, dtype=bool)
+                grown_mask[:n] = mask[:n]
+                self._masks[key] = grown_mask
+
+    def __getstate__(self):
+        return {'path': self._path, 'capacity': self._initial_capacity, 'state': self.state_dict()}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['capacity'])
+        self.load_state_dict(state['state'])
+
+
+class _RowView(collections_abc.Sequence):
+    """Read-only sequence of the rows of a :class:`MetricStore`."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._store.row(i) for i in range(*index.indices(len(self)))]
+        return self._store.row(index)
+
+
+def _dtype_of(value):
+    if isinstance(value, (bool, numpy.bool_)):
+        return numpy.dtype(bool)
+    if isinstance(value, six.integer_types + (numpy.integer,)):
+        return numpy.dtype(numpy.int64)
+    if isinstance(value, (float, numpy.floating)):
+        return numpy.dtype(numpy.float64)
+    return numpy.dtype(object)
+
+
+def _promote(dtype, other):
+    if dtype == object or other == object:
+        return numpy.dtype(object)
+    if dtype == numpy.float64 or other == numpy.float64:
+        return numpy.dtype(numpy.float64)
+    return numpy.dtype(numpy.int64)
+
+
+def _to_python(value):
+    if isinstance(value, numpy.generic):
+        return value.item()
+    return value
@@ -0,0 +1,97 @@
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+class Profiler(object):
+    """Low-overhead timer of the phases of the training loop.
+
+    When a profiler is given to :class:`~karas.training.trainer.Trainer`, the
+    trainer times the wait for the next batch (``data``), the update
+    (``update``), and the trigger (``extension/<name>/trigger``) and the body
+    (``extension/<name>``) of each extension it polls. User code can add
+    nested spans with :meth:`Reporter.timer <karas.reporter.Reporter.timer>`,
+    whose names are joined with the names of the enclosing spans, e.g.
+    ``update/forward``.
+
+    The total time of every span in an iteration is reported at the end of
+    the iteration as ``train/scalar/time/<span>`` in seconds. Spans of the
+    iterations in ``trace_window`` are also recorded as events that
+    :meth:`export_chrome_trace` writes in the Chrome trace format.
+
+    Args:
+        trace_window (tuple): Pair of the first iteration to trace and the
+            iteration after the last one to trace. If it is None, no events
+            are recorded.
+
+    """
+
+    def __init__(self, trace_window=None):
+        self._trace_window = trace_window
+        self._stack = []
+        self._times = collections.defaultdict(float)
+        self._events = []
+        self._iteration = 0
+        self._tracing = False
+        self._origin = time.perf_counter()
+
+    def begin_iteration(self, iteration):
+        """Starts timing the given iteration."""
+        self._iteration = iteration
+        window = self._trace_window
+        self._tracing = window is not None and window[0] <= iteration < window[1]
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """Returns a context manager timing the enclosed block as ``name``."""
+        stack = self._stack
+        stack.append(name)
+        path = '/'.join(stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            self._times[path] += end - start
+            if self._tracing:
+                self._events.append((path, start, end - start, self._iteration))
+
+    def pop_times(self):
+        """Returns the total time of each span since the last call."""
+        times = self._times
+        self._times = collections.defaultdict(float)
+        return times
+
+    @property
+    def events(self):
+        """List of the traced events as ``(name, start, duration, iteration)``."""
+        return self._events
+
+    def export_chrome_trace(self, filename):
+        """Writes the traced events as a Chrome trace JSON file.
+
+        The file can be opened with ``chrome://tracing`` or Perfetto.
+        """
+        pid = os.getpid()
+        tid = threading.current_thread().ident
+        events = []
+        for name, start, duration, iteration in self._events:
+            events.append({'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                           'ts': (start - self._origin) * 1e6, 'dur': duration * 1e6,
+                           'args': {'iteration': iteration}})
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_stack'] = []
+        state['_times'] = collections.defaultdict(float)
+        state['_events'] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
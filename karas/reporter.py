@@ -6,6 +6,10 @@ import typing as tp  # NOQA
 import numpy
 import six
 import torch
+import torch.distributed as dist
+
+from karas import KeyMatcher
+from karas import distributed
 
 SCALAR = 100
 IMAGE = 200
@@ -23,12 +27,63 @@ class Reporter(object):
         ...
         >>> reporter.observation
         {'loss/x': 1}
+
+    Args:
+        deferred (bool): If ``True``, reported tensors are not copied to the
+            host. The latest zero-dimensional tensor of every tag is kept on
+            its own device, and the kept tensors are moved to the host in one
+            batched transfer per device only when :attr:`observation` is
+            read, so the observation holds the same values as without
+            deferring. Other tensors are kept on their device as they are.
+        retain: Policy of the values kept in the observation by
+            :meth:`recycle`. ``'all'`` keeps every value, ``'none'`` keeps
+            nothing, ``'scalars'`` keeps numbers and zero-dimensional tensors
+            and drops images, other tensors and any other object, and an
+            iterable of key patterns keeps the values of the matching tags.
+            Transient values are never kept. See :meth:`report`.
+
     """
 
-    def __init__(self):
+    def __init__(self, deferred=False, retain='scalars'):
         self.namespace = ''
         self.sep = '/'
-        self.observation = {}
+        self.deferred = deferred
+        self.profiler = None
+        self._observation = {}
+        self._pending = {}
+        self._transient = set()
+        self.retain = retain
+        self._histories = {}
+        self._history_matcher = None
+        self._history_length = 0
+        self._history_bytes = 0
+        self._subscriptions = []
+        self._routes = {}
+
+    @property
+    def retain(self):
+        return self._retain
+
+    @retain.setter
+    def retain(self, retain):
+        if isinstance(retain, six.string_types):
+            if retain not in ('all', 'none', 'scalars'):
+                raise ValueError('retain must be \'all\', \'none\', \'scalars\' or key patterns')
+            self._retain_matcher = None
+        else:
+            retain = tuple(retain)
+            self._retain_matcher = KeyMatcher(retain)
+        self._retain = retain
+
+    @property
+    def observation(self):
+        self.flush()
+        return self._observation
+
+    @observation.setter
+    def observation(self, observation):
+        self.flush()
+        self._observation = observation
 
     @contextlib.contextmanager
     def scope(self, namespace):
@@ -42,19 +97,200 @@ class Reporter(object):
         self.__exit__(None, None, None)
         self.namespace = old
 
-    def report(self, values):
+    def timer(self, name):
+        """Returns a context manager timing the enclosed block.
+
+        The time is recorded by the profiler of the reporter as a span named
+        ``name``, nested in the enclosing spans. See
+        :class:`~karas.profiler.Profiler`. If the reporter has no profiler,
+        the returned context manager does nothing.
+
+        """
+        if self.profiler is None:
+            return _null_timer
+        return self.profiler.span(name)
+
+    def report(self, values, transient=False):
+        """Records values in the observation under the current namespace.
+
+        Args:
+            values (dict): Values keyed by names.
+            transient (bool): Whether the values are removed from the
+                observation by the next :meth:`recycle` whatever the
+                :attr:`retain` policy, because they only describe the current
+                iteration.
+
+        """
         for key, value in six.iteritems(values):
             if self.namespace != '':
                 name = '%s/%s' % (self.namespace, key)
             else:
                 name = key
+            if transient:
+                self._transient.add(name)
+            elif self._transient:
+                self._transient.discard(name)
             if isinstance(value, torch.Tensor):
-                value = value.detach().cpu()
-            self.observation[name] = value
+                value = value.detach()
+                if not self.deferred:
+                    value = value.cpu()
+                elif value.dim() == 0:
+                    self._pending[name] = value
+                    if self._subscriptions:
+                        self._route(name, value)
+                    continue
+            self._pending.pop(name, None)
+            self._observation[name] = value
+            if self._subscriptions:
+                self._route(name, value)
+
+    def subscribe(self, keys, callback):
+        """Routes the values of some keys to a callback as they are recorded.
+
+        The callback is called as ``callback(key, value)`` for every value
+        recorded in the observation under a tag matching one of the keys,
+        where ``key`` is the matching key, so consumers interested in a few
+        keys do not have to scan the observation. The values are routed by
+        :meth:`report`, so the callback sees every reported value, including
+        the ones overwritten before the observation is read. In the deferred
+        mode, zero-dimensional tensors are routed as they are, on their
+        device, and consumers accumulating them should do so without copying
+        them to the host, as :class:`DictSummary` does. The keys matching a
+        tag are resolved once per tag.
+
+        Args:
+            keys (iterable of strs): Key patterns of the tags to subscribe to.
+            callback: Callable receiving the key and the value. It is pickled
+                with the reporter.
+
+        Returns:
+            Subscription: Handle whose ``cancel`` method ends the
+            subscription.
+
+        """
+        subscription = Subscription(self, KeyMatcher(keys), callback)
+        self._subscriptions.append(subscription)
+        self._routes = {}
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+            self._routes = {}
+
+    def _route(self, name, value):
+        routes = self._routes.get(name)
+        if routes is None:
+            routes = self._routes[name] = tuple((key, subscription.callback)
+                                                for subscription in self._subscriptions
+                                                for key in subscription.matcher.match(name))
+        for key, callback in routes:
+            callback(key, value)
+
+    def flush(self):
+        """Moves the pending values of the deferred mode to the host.
+
+        The latest zero-dimensional tensors of all the tags on one device are
+        packed into a single tensor per dtype, and the tensor is copied to the
+        host with one non-blocking transfer followed by one synchronization.
+        The results are stored in :attr:`observation` as zero-dimensional CPU
+        tensors. The values have already been routed to the subscribers by
+        :meth:`report`.
+
+        """
+        pending = self._pending
+        if not pending:
+            return
+        self._pending = {}
+
+        groups = collections.defaultdict(list)
+        for name, value in six.iteritems(pending):
+            groups[value.device, value.dtype].append((name, value))
+
+        for (device, _), entries in six.iteritems(groups):
+            packed = torch.stack([value for _, value in entries])
+            host = packed.to('cpu', non_blocking=True)
+            if packed.is_cuda:
+                torch.cuda.current_stream(device).synchronize()
+            for (name, _), value in zip(entries, host.unbind()):
+                self._observation[name] = value
 
     def reset(self):
         self.namespace = ''
-        self.observation = {}
+        self._observation = {}
+        self._pending = {}
+        self._transient = set()
+
+    def recycle(self):
+        """Ends the observation of an iteration.
+
+        The values of the observation are first recorded in the histories
+        set up by :meth:`keep_history`, and the transient values and the
+        values not kept by the :attr:`retain` policy are removed from the
+        observation, so that the values reported on each iteration, such as
+        batches of images, do not stay alive until the end of the training.
+        The observation dictionary itself is reused. The pending values of the
+        deferred mode are neither flushed nor recorded, and only the transient
+        ones are dropped.
+
+        """
+        observation = self._observation
+        if self._history_matcher is not None:
+            for tag, value in six.iteritems(observation):
+                if self._history_matcher.match(tag):
+                    history = self._histories.get(tag)
+                    if history is None:
+                        history = self._histories[tag] = _History(self._history_length, self._history_bytes)
+                    history.append(value)
+
+        if self._transient:
+            self._pending = {tag: value for tag, value in six.iteritems(self._pending)
+                             if tag not in self._transient}
+            for tag in self._transient:
+                observation.pop(tag, None)
+            self._transient = set()
+        if self._retain == 'all':
+            return
+        if self._retain == 'none':
+            observation.clear()
+            return
+        dropped = [tag for tag, value in six.iteritems(observation) if not self._is_retained(tag, value)]
+        for tag in dropped:
+            del observation[tag]
+
+    def _is_retained(self, tag, value):
+        if self._retain_matcher is not None:
+            return bool(self._retain_matcher.match(tag))
+        if self._retain == 'scalars':
+            if isinstance(value, torch.Tensor):
+                return value.dim() == 0
+            return _is_scalar(value)
+        return self._retain == 'all'
+
+    def keep_history(self, keys, length=100, max_bytes=1024 * 1024):
+        """Keeps the latest values of some tags in ring buffers.
+
+        On every :meth:`recycle`, the values of the tags matching the keys
+        are appended to a ring buffer per tag, which holds at most
+        ``length`` values and ``max_bytes`` bytes of tensor data, dropping
+        the oldest values first. A value larger than ``max_bytes`` is not
+        kept. Scalars count for 8 bytes.
+
+        Args:
+            keys (iterable of strs): Key patterns of the tags to keep.
+            length (int): Maximum number of values per tag.
+            max_bytes (int): Maximum size of the values per tag.
+
+        """
+        self._history_matcher = KeyMatcher(keys)
+        self._history_length = length
+        self._history_bytes = max_bytes
+        self._histories = {}
+
+    def history(self, tag):
+        """Returns the list of the kept values of a tag, oldest first."""
+        history = self._histories.get(tag)
+        return [] if history is None else list(history.values)
 
     def __enter__(self):
         _reporters.append(self)
@@ -65,14 +301,85 @@ class Reporter(object):
         pass
 
     def __getstate__(self):
+        self.flush()
         state = self.__dict__.copy()
         state['namespace'] = ''
+        state['_routes'] = {}
+        # the values of the current iteration only are not needed to resume
+        state['_observation'] = {tag: value for tag, value in six.iteritems(self._observation)
+                                 if tag not in self._transient and self._is_retained(tag, value)}
+        state['_transient'] = set()
         return state
 
     def __setstate__(self, state):
+        state.setdefault('deferred', False)
+        state.setdefault('profiler', None)
+        state.setdefault('_pending', {})
+        state.setdefault('_transient', set())
+        if 'observation' in state:
+            state['_observation'] = state.pop('observation')
+        if '_retain' not in state:
+            state['_retain'] = 'all'
+            state['_retain_matcher'] = None
+        state.setdefault('_histories', {})
+        state.setdefault('_history_matcher', None)
+        state.setdefault('_history_length', 0)
+        state.setdefault('_history_bytes', 0)
+        state.setdefault('_subscriptions', [])
+        state.setdefault('_routes', {})
         self.__dict__.update(state)
 
 
+class _NullTimer(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_null_timer = _NullTimer()
+
+
+class Subscription(object):
+    """Subscription of a callback to some keys of a :class:`Reporter`."""
+
+    def __init__(self, reporter, matcher, callback):
+        self.reporter = reporter
+        self.matcher = matcher
+        self.callback = callback
+
+    def cancel(self):
+        """Stops routing the values to the callback."""
+        self.reporter._unsubscribe(self)
+
+
+class _History(object):
+    """Ring buffer of the latest values of a tag, bounded in size."""
+
+    def __init__(self, length, max_bytes):
+        self.values = collections.deque()
+        self._sizes = collections.deque()
+        self._length = length
+        self._max_bytes = max_bytes
+        self._bytes = 0
+
+    def append(self, value):
+        if isinstance(value, torch.Tensor):
+            nbytes = value.numel() * value.element_size()
+        else:
+            nbytes = 8
+        if nbytes > self._max_bytes or self._length <= 0:
+            return
+        while len(self.values) >= self._length or self._bytes + nbytes > self._max_bytes:
+            self.values.popleft()
+            self._bytes -= self._sizes.popleft()
+        self.values.append(value)
+        self._sizes.append(nbytes)
+        self._bytes += nbytes
+
+
 _reporters = []  # type: tp.Optional[tp.List[Reporter]]
 
 
@@ -163,14 +470,16 @@ def report_scope(observation):
 class Summary(object):
     """Online summarization of a sequence of scalars.
 
-    Summary computes the statistics of given scalars online.
+    Summary computes the statistics of given scalars online. It uses the
+    weighted variant of Welford's algorithm, so the variance never suffers
+    from the cancellation of the naive ``E[x^2] - E[x]^2`` formula.
 
     """
 
     def __init__(self):
-        self._x = 0.0
-        self._x2 = 0.0
         self._n = 0
+        self._mean = 0.0
+        self._m2 = 0.0
 
     def add(self, value, weight=1):
         """Adds a scalar value.
@@ -183,21 +492,30 @@ class Summary(object):
                 Default is 1 (integer).
 
         """
-        # if isinstance(value, chainerx.ndarray):
-        #     # ChainerX arrays does not support inplace assignment if it's
-        #     # connected to the backprop graph.
-        #     value = value.as_grad_stopped()
+        n = self._n + weight
+        delta = value - self._mean
+        self._mean += delta * weight / n
+        self._m2 += weight * delta * (value - self._mean)
+        self._n = n
 
-        # with _get_device(value):
-        self._x += weight * value
-        self._x2 += weight * value * value
-        self._n += weight
+    def merge(self, other):
+        """Merges the statistics of another summary into this one.
+
+        Args:
+            other (Summary): Summary to merge. It is not modified.
+
+        """
+        n = self._n + other._n
+        if n == 0:
+            return
+        delta = other._mean - self._mean
+        self._mean += delta * other._n / n
+        self._m2 += other._m2 + delta * delta * self._n * other._n / n
+        self._n = n
 
     def compute_mean(self):
         """Computes the mean."""
-        x, n = self._x, self._n
-        # with _get_device(x):
-        return x / n
+        return self._mean
 
     def make_statistics(self):
         """Computes and returns the mean and standard deviation values.
@@ -206,20 +524,9 @@ class Summary(object):
             tuple: Mean and standard deviation values.
 
         """
-        x, n = self._x, self._n
-        # with _get_device(x):
-        mean = x / n
-        var = self._x2 / n - mean * mean
+        var = max(self._m2 / self._n, 0.0)
         std = math.sqrt(var)
-        return mean, std
-
-    # def serialize(self, serializer):
-    #     try:
-    #         self._x = serializer('_x', self._x)
-    #         self._x2 = serializer('_x2', self._x2)
-    #         self._n = serializer('_n', self._n)
-    #     except KeyError:
-    #         warnings.warn('The previous statistics are not saved.')
+        return self._mean, std
 
 
 class DictSummary(object):
@@ -229,10 +536,37 @@ class DictSummary(object):
     It only computes the statistics for scalar values and variables of scalar
     values in the dictionaries.
 
+    Every key owns a slot in preallocated weight, mean and squared deviation
+    arrays, and :meth:`add` updates the slots of all the keys of a dictionary
+    with one vectorized Welford step. GPU tensors in the dictionary are kept
+    on their device until the statistics are read, and are then copied to the
+    host with one transfer per device, so that adding the values reported on
+    every iteration does not synchronize the device.
+
+    Args:
+        capacity (int): Initial number of slots. The arrays grow
+            geometrically when more keys are added.
+
     """
 
-    def __init__(self):
-        self._summaries = collections.defaultdict(Summary)
+    def __init__(self, capacity=16):
+        self._slots = {}
+        self._n = numpy.zeros(capacity)
+        self._mean = numpy.zeros(capacity)
+        self._m2 = numpy.zeros(capacity)
+        self._deferred = []
+
+    def _slot(self, name):
+        slot = self._slots.get(name)
+        if slot is None:
+            slot = len(self._slots)
+            if slot == len(self._n):
+                grow = numpy.zeros(len(self._n))
+                self._n = numpy.concatenate((self._n, grow))
+                self._mean = numpy.concatenate((self._mean, grow))
+                self._m2 = numpy.concatenate((self._m2, grow))
+            self._slots[name] = slot
+        return slot
 
     def add(self, d):
         """Adds a dictionary of scalars.
@@ -244,8 +578,9 @@ class DictSummary(object):
                is a tuple, the second element is interpreted as a weight.
 
         """
-
-        summaries = self._summaries
+        slots = []
+        values = []
+        weights = []
         for k, v in six.iteritems(d):
             w = 1
             if isinstance(v, tuple):
@@ -256,9 +591,116 @@ class DictSummary(object):
                 if not numpy.isscalar(w) and not getattr(w, 'ndim', -1) == 0:
                     raise ValueError('Given weight to {} was not scalar.'.format(k))
             if isinstance(v, torch.Tensor):
-                v = v.cpu().numpy()
-            if numpy.isscalar(v) or getattr(v, 'ndim', -1) == 0:
-                summaries[k].add(v, weight=w)
+                if v.dim() != 0:
+                    continue
+                if v.is_cuda:
+                    # copied later together with the other tensors of the device
+                    self._deferred.append((self._slot(k), v.detach(), w))
+                    continue
+                v = v.item()
+            elif not _is_scalar(v):
+                continue
+            slot = self._slots.get(k)
+            if slot is None:
+                slot = self._slot(k)
+            slots.append(slot)
+            values.append(v)
+            weights.append(w)
+
+        if not slots:
+            return
+
+        self._update(numpy.array(slots), numpy.array(values, dtype=numpy.float64),
+                     numpy.array(weights, dtype=numpy.float64))
+
+    def _fold(self):
+        deferred = self._deferred
+        if not deferred:
+            return
+        self._deferred = []
+
+        by_device = collections.defaultdict(list)
+        for entry in deferred:
+            by_device[entry[1].device].append(entry)
+        for entries in six.itervalues(by_device):
+            packed = torch.stack([v.to(torch.float64) for _, v, _ in entries])
+            x = packed.cpu().numpy()
+            # one step per value, since a key may have been added many times
+            for i, (slot, _, w) in enumerate(entries):
+                self._update(numpy.array([slot]), x[i:i + 1], numpy.array([w], dtype=numpy.float64))
+
+    def _update(self, slots, x, w):
+        n = self._n[slots] + w
+        mean = self._mean[slots]
+        delta = x - mean
+        ratio = numpy.divide(w, n, out=numpy.zeros_like(w), where=n != 0)
+        mean = mean + delta * ratio
+        self._m2[slots] += w * delta * (x - mean)
+        self._mean[slots] = mean
+        self._n[slots] = n
+
+    def merge(self, other):
+        """Merges the statistics of another summary into this one.
+
+        The merge is exact, so summaries accumulated on different shards or
+        ranks can be combined into the summary of the whole data.
+
+        Args:
+            other (DictSummary): Summary to merge. It is not modified.
+
+        """
+        other._fold()
+        if not other._slots:
+            return
+        self._fold()
+        names = list(other._slots.keys())
+        theirs = numpy.array([other._slots[name] for name in names])
+        slots = numpy.array([self._slot(name) for name in names])
+
+        n_a, n_b = self._n[slots], other._n[theirs]
+        n = n_a + n_b
+        delta = other._mean[theirs] - self._mean[slots]
+        ratio = numpy.divide(n_b, n, out=numpy.zeros_like(n), where=n != 0)
+        self._m2[slots] += other._m2[theirs] + delta * delta * n_a * ratio
+        self._mean[slots] += delta * ratio
+        self._n[slots] = n
+
+    def all_reduce(self):
+        """Reduces the statistics over the processes of the default group.
+
+        Every process must call it at the same point. Afterwards, the summary
+        of every process holds the statistics of the values added on all of
+        them. Repeated reductions should use one :class:`SummaryReducer`
+        instead, which keeps the agreed keys between calls.
+
+        Returns:
+            DictSummary: This summary.
+
+        """
+        return SummaryReducer().reduce(self)
+
+    def state_dict(self):
+        """Returns the names and the statistics arrays of the summary."""
+        self._fold()
+        size = len(self._slots)
+        names = sorted(self._slots, key=self._slots.get)
+        return {'names': names,
+                'n': torch.from_numpy(self._n[:size].copy()),
+                'mean': torch.from_numpy(self._mean[:size].copy()),
+                'm2': torch.from_numpy(self._m2[:size].copy())}
+
+    def load_state_dict(self, state):
+        """Restores the state returned by :meth:`state_dict`."""
+        names = state['names']
+        self._deferred = []
+        self._slots = {name: slot for slot, name in enumerate(names)}
+        capacity = max(len(names), 1)
+        self._n = numpy.zeros(capacity)
+        self._mean = numpy.zeros(capacity)
+        self._m2 = numpy.zeros(capacity)
+        self._n[:len(names)] = state['n'].numpy()
+        self._mean[:len(names)] = state['mean'].numpy()
+        self._m2[:len(names)] = state['m2'].numpy()
 
     def compute_mean(self):
         """Creates a dictionary of mean values.
@@ -270,8 +712,9 @@ class DictSummary(object):
             dict: Dictionary of mean values.
 
         """
-        return {name: summary.compute_mean()
-                for name, summary in six.iteritems(self._summaries)}
+        self._fold()
+        mean = self._mean
+        return {name: mean[slot] for name, slot in six.iteritems(self._slots)}
 
     def make_statistics(self):
         """Creates a dictionary of statistics.
@@ -285,28 +728,132 @@ class DictSummary(object):
             dict: Dictionary of statistics of all entries.
 
         """
+        self._fold()
+        size = len(self._slots)
+        var = self._m2[:size] / self._n[:size]
+        std = numpy.sqrt(numpy.maximum(var, 0.0))
+
         stats = {}
-        for name, summary in six.iteritems(self._summaries):
-            mean, std = summary.make_statistics()
-            stats[name] = mean
-            stats[name + '.std'] = std
+        for name, slot in six.iteritems(self._slots):
+            stats[name] = self._mean[slot]
+            stats[name + '.std'] = std[slot]
 
         return stats
 
-    # def serialize(self, serializer):
-    #     if isinstance(serializer, serializer_module.Serializer):
-    #         names = list(self._summaries.keys())
-    #         serializer('_names', json.dumps(names))
-    #         for index, name in enumerate(names):
-    #             self._summaries[name].serialize(
-    #                 serializer['_summaries'][str(index)])
-    #     else:
-    #         self._summaries.clear()
-    #         try:
-    #             names = json.loads(serializer('_names', ''))
-    #         except KeyError:
-    #             warnings.warn('The names of statistics are not saved.')
-    #             return
-    #         for index, name in enumerate(names):
-    #             self._summaries[name].serialize(
-    #                 serializer['_summaries'][str(index)])
+    def __getstate__(self):
+        self._fold()
+        return self.__dict__.copy()
+
+    def __setstate__(self, state):
+        state.setdefault('_deferred', [])
+        self.__dict__.update(state)
+
+
+class SummaryReducer(object):
+    """Reduces :class:`DictSummary` objects over the processes of a group.
+
+    The weights, the sums and the sums of squares of all the keys are packed
+    into one float64 tensor and summed with a single ``all_reduce``, from
+    which the global means and squared deviations are recovered. The values
+    are shifted by the global means of the previous reduction, which keeps
+    the sums of squares well conditioned when the means are large compared
+    to the deviations.
+
+    The processes agree on the order of the keys beforehand. The packed
+    tensor also counts the keys unknown to the reducer, and when any process
+    has one, the keys are exchanged together with their local means, which
+    become the shifts of the new keys, and the reduction is repeated. This
+    only happens when new keys appear, so a reduction usually costs one
+    collective whatever the number of keys.
+
+    Without a process group of several processes, :meth:`reduce` does
+    nothing.
+
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._index = {}
+        self._shift = numpy.zeros(0)
+
+    def reduce(self, summary):
+        """Reduces a summary in place.
+
+        Every process must call it at the same point.
+
+        Args:
+            summary (DictSummary): Summary to reduce.
+
+        Returns:
+            DictSummary: The given summary.
+
+        """
+        if distributed.get_world_size() == 1:
+            return summary
+
+        summary._fold()
+        unknown = sum(1 for name in summary._slots if name not in self._index)
+        packed = self._all_reduce(summary, unknown)
+        if packed[-1] > 0:
+            means = {name: float(summary._mean[slot]) for name, slot in six.iteritems(summary._slots)
+                     if name not in self._index and summary._n[slot] > 0}
+            shifts = collections.defaultdict(list)
+            for local_means in distributed.all_gather_object(means):
+                for name, mean in six.iteritems(local_means):
+                    shifts[name].append(mean)
+            self._add_keys({name: sum(values) / len(values) for name, values in six.iteritems(shifts)})
+            packed = self._all_reduce(summary, 0)
+
+        size = len(self._keys)
+        n = packed[:size]
+        total = packed[size:2 * size]
+        squares = packed[2 * size:3 * size]
+        present = numpy.flatnonzero(n > 0)
+        n = n[present]
+        mean = total[present] / n
+        m2 = numpy.maximum(squares[present] - total[present] * mean, 0.0)
+        mean += self._shift[present]
+        self._shift[present] = mean
+
+        summary._slots = {self._keys[index]: slot for slot, index in enumerate(present)}
+        capacity = max(len(present), 1)
+        summary._n = numpy.zeros(capacity)
+        summary._mean = numpy.zeros(capacity)
+        summary._m2 = numpy.zeros(capacity)
+        summary._n[:len(present)] = n
+        summary._mean[:len(present)] = mean
+        summary._m2[:len(present)] = m2
+        return summary
+
+    def _add_keys(self, shifts):
+        names = sorted(shifts)
+        for name in names:
+            self._index[name] = len(self._keys)
+            self._keys.append(name)
+        self._shift = numpy.concatenate((self._shift, [shifts[name] for name in names]))
+
+    def _all_reduce(self, summary, unknown):
+        size = len(self._keys)
+        packed = numpy.zeros(3 * size + 1)
+        names = [name for name in summary._slots if name in self._index]
+        if names:
+            index = numpy.array([self._index[name] for name in names])
+            slots = numpy.array([summary._slots[name] for name in names])
+            n = summary._n[slots]
+            delta = summary._mean[slots] - self._shift[index]
+            packed[index] = n
+            packed[size + index] = n * delta
+            packed[2 * size + index] = summary._m2[slots] + n * delta * delta
+        packed[-1] = unknown
+
+        tensor = torch.from_numpy(packed)
+        if dist.get_backend() == 'nccl':
+            tensor = tensor.to(torch.device('cuda', torch.cuda.current_device()))
+        dist.all_reduce(tensor)
+        return tensor.cpu().numpy()
+
+
+def _is_scalar(value):
+    if isinstance(value, (six.string_types, bytes)):
+        return False
+    return numpy.isscalar(value) or getattr(value, 'ndim', -1) == 0
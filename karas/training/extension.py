@@ -10,6 +10,10 @@ class Extension(object):
     _priority = PRIORITY_READER
     _name = None
 
+    #: Whether the extension only runs in the main process of data-parallel
+    #: training. Its trigger is still polled in every process.
+    main_process_only = False
+
     def __call__(self, trainer):
         """
         connect to trainer
@@ -18,6 +22,18 @@ class Extension(object):
         """
         raise NotImplementedError
 
+    def state_dict(self):
+        """Returns the state of the extension to save in a checkpoint.
+
+        The state only holds values needed to resume the training, such as
+        counters and tensors. Stateless extensions return an empty dict.
+        """
+        return {}
+
+    def load_state_dict(self, state):
+        """Restores the state returned by :meth:`state_dict`."""
+        pass
+
     @property
     def default_name(self):
         return type(self).__name__
@@ -1,7 +1,32 @@
-from karas.training.extensions.log_report import LogReport
-from karas.training.extensions.lr_observer import LrObserver
-from karas.training.extensions.lr_scheduler import LrScheduler
-from karas.training.extensions.print_report import PrintReport
-from karas.training.extensions.progress_bar import ProgressBar
-from karas.training.extensions.snapshot import Snapshot
-from karas.training.extensions.tensorboard import TensorBoard
+"""Trainer extensions.
+
+The extensions are imported when they are first accessed, so that importing
+this package does not import the optional dependencies of the extensions
+that are not used, such as ``tensorboardX``.
+"""
+import importlib
+
+_modules = {'Dashboard': 'dashboard',
+            'Evaluator': 'evaluator',
+            'LogReport': 'log_report',
+            'LrObserver': 'lr_observer',
+            'LrScheduler': 'lr_scheduler',
+            'PrintReport': 'print_report',
+            'ProgressBar': 'progress_bar',
+            'Snapshot': 'snapshot',
+            'TensorBoard': 'tensorboard'}
+
+__all__ = sorted(_modules)
+
+
+def __getattr__(name):
+    module = _modules.get(name)
+    if module is None:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = getattr(importlib.import_module('{}.{}'.format(__name__, module)), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_modules))
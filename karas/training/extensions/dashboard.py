@@ -0,0 +1,217 @@
+from __future__ import division
+
+import collections
+import datetime
+import os
+import sys
+import threading
+import time
+
+from karas.training import extension
+from karas.training import utils
+from karas.training.extensions import log_report as log_report_module
+
+
+class Dashboard(extension.Extension):
+    """Trainer extension to show the log and the progress on the console.
+
+    It combines :class:`PrintReport` and :class:`ProgressBar`, but the
+    console is written by a background thread. On the training thread, the
+    extension only publishes the counters of the trainer as one tuple and
+    queues the new entries of the log. The background thread wakes up at a
+    fixed wall-clock rate, prints the queued entries below a header printed
+    once, and redraws the progress bars under them. The iteration speed is
+    estimated from a ring buffer of the recently rendered counters.
+
+    Args:
+        entries (list of str): List of keys of the log entries to print. If
+            it is None, no log entry is printed.
+        log_report (str or LogReport): Log report to accumulate the
+            observations. This is either the name of a LogReport extensions
+            registered to the trainer, or a LogReport instance to use
+            internally.
+        training_length (tuple): Length of whole training. It consists of an
+            integer and either ``'epoch'`` or ``'iteration'``. If this value is
+            omitted, the ``get_training_length`` method of the stop trigger
+            is used.
+        refresh_interval (float): Seconds between two renderings.
+        bar_length (int): Length of the progress bars in characters.
+        history (int): Number of renderings used to estimate the speed.
+        out: Stream to write to. Standard output is used by default.
+
+    """
+
+    main_process_only = True
+
+    def __init__(self, entries=None, log_report='LogReport', training_length=None, refresh_interval=0.5,
+                 bar_length=50, history=100, out=sys.stdout):
+        self._entries = entries
+        self._log_report = log_report
+        self._training_length = training_length
+        self._refresh_interval = refresh_interval
+        self._bar_length = bar_length
+        self._history = history
+        self._out = out
+
+        self._templates = []
+        self._header = ''
+        if entries:
+            entry_widths = [max(10, len(s)) for s in entries]
+            self._header = '  '.join(('{:%d}' % w for w in entry_widths)).format(*entries) + '\n'
+            for entry, w in zip(entries, entry_widths):
+                self._templates.append((entry, '{:<%dg}  ' % w, ' ' * (w + 2)))
+
+        self._reset()
+
+    def _reset(self):
+        self._log_len = 0  # number of log entries already queued
+        self._snapshot = None
+        self._rows = collections.deque()
+        self._thread = None
+        self._stop = None
+        self._error = None
+
+    def initialize(self, trainer):
+        if self._training_length is None:
+            self._training_length = trainer.stop_trigger.get_training_length()
+        self._snapshot = (trainer.iteration, trainer.epoch, trainer.epoch_detail, time.time())
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __call__(self, trainer):
+        self._publish(trainer)
+
+    def _publish(self, trainer):
+        if self._entries:
+            log_report = self._log_report
+            if isinstance(log_report, str):
+                log_report = trainer.get_extension(log_report)
+            elif isinstance(log_report, log_report_module.LogReport):
+                log_report(trainer)  # update the log report
+            else:
+                raise TypeError('log report has a wrong type %s' % type(log_report))
+            log = log_report.log
+            while len(log) > self._log_len:
+                self._rows.append(log[self._log_len])
+                self._log_len += 1
+
+        # a single assignment, so the rendering thread sees consistent counters
+        self._snapshot = (trainer.iteration, trainer.epoch, trainer.epoch_detail, time.time())
+
+    def finalize(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self):
+        timing = collections.deque(maxlen=self._history)
+        show_header = True
+        try:
+            while True:
+                stopped = self._stop.wait(self._refresh_interval)
+                text = []
+                if self._rows and show_header:
+                    text.append(self._header)
+                    show_header = False
+                while self._rows:
+                    text.append(self._format_row(self._rows.popleft()))
+
+                snapshot = self._snapshot
+                if not timing or timing[-1] != snapshot:
+                    timing.append(snapshot)
+                self._render(text, timing, final=stopped)
+                if stopped:
+                    return
+        except Exception as e:
+            self._error = e
+
+    def _format_row(self, row):
+        text = []
+        for entry, template, empty in self._templates:
+            if entry in row:
+                text.append(template.format(row[entry]))
+            else:
+                text.append(empty)
+        text.append('\n')
+        return ''.join(text)
+
+    def _render(self, text, timing, final):
+        out = self._out
+        windows = os.name == 'nt'
+        if windows:
+            utils.erase_console(0, 0)
+        else:
+            text.insert(0, '\033[J')
+
+        if not final:
+            text.extend(self._format_progress(timing))
+            if not windows:
+                # move the cursor to the head of the progress bars
+                text.append('\033[4A')
+
+        out.write(''.join(text))
+        if windows and not final:
+            utils.set_console_cursor_position(0, -4)
+        if hasattr(out, 'flush'):
+            out.flush()
+
+    def _format_progress(self, timing):
+        length, unit = self._training_length
+        iteration, epoch, epoch_detail, now = timing[-1]
+
+        if unit == 'iteration':
+            rate = iteration / length
+        else:
+            rate = epoch_detail / length
+        rate = min(rate, 1.0)
+
+        bar_length = self._bar_length
+        lines = []
+        marks = '#' * int(rate * bar_length)
+        lines.append('     total [{}{}] {:6.2%}\n'.format(marks, '.' * (bar_length - len(marks)), rate))
+
+        epoch_rate = epoch_detail - int(epoch_detail)
+        marks = '#' * int(epoch_rate * bar_length)
+        lines.append('this epoch [{}{}] {:6.2%}\n'.format(marks, '.' * (bar_length - len(marks)), epoch_rate))
+
+        lines.append('{:10} iter, {} epoch / {} {}s\n'.format(iteration, epoch, length, unit))
+
+        old_t, _, old_e, old_sec = timing[0]
+        span = now - old_sec
+        if span != 0:
+            speed_t = (iteration - old_t) / span
+            speed_e = (epoch_detail - old_e) / span
+        else:
+            speed_t = float('inf')
+            speed_e = float('inf')
+
+        if unit == 'iteration':
+            estimated_time = (length - iteration) / speed_t if speed_t else float('inf')
+        else:
+            estimated_time = (length - epoch_detail) / speed_e if speed_e else float('inf')
+        if estimated_time == float('inf'):
+            estimate = 'unknown'
+        else:
+            estimate = str(datetime.timedelta(seconds=max(estimated_time, 0.0)))
+        lines.append('{:10.5g} iters/sec. Estimated time to finish: {}.\n'.format(speed_t, estimate))
+        return lines
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_out']
+        for key in ('_log_len', '_snapshot', '_rows', '_thread', '_stop', '_error'):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        state['_out'] = sys.stdout
+        self.__dict__.update(state)
+        self._reset()
@@ -0,0 +1,268 @@
+import copy
+import multiprocessing
+from concurrent import futures
+
+import six
+import torch
+from torch.nn.parallel import DistributedDataParallel
+
+from karas.training import extension
+from karas.training import utils
+from karas.training.triggers.utils import get_trigger
+from karas.training.triggers.utils import load_trigger_state_dict
+from karas.training.triggers.utils import trigger_state_dict
+
+#: Tag of the description of the last evaluation in the observation.
+EVALUATION_TAG = 'test/others/evaluation'
+
+
+class Evaluator(extension.Extension):
+    """Trainer extension to evaluate a model on a loader.
+
+    The model is run in the inference mode over the whole loader, and each
+    metric is summed over the samples on the device of the evaluation. The
+    sums are copied to the host once at the end, and their means are
+    reported as ``scalar/<name>``, e.g. ``test/scalar/accuracy``, along with
+    the iteration whose weights were evaluated as
+    ``others/evaluated_iteration``. The observation of the iteration of the
+    report also holds, under :data:`EVALUATION_TAG`, a dictionary of the
+    ``iteration`` and the ``epoch`` of the evaluated weights, the ``tags``
+    of the results and the ``results`` keyed by the tags, from which
+    :class:`LogReport` and :class:`TensorBoard` attribute the results to the
+    evaluated iteration. All of them are transient, so they are removed from
+    the observation at the end of the iteration of the report, and
+    extensions reading them must be called on that iteration, or subscribe
+    to them as :class:`TensorBoard` does.
+
+    In the ``'sync'`` mode, the training waits for the evaluation. In the
+    ``'thread'`` and ``'process'`` modes, the weights are copied when the
+    trigger fires and evaluated by a private copy of the model on a
+    background thread or in a spawned process, while the training
+    continues. The results are reported at the first iteration after they
+    are ready, so triggers such as :class:`MaxValueTrigger` and
+    :class:`EarlyStoppingTrigger` see them as in the ``'sync'`` mode, only
+    later, and they do not fire while no result has been reported yet. At
+    most one evaluation runs at a time. When the trigger fires during an
+    evaluation, the training waits for it and reports it first. Evaluations
+    still running when the training finishes are waited for, and their
+    results are discarded.
+
+    Args:
+        loader: Loader to evaluate on, or the name of a loader of the
+            trainer. In the ``'process'`` mode, it is pickled once into the
+            evaluation process.
+        model (torch.nn.Module): Model to evaluate. If it is None, the
+            ``model`` attribute of the updater is evaluated.
+        metrics (dict): Metrics keyed by names. A metric is a callable
+            computing from the output and the target either a tensor of the
+            values of the samples of the batch, or a scalar taken as their
+            mean. In the ``'process'`` mode, the metrics must be picklable.
+            If it is None, the accuracy of a classifier is computed.
+        converter: Callable converting a batch and a device into the input
+            and the target. If it is None, the batch is a pair of the input
+            and the target, which are transferred to the device.
+        mode (str): ``'sync'``, ``'thread'`` or ``'process'``.
+        device: Device of the evaluation. If it is None, the device of the
+            updater is used, except in the ``'process'`` mode, which
+            evaluates on CPU.
+
+    """
+
+    _priority = extension.PRIORITY_WRITER
+
+    def __init__(self, loader='test', model=None, metrics=None, converter=None, mode='sync', device=None):
+        if mode not in ('sync', 'thread', 'process'):
+            raise ValueError('mode must be one of \'sync\', \'thread\' and \'process\'')
+        self._loader = loader
+        self._model = model
+        self._metrics = {'accuracy': accuracy} if metrics is None else metrics
+        self._converter = _convert if converter is None else converter
+        self._mode = mode
+        self._device = device
+        self._trigger = get_trigger((1, 'epoch'))
+        self._polling_trigger = _EvaluationTrigger(self)
+        self._worker = None
+        self._executor = None
+        self._pending = None
+
+    @property
+    def trigger(self):
+        if self._mode == 'sync':
+            return self._trigger
+        return self._polling_trigger
+
+    @trigger.setter
+    def trigger(self, trigger):
+        self._trigger = get_trigger(trigger)
+
+    def __call__(self, trainer):
+        if self._mode == 'sync':
+            model = self._get_model(trainer)
+            worker = _Worker(model, self._get_loader(trainer), self._converter, self._metrics,
+                             self._get_device(trainer))
+            training = model.training
+            try:
+                results = worker.evaluate()
+            finally:
+                model.train(training)
+            self._report(trainer, trainer.iteration, trainer.epoch, results)
+            return
+
+        if self._pending is not None and (self._pending[2].done() or self._polling_trigger.fired):
+            iteration, epoch, future = self._pending
+            self._report(trainer, iteration, epoch, future.result())
+            self._pending = None
+
+        if self._polling_trigger.fired:
+            self._submit(trainer)
+
+    def finalize(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._pending = None
+        self._worker = None
+
+    def _submit(self, trainer):
+        model = self._get_model(trainer)
+        if self._mode == 'thread':
+            if self._executor is None:
+                self._worker = _Worker(copy.deepcopy(model), self._get_loader(trainer), self._converter,
+                                       self._metrics, self._get_device(trainer))
+                self._executor = futures.ThreadPoolExecutor(max_workers=1)
+            # the weights are copied and the loader is started on the training
+            # thread, so the weights are consistent and the random generator
+            # drawn by the loader is drawn at the same point as in the sync mode
+            state = {name: value.detach().clone() for name, value in six.iteritems(model.state_dict())}
+            batches = iter(self._worker.loader)
+            future = self._executor.submit(self._worker.evaluate, state, batches)
+        else:
+            if self._executor is None:
+                initargs = (utils.cpu_copy_module(model), self._get_loader(trainer), self._converter,
+                            self._metrics, self._get_device(trainer))
+                self._executor = futures.ProcessPoolExecutor(max_workers=1,
+                                                             mp_context=multiprocessing.get_context('spawn'),
+                                                             initializer=_init_process, initargs=initargs)
+            future = self._executor.submit(_evaluate_in_process, utils.copy_to_cpu(model.state_dict()))
+        self._pending = (trainer.iteration, trainer.epoch, future)
+
+    def _ready(self):
+        return self._pending is not None and self._pending[2].done()
+
+    def _report(self, trainer, iteration, epoch, results):
+        reporter = trainer.reporter
+        with reporter.scope('scalar'):
+            reporter.report(results, transient=True)
+            tags = ['{}/{}'.format(reporter.namespace, name) for name in results]
+        with reporter.scope('others'):
+            # transient like the results, so stale ones are never read again
+            reporter.report({'evaluated_iteration': iteration,
+                             'evaluation': {'iteration': iteration, 'epoch': epoch, 'tags': tags,
+                                            'results': dict(zip(tags, results.values()))}},
+                            transient=True)
+
+    def _get_model(self, trainer):
+        model = trainer.updater.model if self._model is None else self._model
+        if isinstance(model, DistributedDataParallel):
+            model = model.module
+        return model
+
+    def _get_loader(self, trainer):
+        if isinstance(self._loader, six.string_types):
+            return trainer.get_loader(self._loader)
+        return self._loader
+
+    def _get_device(self, trainer):
+        if self._device is not None:
+            return torch.device(self._device)
+        if self._mode == 'process':
+            return torch.device('cpu')
+        return torch.device(trainer.updater.device)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_worker'] = None
+        state['_executor'] = None
+        state['_pending'] = None
+        return state
+
+
+class _EvaluationTrigger(object):
+    """Trigger of an asynchronous :class:`Evaluator`.
+
+    It fires when the trigger of the evaluator fires, which starts an
+    evaluation, and when the result of an evaluation is ready to report.
+
+    """
+
+    def __init__(self, evaluator):
+        self._evaluator = evaluator
+        self.fired = False
+
+    def __call__(self, trainer):
+        self.fired = self._evaluator._trigger(trainer)
+        return self.fired or self._evaluator._ready()
+
+    def state_dict(self):
+        return trigger_state_dict(self._evaluator._trigger)
+
+    def load_state_dict(self, state):
+        load_trigger_state_dict(self._evaluator._trigger, state)
+
+
+class _Worker(object):
+    """Evaluates a model on a loader."""
+
+    def __init__(self, model, loader, converter, metrics, device):
+        self.model = model.to(device)
+        self.loader = loader
+        self.converter = converter
+        self.metrics = metrics
+        self.device = device
+
+    def evaluate(self, state=None, batches=None):
+        model = self.model
+        if state is not None:
+            model.load_state_dict(state)
+        model.eval()
+
+        totals = {}
+        count = 0
+        with torch.inference_mode():
+            for batch in self.loader if batches is None else batches:
+                input, target = self.converter(batch, self.device)
+                output = model(input)
+                size = len(target)
+                for name, metric in six.iteritems(self.metrics):
+                    value = metric(output, target).to(torch.float64)
+                    value = value.sum() if value.dim() > 0 else value * size
+                    totals[name] = totals[name] + value if name in totals else value
+                count += size
+
+        if not totals:
+            return {}
+        names = list(totals)
+        means = torch.stack([totals[name] for name in names]).cpu() / count
+        return dict(zip(names, means.tolist()))
+
+
+_process_worker = None
+
+
+def _init_process(model, loader, converter, metrics, device):
+    global _process_worker
+    _process_worker = _Worker(model, loader, converter, metrics, device)
+
+
+def _evaluate_in_process(state):
+    return _process_worker.evaluate(state)
+
+
+def _convert(batch, device):
+    input, target = batch
+    return input.to(device), target.to(device)
+
+
+def accuracy(output, target):
+    """Returns whether the class of the highest score is the target, per sample."""
+    return output.argmax(dim=1).eq(target.view(-1))
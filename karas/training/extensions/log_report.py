@@ -1,13 +1,22 @@
+import array
 import json
 import os
 import shutil
+import warnings
 
 import six
+import torch
+from six.moves import collections_abc
 
-from karas import compare_key
+from karas import KeyMatcher
+from karas import distributed
 from karas import reporter
+from karas.metric_store import MetricStore
 from karas.training import extension, utils
+from karas.training.extensions.evaluator import EVALUATION_TAG
 from karas.training.triggers.utils import get_trigger
+from karas.training.triggers.utils import load_trigger_state_dict
+from karas.training.triggers.utils import trigger_state_dict
 
 
 class LogReport(extension.Extension):
@@ -19,12 +28,20 @@ class LogReport(extension.Extension):
 
     There are two triggers to handle this extension. One is the trigger to
     invoke this extension, which is used to handle the timing of accumulating
-    the results. It is set to ``1, 'iteration'`` by default. The other is the
-    trigger to determine when to emit the result. When this trigger returns
+    the results. It is set to ``1, 'iteration'`` by default, and it is the one
+    given to :meth:`Trainer.extend`. The other is the trigger to determine
+    when to emit the result, given to the constructor. When this trigger returns
     True, this extension appends the summary of accumulated values to the list
     of past summaries, and writes the list to the log file. Then, this
     extension makes a new fresh summary object which is used until the next
-    time that the trigger fires.
+    time that the trigger fires. The results of an :class:`Evaluator` only
+    stay in the observation of the iteration they are reported at, so they
+    are missed if this extension is not invoked on that iteration.
+
+    The result dictionaries are stored as rows of a :class:`MetricStore`,
+    which keeps one column per key, and :attr:`log` is a read-only sequence
+    of dictionaries built from the rows on access. Queries over the history,
+    such as the best value of a key, are answered by the store directly.
 
     It also adds some entries to each result dictionary.
 
@@ -33,6 +50,12 @@ class LogReport(extension.Extension):
     - ``'elapsed_time'`` is the elapsed time in seconds since the training
       begins. The value is taken from :attr:`Trainer.elapsed_time`.
 
+    The results of an :class:`Evaluator` reported after the iteration whose
+    weights they evaluate, as in its asynchronous modes, are not accumulated.
+    They are output in a result dictionary of their own, whose ``'epoch'``
+    and ``'iteration'`` are those of the evaluated weights, as soon as they
+    are reported.
+
     Args:
         keys (iterable of strs): Keys of values to accumulate. If this is None,
             all the values are accumulated and output to the log file.
@@ -49,34 +72,84 @@ class LogReport(extension.Extension):
             formatting. For example, users can use '{iteration}' to separate
             the log files for different iterations. If the log name is None, it
             does not output the log to any file.
+        stream (bool): If ``True``, each result dictionary is appended to the
+            log file as one line of JSON (JSON Lines) instead of rewriting the
+            whole log on every output. The log name is formatted only with the
+            first result dictionary. When the extension is restored from a
+            snapshot, the log file is truncated to the records that existed
+            when the snapshot was taken, which also drops a record torn by a
+            crash.
+        flush (str): Durability of the streamed records. ``'none'`` leaves
+            the records in the file buffer, ``'flush'`` flushes the buffer after
+            every record and ``'fsync'`` also forces the record to the disk.
+        window (int): Number of the latest result dictionaries kept in the
+            store. Older ones are dropped from the store and read back from
+            the log file when they are accessed through :attr:`log`. It
+            requires ``stream`` and a log name. If it is None, all the result
+            dictionaries are kept.
+        store (MetricStore): Store of the result dictionaries. If it is
+            None, an in-memory store is used.
 
     """
 
-    def __init__(self, keys=None, trigger=(1, 'epoch'), postprocess=None, log_name='log'):
+    def __init__(self, keys=None, trigger=(1, 'epoch'), postprocess=None, log_name='log', stream=False,
+                 flush='flush', window=None, store=None):
+        if flush not in ('none', 'flush', 'fsync'):
+            raise ValueError('flush must be one of \'none\', \'flush\' and \'fsync\'')
+        if window is not None and (not stream or log_name is None):
+            raise ValueError('window requires stream mode and a log name')
+
         self._keys = keys
+        self._matcher = None if keys is None else KeyMatcher(keys)
         self._trigger = get_trigger(trigger)
+        self._extension_trigger = get_trigger((1, 'iteration'))
         self._postprocess = postprocess
         self._log_name = log_name
-        self._log = []
+        self._stream = stream
+        self._flush = flush
+        self._store = MetricStore() if store is None else store
+        self._window = window
+        self._dropped = 0  # number of rows only left in the log file
 
+        # bookkeeping of the streamed log file
+        self._path = None
+        self._file = None
+        self._offsets = array.array('q')
+        self._size = 0
+
+        self._reducer = reporter.SummaryReducer()
+        self._last_evaluated = None
         self._init_summary()
 
     def __call__(self, trainer):
         # accumulate the observations
-        keys = self._keys
         observation = trainer.observation
         summary = self._summary
 
-        if keys is None:
+        evaluation = observation.get(EVALUATION_TAG)
+        if evaluation is not None and evaluation['iteration'] != self._last_evaluated:
+            self._last_evaluated = evaluation['iteration']
+            if evaluation['iteration'] != trainer.iteration:
+                # late results of an evaluation go to the row of the evaluated iteration
+                tags = set(evaluation['tags'])
+                self._output_evaluation(trainer, evaluation, {tag: observation[tag] for tag in tags})
+                observation = {tag: value for tag, value in six.iteritems(observation) if tag not in tags}
+
+        if self._matcher is None:
             summary.add(observation)
         else:
-            for tag in observation.keys():
-                for key in keys:
-                    if compare_key(key, tag):
-                        summary.add({key: observation[tag]})
+            values = {}
+            for key, tag in self._matcher.select(observation):
+                if key in values:
+                    # several tags match the key, accumulate each of them
+                    summary.add({key: observation[tag]})
+                else:
+                    values[key] = observation[tag]
+            summary.add(values)
 
-        if not self._trigger(trainer):
-            # output the result
+        if self._trigger(trainer):
+            # output the result of all the processes
+            self._reducer.reduce(self._summary)
             stats = self._summary.compute_mean()
             stats_cpu = {}
             for name, value in six.iteritems(stats):
@@ -85,30 +158,206 @@ class LogReport(extension.Extension):
             stats_cpu['epoch'] = trainer.epoch
             stats_cpu['iteration'] = trainer.iteration
             stats_cpu['elapsed_time'] = trainer.elapsed_time
+            self._output(trainer, stats_cpu)
 
-            if self._postprocess is not None:
-                self._postprocess(stats_cpu)
+            # reset the summary for the next output
+            self._init_summary()
+
+    def _output_evaluation(self, trainer, evaluation, results):
+        # every process evaluates the whole loader, so nothing is reduced
+        if self._matcher is None:
+            stats_cpu = {tag: float(value) for tag, value in six.iteritems(results)}
+        else:
+            stats_cpu = {key: float(results[tag]) for key, tag in self._matcher.select(results)}
+        if not stats_cpu:
+            return
+        stats_cpu['epoch'] = evaluation['epoch']
+        stats_cpu['iteration'] = evaluation['iteration']
+        stats_cpu['elapsed_time'] = trainer.elapsed_time
+        self._output(trainer, stats_cpu)
 
-            self._log.append(stats_cpu)
+    def _output(self, trainer, stats_cpu):
+        if self._postprocess is not None:
+            self._postprocess(stats_cpu)
 
-            # write to the log file
-            if self._log_name is not None:
+        self._store.append(stats_cpu)
+        if self._window is not None and len(self._store) > self._window:
+            self._dropped += len(self._store) - self._window
+            self._store.drop(len(self._store) - self._window)
+
+        # write to the log file, only once in data-parallel training
+        if self._log_name is not None and distributed.is_main_process():
+            if self._stream:
+                self._append(trainer, stats_cpu)
+            else:
                 log_name = self._log_name.format(**stats_cpu)
                 with utils.tempdir(prefix=log_name, dir=trainer.out) as tempd:
                     path = os.path.join(tempd, 'log.json')
                     with open(path, 'w') as f:
-                        json.dump(self._log, f, indent=4)
+                        json.dump(list(self._store.rows), f, indent=4)
 
                     new_path = os.path.join(trainer.out, log_name)
                     shutil.move(path, new_path)
 
-            # reset the summary for the next output
-            self._init_summary()
+    def finalize(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._store.flush()
+
+    @property
+    def trigger(self):
+        return self._extension_trigger
+
+    @trigger.setter
+    def trigger(self, trigger):
+        self._extension_trigger = get_trigger(trigger)
 
     @property
     def log(self):
-        """The current list of observation dictionaries."""
-        return self._log
+        """The current sequence of observation dictionaries."""
+        if self._window is None:
+            return self._store.rows
+        return _WindowedLog(self)
+
+    @property
+    def store(self):
+        """The :class:`MetricStore` holding the observation dictionaries.
+
+        With a window, it only holds the latest ones.
+        """
+        return self._store
+
+    def state_dict(self):
+        return {'store': self._store.state_dict(),
+                'dropped': self._dropped,
+                'path': self._path,
+                'offsets': torch.tensor(self._offsets, dtype=torch.int64),
+                'size': self._size,
+                'summary': self._summary.state_dict(),
+                'trigger': trigger_state_dict(self._trigger)}
+
+    def load_state_dict(self, state):
+        self.finalize()
+        if 'store' in state:
+            self._store.load_state_dict(state['store'])
+            self._dropped = state.get('dropped', 0)
+        else:
+            self._store.clear()
+            for row in state['log']:
+                self._store.append(row)
+            self._dropped = state['count'] - len(state['log'])
+        self._path = state['path']
+        self._offsets = array.array('q', state['offsets'].tolist())
+        self._size = state['size']
+        self._summary.load_state_dict(state['summary'])
+        if 'trigger' in state:
+            load_trigger_state_dict(self._trigger, state['trigger'])
 
     def _init_summary(self):
         self._summary = reporter.DictSummary()
+
+    def _append(self, trainer, stats):
+        if self._file is None:
+            self._open(trainer, stats)
+
+        line = (json.dumps(stats) + '\n').encode('utf-8')
+        self._offsets.append(self._size)
+        self._file.write(line)
+        self._size += len(line)
+
+        if self._flush != 'none':
+            self._file.flush()
+            if self._flush == 'fsync':
+                os.fsync(self._file.fileno())
+
+    def _open(self, trainer, stats):
+        if self._path is None:
+            self._path = os.path.join(trainer.out, self._log_name.format(**stats))
+
+        if not self._offsets or not os.path.exists(self._path):
+            # a fresh run overwrites the log of a previous one
+            self._offsets = array.array('q')
+            self._size = 0
+            self._file = open(self._path, 'wb')
+            return
+
+        # resumed run: drop what was written after the state was saved
+        f = open(self._path, 'r+b')
+        size = os.fstat(f.fileno()).st_size
+        if size < self._size:
+            warnings.warn('{} is shorter than expected, records after the last complete one are lost'
+                          .format(self._path))
+            f.seek(0)
+            size = f.read(size).rfind(b'\n') + 1
+            while self._offsets and self._offsets[-1] >= size:
+                self._offsets.pop()
+            self._size = size
+        f.truncate(self._size)
+        f.seek(self._size)
+        self._file = f
+
+    def _read(self, index):
+        if self._file is not None:
+            self._file.flush()
+        with open(self._path, 'rb') as f:
+            f.seek(self._offsets[index])
+            return json.loads(f.readline().decode('utf-8'))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self._file is not None:
+            self._file.flush()
+        state['_file'] = None
+        return state
+
+    def __setstate__(self, state):
+        if '_store' not in state:
+            store = MetricStore()
+            log = state.pop('_log')
+            for row in log:
+                store.append(row)
+            state['_store'] = store
+            state['_dropped'] = state.pop('_count', len(log)) - len(log)
+        if '_extension_trigger' not in state:
+            # both triggers used to be the same one, the emitting one is kept
+            state['_extension_trigger'] = get_trigger((1, 'iteration'))
+        self.__dict__.update(state)
+        if '_reducer' not in state:
+            self._reducer = reporter.SummaryReducer()
+        if '_last_evaluated' not in state:
+            self._last_evaluated = None
+        if '_dropped' not in state:
+            self._window = None
+            self._dropped = 0
+
+
+class _WindowedLog(collections_abc.Sequence):
+    """Read-only sequence of all the result dictionaries of a :class:`LogReport`.
+
+    The latest dictionaries come from the store, and older ones are read back
+    from the streamed log file.
+
+    """
+
+    def __init__(self, log_report):
+        self._log_report = log_report
+
+    def __len__(self):
+        return self._log_report._dropped + len(self._log_report._store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError('log index out of range')
+
+        dropped = self._log_report._dropped
+        if index >= dropped:
+            return self._log_report._store.row(index - dropped)
+        return self._log_report._read(index)
+
@@ -7,3 +7,9 @@ class LrScheduler(extension.Extension):
 
     def __call__(self, trainer):
         self._scheduler.step()
+
+    def state_dict(self):
+        return {'scheduler': self._scheduler.state_dict()}
+
+    def load_state_dict(self, state):
+        self._scheduler.load_state_dict(state['scheduler'])
@@ -22,6 +22,8 @@ class PrintReport(extension.Extension):
 
     """
 
+    main_process_only = True
+
     def __init__(self, entries, log_report='LogReport', out=sys.stdout):
         self._entries = entries
         self._log_report = log_report
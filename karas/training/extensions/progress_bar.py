@@ -1,5 +1,6 @@
 from __future__ import division
 
+import collections
 import datetime
 import os
 import sys
@@ -28,6 +29,8 @@ class ProgressBar(extension.Extension):
 
     """
 
+    main_process_only = True
+
     def __init__(self, training_length=None, update_interval=100,
                  bar_length=50, out=sys.stdout):
         self._training_length = training_length
@@ -35,7 +38,7 @@ class ProgressBar(extension.Extension):
         self._update_interval = update_interval
         self._bar_length = bar_length
         self._out = out
-        self._recent_timing = []
+        self._recent_timing = collections.deque(maxlen=100)
 
     def __call__(self, trainer):
         training_length = self._training_length
@@ -114,9 +117,6 @@ class ProgressBar(extension.Extension):
             if hasattr(out, 'flush'):
                 out.flush()
 
-            if len(recent_timing) > 100:
-                del recent_timing[0]
-
     def finalize(self):
         # delete the progress bar
         out = self._out
@@ -134,4 +134,5 @@ class ProgressBar(extension.Extension):
 
     def __setstate__(self, state):
         state['_out'] = sys.stdout
+        state['_recent_timing'] = collections.deque(state.get('_recent_timing', ()), maxlen=100)
         self.__dict__.update(state)
@@ -1,8 +1,13 @@
+import functools
 import os
+import pickle
 import shutil
+import threading
+from concurrent import futures
 
 import torch
 
+from karas import checkpoint
 from karas.training import extension
 from karas.training import utils
 
@@ -10,27 +15,151 @@ from karas.training import utils
 class Snapshot(extension.Extension):
     """
     if target == None, save the trainer
+
+    Args:
+        target: Module to save. If it is None, the whole trainer is saved.
+        filename (str): Name of the snapshot file. It is formatted with the
+            trainer, e.g. ``'snapshot_iter_{.iteration}.pth'``.
+        format (str): ``'pickle'`` pickles the trainer or the target module
+            as a whole. ``'state_dict'`` saves the ``state_dict()`` of the
+            trainer or the target with :func:`torch.save`, which holds only
+            counters, random generator states and tensors. Such a snapshot of
+            the trainer is restored with :meth:`Trainer.load_state_dict`.
+            ``'indexed'`` saves the same state with
+            :func:`karas.checkpoint.save`, as one component per model,
+            optimizer and extension for the trainer, or as the ``'model'``
+            component for the target, and records the iteration, the epoch
+            and the elapsed time in the header. A component can then be
+            loaded alone, with its tensors memory-mapped, e.g.
+            ``checkpoint.load(path, 'updater/models/net')`` for a warm
+            start, and the trainer is restored with
+            ``trainer.load_state_dict(checkpoint.load(path))``.
+            ``'sharded'`` saves the components of ``'indexed'`` in a
+            directory of shards with :func:`karas.checkpoint.save_sharded`,
+            compressing and writing the shards in parallel, and the trainer
+            is restored with
+            ``trainer.load_state_dict(checkpoint.load_sharded(path))``.
+        async_write (bool): If ``True``, the state is copied in memory on the
+            training thread, and it is pickled and written to the disk on a
+            background thread, so training continues during the write. In
+            the ``'pickle'`` format, the trainer can only be copied
+            consistently by pickling it, so it is still pickled on the
+            training thread and only the write is in the background. Use
+            another format to take the serialization off the training
+            thread too.
+        max_pending (int): Number of snapshots that may be in flight in the
+            asynchronous mode. When the limit is reached, the next snapshot
+            waits until the oldest one is written.
+        shard_size (int): Number of bytes of a shard in the ``'sharded'``
+            format.
+        compression (str): ``'zlib'``, ``'lzma'`` or None, compression of
+            the shards in the ``'sharded'`` format.
+        max_workers (int): Number of threads writing the shards in the
+            ``'sharded'`` format.
     """
 
-    def __init__(self, target=None, filename='snapshot_iter_{.iteration}.pth'):
+    main_process_only = True
+
+    def __init__(self, target=None, filename='snapshot_iter_{.iteration}.pth', format='pickle', async_write=False,
+                 max_pending=1, shard_size=256 * 2 ** 20, compression=None, max_workers=None):
+        if format not in ('pickle', 'state_dict', 'indexed', 'sharded'):
+            raise ValueError('unknown snapshot format: {}'.format(format))
         self._tmpl = filename
         self._tget = target
+        self._format = format
+        self._async = async_write
+        self._max_pending = max_pending
+        self._sharding = {'shard_size': shard_size, 'compression': compression, 'max_workers': max_workers}
+        self._executor = None
+        self._slots = None
+        self._futures = []
 
     def __call__(self, trainer):
-        device = trainer.updater.device
-
         fn = self._tmpl.format(trainer)
-        prefix = 'tmp' + fn
-
-        with utils.tempdir(prefix=prefix, dir=trainer.out) as tmpdir:
-            tmppath = os.path.join(tmpdir, fn)
 
+        if self._format == 'state_dict':
+            target = trainer if self._tget is None else self._tget
+            # the copy leaves the tensors on their devices
+            save = functools.partial(torch.save, utils.copy_to_cpu(target.state_dict()))
+        elif self._format in ('indexed', 'sharded'):
             if self._tget is None:
-                trainer.serialize(tmppath)
+                components = checkpoint.trainer_components(utils.copy_to_cpu(trainer.state_dict()))
             else:
-                torch.save(self._tget.cpu(), tmppath)
+                components = {'model': utils.copy_to_cpu(self._tget.state_dict())}
+            meta = {'iteration': trainer.iteration, 'epoch': trainer.epoch, 'elapsed_time': trainer.elapsed_time}
+            if self._format == 'indexed':
+                save = functools.partial(checkpoint.save, components, meta=meta)
+            else:
+                save = functools.partial(checkpoint.save_sharded, components, meta=meta, **self._sharding)
+        elif self._tget is None:
+            if self._async:
+                # pickling is the copy, only the write is left to the thread
+                save = functools.partial(_write_bytes, pickle.dumps(trainer))
+            else:
+                save = trainer.serialize
+        else:
+            save = functools.partial(torch.save, utils.cpu_copy_module(self._tget))
+
+        if self._async:
+            self._submit(_save_atomic, save, trainer.out, fn)
+        else:
+            _save_atomic(save, trainer.out, fn)
+
+    def finalize(self):
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        self._check_errors()
+
+    def _submit(self, *args):
+        if self._executor is None:
+            self._executor = futures.ThreadPoolExecutor(max_workers=1)
+            self._slots = threading.BoundedSemaphore(self._max_pending)
+
+        self._check_errors()
+        self._slots.acquire()  # back-pressure on the training loop
+        future = self._executor.submit(*args)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _check_errors(self):
+        done = [future for future in self._futures if future.done()]
+        self._futures = [future for future in self._futures if not future.done()]
+        for future in done:
+            future.result()  # re-raise the error of a failed write
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        state['_slots'] = None
+        state['_futures'] = []
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('_format', 'pickle')
+        state.setdefault('_async', False)
+        state.setdefault('_max_pending', 1)
+        state.setdefault('_sharding', {'shard_size': 256 * 2 ** 20, 'compression': None, 'max_workers': None})
+        self.__dict__.update(state)
+
+
+def _save_atomic(save, out, fn):
+    with utils.tempdir(prefix='tmp' + fn, dir=out) as tmpdir:
+        tmppath = os.path.join(tmpdir, fn)
+        save(tmppath)
+        destination = os.path.join(out, fn)
+        if os.path.isdir(destination):
+            # a sharded snapshot is a directory, which a move would not
+            # replace. The old one is renamed aside into the temporary
+            # directory, which is removed once the new one is in place, so
+            # a crash never loses both.
+            os.rename(destination, tmppath + '.old')
+            os.rename(tmppath, destination)
+        else:
+            shutil.move(tmppath, destination)
 
-            shutil.move(tmppath, os.path.join(trainer.out, fn))
 
-        if self._tget is not None:
-            self._tget.to(device)
+def _write_bytes(payload, filename):
+    with open(filename, 'wb') as f:
+        f.write(payload)
@@ -1,64 +1,306 @@
+import collections
+import math
+import threading
+import warnings
+
 import tensorboardX as tbx
+import torch
+import torch.nn.functional as F
 
-from karas import compare_key
+from karas import KeyMatcher
 from karas.training import extension
+from karas.training.extensions.evaluator import EVALUATION_TAG
 
 
 class TensorBoard(extension.Extension):
-    """Trainer extension to print the accumulated results.
+    """Trainer extension to write the observation to TensorBoard.
+
+    Scalars are written with ``add_scalar`` and images with ``add_image``.
+    A batch of images (``N x C x H x W``) is reduced on its device before it
+    is copied to the host: only the first ``max_images`` images are kept,
+    they are downsampled so that their longer side is at most
+    ``image_size``, and they are tiled into one grid image.
+
+    In the asynchronous mode, the values are handed to a background thread
+    that encodes and writes them, so the training loop only pays for the
+    reduction and the copy. The images waiting to be written are bounded by
+    a memory budget. When a new image does not fit, the waiting images of
+    the same tag are dropped in favour of it, and if it still does not fit,
+    it is dropped itself. Scalars are never dropped.
 
-    This extension uses the log accumulated by a :class:`LogReport` extension
-    to print specified entries of the log in a human-readable format.
+    The results of an :class:`Evaluator` are received through a subscription
+    to the reporter as they are reported, and written at the next call with
+    the epoch of the evaluated weights as their step, so they are written
+    whatever the trigger of this extension.
 
     Args:
-        entries (list of str): List of keys of observations to print.
-        log_report (str or LogReport): Log report to accumulate the
-            observations. This is either the name of a LogReport extensions
-            registered to the trainer, or a LogReport instance to use
-            internally.
-        out: Stream to print the bar. Standard output is used by default.
+        keys (iterable of strs): Keys of the observations to write. If it is
+            None, all the observations are written.
+        out (str): Log directory.
+        async_write (bool): Whether the values are written on a background
+            thread.
+        max_queue_bytes (int): Memory budget of the images waiting to be
+            written in the asynchronous mode.
+        rate_limits (dict): Minimum numbers of iterations between two writes
+            of a tag, keyed by key patterns. Tags matching no pattern are
+            written every time the extension is called.
+        image_size (int): Maximum length of the longer side of each image.
+            If it is None, images are not downsampled.
+        max_images (int): Maximum number of images of a batch to write.
 
     """
 
-    def __init__(self, keys=None, out='logdir'):
+    main_process_only = True
+
+    def __init__(self, keys=None, out='logdir', async_write=False, max_queue_bytes=64 * 1024 * 1024,
+                 rate_limits=None, image_size=None, max_images=16):
         self._keys = keys
+        self._matcher = None if keys is None else KeyMatcher(keys)
         self._out = out
+        self._async = async_write
+        self._max_queue_bytes = max_queue_bytes
+        self._rate_limits = rate_limits
+        self._image_size = image_size
+        self._max_images = max_images
+        self._init_limits()
+        self._writer = None
+        self._subscription = None
+        self._evaluations = []
 
     def initialize(self, trainer):
-        self._writer = tbx.SummaryWriter(log_dir=self._out)
+        self._open()
+        if self._subscription is not None:
+            self._subscription.cancel()
+        self._subscription = trainer.reporter.subscribe((EVALUATION_TAG,), self._receive)
+
+    def _receive(self, key, evaluation):
+        self._evaluations.append(evaluation)
 
     def __call__(self, trainer):
         observation = trainer.observation
         epoch = trainer.epoch
         iteration = trainer.iteration
+        matcher = self._matcher
+
+        evaluated = set()
+        evaluations, self._evaluations = self._evaluations, []
+        for evaluation in evaluations:
+            for tag, value in evaluation['results'].items():
+                evaluated.add(tag)
+                if matcher is None or matcher.match(tag):
+                    # results of an evaluation belong to the evaluated epoch
+                    self._writer.add_scalar(tag, value, global_step=evaluation['epoch'])
 
         for tag, value in observation.items():
+            if tag in evaluated:
+                continue
             step = epoch if 'test' in tag else iteration
 
-            haskey = False
-            if self._keys is not None:
-                for key in self._keys:
-                    if compare_key(key, tag):
-                        haskey = True
-                        break;
-                if not haskey:
-                    continue
+            if matcher is not None and not matcher.match(tag):
+                continue
+            if not self._allow(tag, iteration):
+                continue
 
             if 'scalar' in tag:
+                if isinstance(value, torch.Tensor):
+                    value = value.item()
                 self._writer.add_scalar(tag, value, global_step=step)
             elif 'images' in tag:
-                self._writer.add_image(tag, value.cpu().numpy(), global_step=step)
-            pass
+                image = reduce_images(value, self._max_images, self._image_size)
+                if image is not None:
+                    self._writer.add_image(tag, image, global_step=step)
 
     def finalize(self):
-        self._writer.close()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _open(self):
+        if self._writer is not None:
+            return
+        writer = tbx.SummaryWriter(log_dir=self._out)
+        if self._async:
+            writer = _AsyncWriter(writer, self._max_queue_bytes)
+        else:
+            writer = _Writer(writer)
+        self._writer = writer
+
+    def _init_limits(self):
+        self._limit_matcher = None
+        if self._rate_limits:
+            self._limit_matcher = KeyMatcher(self._rate_limits.keys())
+        self._last_write = {}
+
+    def _allow(self, tag, iteration):
+        if self._limit_matcher is None:
+            return True
+        patterns = self._limit_matcher.match(tag)
+        if not patterns:
+            return True
+        interval = max(self._rate_limits[pattern] for pattern in patterns)
+        last = self._last_write.get(tag)
+        if last is not None and iteration - last < interval:
+            return False
+        self._last_write[tag] = iteration
+        return True
 
     def __getstate__(self):
         state = {}
         state['_keys'] = self._keys
         state['_out'] = self._out
+        state['_async'] = self._async
+        state['_max_queue_bytes'] = self._max_queue_bytes
+        state['_rate_limits'] = self._rate_limits
+        state['_image_size'] = self._image_size
+        state['_max_images'] = self._max_images
+        state['_subscription'] = self._subscription
         return state
 
     def __setstate__(self, state):
+        state.setdefault('_async', False)
+        state.setdefault('_max_queue_bytes', 64 * 1024 * 1024)
+        state.setdefault('_rate_limits', None)
+        state.setdefault('_image_size', None)
+        state.setdefault('_max_images', 16)
+        state.setdefault('_subscription', None)
         self.__dict__.update(state)
-        self._writer = tbx.SummaryWriter(log_dir=self._out)
+        self._evaluations = []
+        self._matcher = None if self._keys is None else KeyMatcher(self._keys)
+        self._init_limits()
+        self._writer = None
+        self._open()
+
+
+def reduce_images(value, max_images=16, image_size=None):
+    """Reduces a batch of images to one ``C x H x W`` grid image.
+
+    The reduction runs on the device of the images, and only the grid is
+    copied to the host.
+
+    Args:
+        value (torch.Tensor): Image (``C x H x W``) or batch of images
+            (``N x C x H x W``).
+        max_images (int): Maximum number of images of the batch to keep.
+        image_size (int): Maximum length of the longer side of each image.
+            If it is None, images are not downsampled.
+
+    Returns:
+        torch.Tensor: Grid image on CPU, or None if the value is not an image.
+
+    """
+    if not isinstance(value, torch.Tensor) or value.dim() not in (3, 4):
+        return None
+    x = value.detach()
+    if x.dim() == 3:
+        x = x.unsqueeze(0)
+    x = x[:max_images]
+
+    n, c, h, w = x.shape
+    if image_size is not None and max(h, w) > image_size:
+        scale = float(image_size) / max(h, w)
+        h, w = max(1, int(round(h * scale))), max(1, int(round(w * scale)))
+        dtype = x.dtype
+        x = F.interpolate(x.float(), size=(h, w), mode='area')
+        if not dtype.is_floating_point:
+            x = x.round().to(dtype)
+    if x.dtype in (torch.float16, torch.bfloat16):
+        x = x.float()
+
+    columns = int(math.ceil(math.sqrt(n)))
+    rows = int(math.ceil(float(n) / columns))
+    if rows * columns > n:
+        x = torch.cat((x, x.new_zeros((rows * columns - n, c, h, w))))
+    grid = x.reshape(rows, columns, c, h, w).permute(2, 0, 3, 1, 4).reshape(c, rows * h, columns * w)
+    return grid.cpu()
+
+
+class _Writer(object):
+    """Writes to a summary writer on the calling thread."""
+
+    def __init__(self, writer):
+        self._writer = writer
+
+    def add_scalar(self, tag, value, global_step):
+        self._writer.add_scalar(tag, value, global_step=global_step)
+
+    def add_image(self, tag, image, global_step):
+        self._writer.add_image(tag, image.numpy(), global_step=global_step)
+
+    def close(self):
+        self._writer.close()
+
+
+class _AsyncWriter(object):
+    """Writes to a summary writer on a background thread."""
+
+    def __init__(self, writer, max_bytes):
+        self._writer = writer
+        self._max_bytes = max_bytes
+        self._items = collections.deque()
+        self._bytes = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._error = None
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def add_scalar(self, tag, value, global_step):
+        self._put(('add_scalar', tag, value, global_step, 0))
+
+    def add_image(self, tag, image, global_step):
+        nbytes = image.numel() * image.element_size()
+        with self._cond:
+            if self._bytes + nbytes > self._max_bytes:
+                # the new image supersedes the waiting images of its tag
+                kept = collections.deque()
+                for item in self._items:
+                    if item[1] == tag and item[4] > 0:
+                        self._bytes -= item[4]
+                        self.dropped += 1
+                    else:
+                        kept.append(item)
+                self._items = kept
+            if self._bytes + nbytes > self._max_bytes:
+                self.dropped += 1
+                return
+        self._put(('add_image', tag, image, global_step, nbytes))
+
+    def _put(self, item):
+        with self._cond:
+            if self._error is not None:
+                error, self._error = self._error, None
+                raise error
+            self._items.append(item)
+            self._bytes += item[4]
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._items and not self._closed:
+                    self._cond.wait()
+                if not self._items:
+                    return
+                method, tag, value, step, nbytes = self._items.popleft()
+            try:
+                if method == 'add_image':
+                    value = value.numpy()
+                getattr(self._writer, method)(tag, value, global_step=step)
+            except Exception as e:
+                with self._cond:
+                    self._error = e
+            with self._cond:
+                self._bytes -= nbytes
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self._writer.close()
+        if self.dropped:
+            warnings.warn('{} images were dropped because the TensorBoard queue was full'.format(self.dropped))
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,179 @@
+import multiprocessing
+import os
+import random
+import traceback
+from concurrent import futures
+
+import six
+import torch
+
+from karas.training.triggers.successive_halving_trigger import SuccessiveHalvingTrigger
+
+
+class Sweep(object):
+    """Runs a trainer per configuration in parallel, stopping poor trials early.
+
+    The trials run in a pool of spawned processes, each limited to a number
+    of intra-op threads, so that the cores of the machine are shared by
+    several small trainings instead of one. The stop trigger of each
+    trainer is wrapped in a :class:`SuccessiveHalvingTrigger` sharing its
+    records with the other trials through a manager process, so a trial
+    whose value falls behind at a rung is stopped while the promising ones
+    go on.
+
+    See the following example::
+
+        >>> def build(config, out):
+        ...     model = Net(config['width'])
+        ...     ...
+        ...     return Trainer(updater, (27, 'epoch'), loaders, out=out)
+        ...
+        >>> sweep = Sweep(build, {'lr': lambda rng: 10 ** rng.uniform(-4, -1),
+        ...                       'width': [64, 128, 256]},
+        ...               num_trials=81, key='test/scalar/accuracy', mode='max')
+        >>> best = sweep.run()[0]
+
+    Args:
+        factory: Callable building a :class:`Trainer` from a configuration
+            and an output directory. It must be picklable, i.e. defined at
+            the top level of a module, and it is called in the process of the
+            trial.
+        space: Either a list of configurations, or a dictionary defining the
+            space the configurations are sampled from. A list or tuple value
+            is sampled uniformly, a callable value is called with a
+            :class:`random.Random` and other values are constants.
+        num_trials (int): Number of configurations sampled from the space.
+        key (str): Key of the value deciding which trials go on, matched as
+            by :class:`BestValueTrigger`.
+        mode (str): ``'max'`` or ``'min'``, whether larger or smaller values
+            are better.
+        grace_period (tuple): Length of the first rung. See
+            :class:`SuccessiveHalvingTrigger`.
+        reduction_factor (int): Ratio of the lengths of consecutive rungs.
+        max_workers (int): Number of trials running at a time. If it is
+            None, the cores are divided by ``threads_per_trial``.
+        threads_per_trial (int): Number of intra-op threads of each trial.
+        out (str): Output directory. The trial ``i`` writes in its
+            subdirectory ``trial_<i>``.
+        seed (int): Seed of the sampling of the configurations.
+
+    """
+
+    def __init__(self, factory, space, num_trials=None, key='main/loss', mode='min', grace_period=(1, 'epoch'),
+                 reduction_factor=3, max_workers=None, threads_per_trial=1, out='sweep', seed=0):
+        if isinstance(space, dict):
+            if num_trials is None:
+                raise ValueError('num_trials is required to sample a space')
+            self.configs = sample_configs(space, num_trials, seed)
+        else:
+            self.configs = list(space)
+        if max_workers is None:
+            max_workers = max(1, (os.cpu_count() or 1) // threads_per_trial)
+
+        self._factory = factory
+        self._options = {'key': key, 'mode': mode, 'grace_period': grace_period,
+                         'reduction_factor': reduction_factor}
+        self._max_workers = max_workers
+        self._threads_per_trial = threads_per_trial
+        self._out = out
+
+    def run(self):
+        """Runs all the trials.
+
+        Returns:
+            list of dict: Results of the trials, the completed ones first
+            and the best first among them. A result holds the ``trial``
+            number, its ``config``, its output directory ``out``, the
+            ``iteration`` and ``epoch`` it ended at, the ``history`` of the
+            values at the rungs it reached, its last ``value``, i.e. the mean
+            of the values since the last rung, whether it was ``stopped``
+            early, and the ``error`` that ended it, if any.
+
+        """
+        context = multiprocessing.get_context('spawn')
+        manager = context.Manager()
+        try:
+            records = _SharedRecords(manager.dict(), manager.Lock())
+            with futures.ProcessPoolExecutor(max_workers=self._max_workers, mp_context=context,
+                                             initializer=_init_worker,
+                                             initargs=(self._threads_per_trial,)) as executor:
+                jobs = []
+                for trial, config in enumerate(self.configs):
+                    out = os.path.join(self._out, 'trial_{}'.format(trial))
+                    jobs.append(executor.submit(_run_trial, self._factory, trial, config, out, self._options,
+                                                records))
+                results = [job.result() for job in jobs]
+        finally:
+            manager.shutdown()
+
+        sign = 1 if self._options['mode'] == 'max' else -1
+        return sorted(results, key=lambda result: (result['value'] is None, result['stopped'],
+                                                   -sign * (result['value'] or 0)))
+
+
+def sample_configs(space, num_trials, seed=0):
+    """Samples configurations from a space.
+
+    Args:
+        space (dict): Definition of the space, keyed by the names of the
+            parameters. A list or tuple value is sampled uniformly, a
+            callable value is called with a :class:`random.Random` and other
+            values are constants.
+        num_trials (int): Number of configurations.
+        seed (int): Seed of the sampling.
+
+    Returns:
+        list of dict: Configurations.
+
+    """
+    rng = random.Random(seed)
+    configs = []
+    for _ in six.moves.range(num_trials):
+        config = {}
+        for name in sorted(space):
+            value = space[name]
+            if isinstance(value, (list, tuple)):
+                value = rng.choice(value)
+            elif callable(value):
+                value = value(rng)
+            config[name] = value
+        configs.append(config)
+    return configs
+
+
+class _SharedRecords(object):
+    """Records of the rungs shared by the trials through a manager."""
+
+    def __init__(self, scores, lock):
+        self._scores = scores
+        self._lock = lock
+
+    def add(self, rung, score):
+        with self._lock:
+            scores = self._scores.get(rung, []) + [score]
+            self._scores[rung] = scores
+        return scores
+
+
+def _init_worker(num_threads):
+    torch.set_num_threads(num_threads)
+
+
+def _run_trial(factory, trial, config, out, options, records):
+    result = {'trial': trial, 'config': config, 'out': out, 'iteration': 0, 'epoch': 0, 'history': [],
+              'value': None, 'stopped': False, 'error': None}
+    try:
+        trainer = factory(config, out)
+        trigger = SuccessiveHalvingTrigger(records=records, trigger=trainer.stop_trigger, **options)
+        trainer.stop_trigger = trigger
+        trainer.run()
+    except Exception:
+        result['error'] = traceback.format_exc()
+        return result
+
+    result['iteration'] = trainer.iteration
+    result['epoch'] = trainer.epoch
+    result['history'] = trigger.history
+    result['stopped'] = trigger.stopped
+    result['value'] = trigger.last_value()
+    return result
@@ -1,10 +1,16 @@
+import heapq
 import os
 import time
+import warnings
 
 import karas
+from karas import distributed
 from karas.iterators.iterator import Iterator
 from karas.reporter import Reporter
+from karas.training import utils
 from karas.training.triggers.utils import get_trigger
+from karas.training.triggers.utils import load_trigger_state_dict
+from karas.training.triggers.utils import trigger_state_dict
 
 # Select the best-resolution timer function
 try:
@@ -17,8 +23,43 @@ except AttributeError:
 
 
 class Trainer(object):
-    def __init__(self, updater, stop_trigger, loaders, out='output'):
-        self._reporter = Reporter()
+    """Training loop running an updater and extensions over loaders.
+
+    Args:
+        updater (Updater): Updater that updates the models with a batch.
+        stop_trigger: Trigger deciding when to stop the training.
+        loaders (dict): Loaders keyed by names. It must have ``'train'``.
+        out (str): Output directory.
+        deferred_report (bool): Whether the reporter keeps reported tensors on
+            their devices until the observation is read. See
+            :class:`~karas.reporter.Reporter`.
+        prefetch (int): Number of training batches fetched ahead on a
+            background thread. See :class:`~karas.iterators.iterator.Iterator`.
+        pin_memory (bool): Whether prefetched training batches are copied to
+            pinned memory.
+        prefetch_to_device (bool): Whether prefetched training batches are
+            transferred to the device of the updater ahead of time.
+        profiler (~karas.profiler.Profiler): Profiler timing the phases of
+            the training loop. If it is None, nothing is timed.
+        retain: Policy of the observed values kept from one iteration to the
+            next. By default, scalars are kept and the other values, such as
+            images, only live for the iteration that reported them. See
+            :meth:`~karas.reporter.Reporter.recycle`.
+
+    When the default process group of :mod:`torch.distributed` has several
+    processes, for example in a function started by
+    :func:`karas.distributed.launch`, the trainer runs in the data-parallel
+    mode. Each process iterates its own share of the training batches, and
+    the extensions marked ``main_process_only`` only run in the process of
+    rank 0. The updater is expected to synchronize the gradients, as
+    :class:`~karas.training.updaters.StandardUpdater` does.
+
+    """
+
+    def __init__(self, updater, stop_trigger, loaders, out='output', deferred_report=False, prefetch=0,
+                 pin_memory=False, prefetch_to_device=False, profiler=None, retain='scalars'):
+        self._reporter = Reporter(deferred=deferred_report, retain=retain)
+        self._reporter.profiler = profiler
 
         self._updater = updater
         self._updater(self)
@@ -30,8 +71,12 @@ class Trainer(object):
         self._loaders = loaders
         self._iterators = {}
         for key, value in self._loaders.items():
-            repeat = True if 'train' == key else False
-            self._iterators[key] = Iterator(dataloader=value, repeat=repeat)
+            if 'train' == key:
+                device = updater.device if prefetch_to_device else None
+                self._iterators[key] = Iterator(dataloader=value, repeat=True, prefetch=prefetch,
+                                                pin_memory=pin_memory, device=device, shard=True)
+            else:
+                self._iterators[key] = Iterator(dataloader=value, repeat=False)
 
         self._done = False
         self._start_at = None
@@ -75,6 +120,10 @@ class Trainer(object):
     def stop_trigger(self):
         return self._stop_trigger
 
+    @stop_trigger.setter
+    def stop_trigger(self, stop_trigger):
+        self._stop_trigger = get_trigger(stop_trigger)
+
     @property
     def reporter(self):
         return self._reporter
@@ -141,41 +190,103 @@ class Trainer(object):
         extension_order = sorted(self._extensions.keys(), key=lambda name: self._extensions[name].priority,
                                  reverse=True)
         extensions = [(name, self._extensions[name]) for name in extension_order]
+        is_main_process = distributed.is_main_process()
+        active = [is_main_process or not entry.main_process_only for _, entry in extensions]
+
+        # triggers subscribing to the reporter do it before anything is reported
+        for trigger in [self._stop_trigger] + [entry.trigger for _, entry in extensions]:
+            initialize = getattr(trigger, 'initialize', None)
+            if initialize:
+                initialize(self)
 
-        for _, entry in extensions:
+        for (_, entry), run_entry in zip(extensions, active):
+            if not run_entry:
+                continue
             initialize = getattr(entry, 'initialize', None)
             if initialize:
                 with self.reporter.scope('test'):
                     initialize(self)
 
+        # extension triggers and the stop trigger are only polled on the
+        # iterations where they may fire
+        calendar = _Calendar([entry.trigger for _, entry in extensions])
+        stop_calendar = _Calendar([self._stop_trigger])
+        step = 0
+        profiler = self._reporter.profiler
+
         self._start_at = _get_time()
 
         try:
-            while not self._stop_trigger(self) and self._iterators['train'].has_next():
-
-                # self.reporter.reset()
-                batch = next(self._iterators['train'])
-
-                with self.reporter.scope('train'):
-                    self._updater.update(batch)
-
-                with self.reporter.scope('test'):
-                    for name, entry in extensions:
-                        if entry.trigger(self):
-                            entry(self)
+            while self._iterators['train'].has_next():
+                if stop_calendar.due(step):
+                    if self._stop_trigger(self):
+                        break
+                    stop_calendar.reschedule(0, step, self)
+
+                self.reporter.recycle()
+                if profiler is None:
+                    batch = next(self._iterators['train'])
+                    step += 1
+
+                    with self.reporter.scope('train'):
+                        self._updater.update(batch)
+                else:
+                    profiler.begin_iteration(self.iteration + 1)
+                    with profiler.span('data'):
+                        batch = next(self._iterators['train'])
+                    step += 1
+
+                    with self.reporter.scope('train'), profiler.span('update'):
+                        self._updater.update(batch)
+
+                due = calendar.due(step)
+                if due:
+                    with self.reporter.scope('test'):
+                        for index in due:
+                            name, entry = extensions[index]
+                            if not active[index]:
+                                # keep the trigger in step with the main process
+                                entry.trigger(self)
+                            elif profiler is None:
+                                if entry.trigger(self):
+                                    entry(self)
+                            else:
+                                self._run_profiled(profiler, name, entry)
+                            calendar.reschedule(index, step, self)
+
+                if profiler is not None:
+                    self._report_times(profiler)
 
         except Exception as e:
             print('exception: {}'.format(e))
 
         finally:
-            for _, entry in extensions:
+            for iterator in self._iterators.values():
+                iterator.close()
+
+            for (_, entry), run_entry in zip(extensions, active):
+                if not run_entry:
+                    continue
                 finalize = getattr(entry, 'finalize', None)
                 if finalize:
                     finalize()
 
         self._final_elapsed_time = self.elapsed_time
         self._done = True
-        print('Training Finished')
+        if is_main_process:
+            print('Training Finished')
+
+    def _run_profiled(self, profiler, name, entry):
+        with profiler.span('extension/%s/trigger' % name):
+            fire = entry.trigger(self)
+        if fire:
+            with profiler.span('extension/%s' % name):
+                entry(self)
+
+    def _report_times(self, profiler):
+        times = profiler.pop_times()
+        with self.reporter.scope('train'), self.reporter.scope('scalar'):
+            self.reporter.report({'time/' + name: value for name, value in times.items()})
 
     def __getstate__(self):
         state = self.__dict__.copy()
@@ -184,8 +295,97 @@ class Trainer(object):
     def __setstate__(self, state):
         self.__dict__.update(state)
 
+    def state_dict(self):
+        """Returns the state needed to resume the training.
+
+        Unlike pickling the trainer, the state holds neither the loaders nor
+        the observation. It consists of the counters of the iterators, the
+        states of the updater, the stop trigger, the extensions and their
+        triggers, the elapsed time and the random generator states. To resume,
+        build the trainer with the same code and call :meth:`load_state_dict`.
+        """
+        elapsed_time = self._snapshot_elapsed_time if self._start_at is None else self.elapsed_time
+
+        extensions = {}
+        for name, extension in self._extensions.items():
+            extensions[name] = {'extension': extension.state_dict(),
+                                'trigger': trigger_state_dict(extension.trigger)}
+
+        return {'elapsed_time': elapsed_time,
+                'updater': self._updater.state_dict(),
+                'iterators': {name: iterator.state_dict() for name, iterator in self._iterators.items()},
+                'stop_trigger': trigger_state_dict(self._stop_trigger),
+                'extensions': extensions,
+                'rng': utils.get_rng_state()}
+
+    def load_state_dict(self, state):
+        """Restores the state returned by :meth:`state_dict`.
+
+        Extensions must be registered with the same names before the state is
+        loaded. The states of missing extensions are skipped with a warning.
+        """
+        self._snapshot_elapsed_time = state['elapsed_time']
+        self._start_at = None
+        self._done = False
+
+        self._updater.load_state_dict(state['updater'])
+        for name, iterator_state in state['iterators'].items():
+            self._iterators[name].load_state_dict(iterator_state)
+        load_trigger_state_dict(self._stop_trigger, state['stop_trigger'])
+
+        for name, extension_state in state['extensions'].items():
+            if name not in self._extensions:
+                warnings.warn('extension {} is not registered, its state is skipped'.format(name))
+                continue
+            extension = self._extensions[name]
+            extension.load_state_dict(extension_state['extension'])
+            load_trigger_state_dict(extension.trigger, extension_state['trigger'])
+
+        utils.set_rng_state(state['rng'])
+
     def serialize(self, filename):
         karas.serialize(self, filename)
 
     def deserialize(self, filename):
         self = karas.deserialize(os.path.join(self.out, filename))
+
+
+class _Calendar(object):
+    """Schedule of the iterations on which triggers are polled.
+
+    Triggers implementing ``updates_until_fire`` are kept in a heap keyed by
+    the update step of their next possible fire, and they are skipped until
+    that step. Other triggers are polled on every step. :meth:`due` returns
+    the indices of the triggers to poll in their original order, and each of
+    them must be passed to :meth:`reschedule` after it has been polled.
+
+    """
+
+    def __init__(self, triggers):
+        self._triggers = triggers
+        self._polled = []
+        self._scheduled = set()
+        self._heap = []
+        for index, trigger in enumerate(triggers):
+            if hasattr(trigger, 'updates_until_fire'):
+                self._scheduled.add(index)
+                self._heap.append((0, index))
+            else:
+                self._polled.append(index)
+        heapq.heapify(self._heap)
+
+    def due(self, step):
+        heap = self._heap
+        if not heap or heap[0][0] > step:
+            return self._polled
+
+        due = list(self._polled)
+        while heap and heap[0][0] <= step:
+            due.append(heapq.heappop(heap)[1])
+        due.sort()
+        return due
+
+    def reschedule(self, index, step, trainer):
+        if index in self._scheduled:
+            wait = self._triggers[index].updates_until_fire(trainer)
+            heapq.heappush(self._heap, (step + wait, index))
@@ -3,3 +3,4 @@ from karas.training.triggers.best_value_trigger import MaxValueTrigger
 from karas.training.triggers.best_value_trigger import MinValueTrigger
 from karas.training.triggers.early_stopping_trigger import EarlyStoppingTrigger
 from karas.training.triggers.interval_trigger import IntervalTrigger
+from karas.training.triggers.successive_halving_trigger import SuccessiveHalvingTrigger
@@ -1,31 +1,59 @@
 import operator
 
 import karas.reporter as reporter
-from karas import compare_key
 from karas.training.triggers import utils
 
 
 class BestValueTrigger(object):
+    """Trigger invoked when the mean of a value is the best so far.
+
+    The values of the key are accumulated as they are reported, through a
+    subscription to the reporter of the trainer made by :meth:`initialize`,
+    so the trigger only needs to be called when its interval trigger may
+    fire.
+
+    Args:
+        key (str): Key of the value.
+        compare: Callable returning whether a new mean is better than the
+            best one, given the best one and the new one.
+        trigger: Trigger deciding when to compare the mean of the values
+            accumulated since the last comparison.
+
+    """
+
     def __init__(self, key, compare, trigger=(1, 'epoch')):
         self.key = key
         self.best_value = None
         self.interval_trigger = utils.get_trigger(trigger)
         self.compare = compare
 
+        self._subscription = None
+        self._reducer = reporter.SummaryReducer()
         self._init_summary()
 
-    def __call__(self, trainer):
-        observation = trainer.observation
-        summary = self._summary
+    def initialize(self, trainer):
+        """Subscribes to the key on the reporter of the trainer."""
+        if self._subscription is not None:
+            self._subscription.cancel()
+        self._subscription = trainer.reporter.subscribe((self.key,), self._accumulate)
+
+    def _accumulate(self, key, value):
+        self._summary.add({key: value})
 
-        for key in observation.keys():
-            if compare_key(self.key, key):
-                summary.add({self.key: observation[key]})
+    def __call__(self, trainer):
+        if self._subscription is None:
+            self.initialize(trainer)
 
         if not self.interval_trigger(trainer):
             return False
 
+        # decide from the values of all the processes
+        summary = self._summary
+        self._reducer.reduce(summary)
         stats = summary.compute_mean()
+        if self.key not in stats:
+            # nothing reported yet, e.g. by an asynchronous evaluation
+            return False
         value = float(stats[self.key])  # copy to CPU
         self._init_summary()
 
@@ -35,9 +63,32 @@ class BestValueTrigger(object):
 
         return False
 
+    def updates_until_fire(self, trainer):
+        updates_until_fire = getattr(self.interval_trigger, 'updates_until_fire', None)
+        if updates_until_fire is None:
+            return 1
+        return updates_until_fire(trainer)
+
+    def state_dict(self):
+        return {'best_value': self.best_value,
+                'summary': self._summary.state_dict(),
+                'interval_trigger': utils.trigger_state_dict(self.interval_trigger)}
+
+    def load_state_dict(self, state):
+        self.best_value = state['best_value']
+        self._summary.load_state_dict(state['summary'])
+        utils.load_trigger_state_dict(self.interval_trigger, state['interval_trigger'])
+
     def _init_summary(self):
         self._summary = reporter.DictSummary()
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if '_reducer' not in state:
+            self._reducer = reporter.SummaryReducer()
+        if '_subscription' not in state:
+            self._subscription = None
+
 
 class MaxValueTrigger(BestValueTrigger):
     def __init__(self, key, trigger=(1, 'epoch')):
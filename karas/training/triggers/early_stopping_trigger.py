@@ -1,7 +1,9 @@
 import operator
 import warnings
 
-from karas import compare_key
+from karas import distributed
+from karas import reporter
+from karas.training.triggers import utils
 from karas.training.triggers.utils import get_trigger
 
 
@@ -10,10 +12,13 @@ class EarlyStoppingTrigger(object):
                  max_trigger=(100, 'epoch')):
         self.count = 0
         self.monitor = monitor
+        self._subscription = None
+        self._value = None
         self.patients = patients
         self.verbose = verbose
         self.max_trigger = get_trigger(max_trigger)
         self.interval_trigger = get_trigger(check_trigger)
+        self._reducer = reporter.SummaryReducer()
 
         if mode == 'min':
             self.compare = operator.lt
@@ -34,29 +39,39 @@ class EarlyStoppingTrigger(object):
                 print('early stopping: operator is less')
             self.best = float('inf')
 
+    def initialize(self, trainer):
+        """Subscribes to the monitored key on the reporter of the trainer."""
+        if self._subscription is not None:
+            self._subscription.cancel()
+        self._subscription = trainer.reporter.subscribe((self.monitor,), self._receive)
+
+    def _receive(self, key, value):
+        self._value = value
+
     def __call__(self, trainer):
-        observation = trainer.reporter.observation
+        if self._subscription is None:
+            self.initialize(trainer)
 
         if self.max_trigger(trainer):
             return True
 
-        find_key = False
-        for tag, value in observation.items():
-            if compare_key(self.monitor, tag):
-                find_key = True
-                break
-
-        if not find_key:
-            if self.verbose:
-                warnings.warn('{} is not in observation'.format(self.monitor))
-            return False
-
         if not self.interval_trigger(trainer):
             return False
 
-        for tag, value in observation.items():
-            if compare_key(self.monitor, tag):
-                current_val = value
+        current_val = self._value
+        if distributed.get_world_size() > 1:
+            # decide from the mean value of all the processes, which all enter
+            # the reduction even if they have not received the value yet
+            summary = reporter.DictSummary()
+            if current_val is not None:
+                summary.add({self.monitor: current_val})
+            current_val = self._reducer.reduce(summary).compute_mean().get(self.monitor)
+
+        if current_val is None:
+            if self.verbose:
+                warnings.warn('{} has not been reported'.format(self.monitor))
+            return False
+        current_val = float(current_val)  # copy to CPU
 
         if self.compare(current_val, self.best):
             self.best = current_val
@@ -70,8 +85,34 @@ class EarlyStoppingTrigger(object):
             return True
         return False
 
+    def updates_until_fire(self, trainer):
+        waits = [getattr(trigger, 'updates_until_fire', None) for trigger in (self.max_trigger, self.interval_trigger)]
+        if None in waits:
+            return 1
+        return min(wait(trainer) for wait in waits)
+
     def _stop_condition(self):
         return self.count >= self.patients
 
+    def state_dict(self):
+        return {'count': self.count,
+                'best': self.best,
+                'interval_trigger': utils.trigger_state_dict(self.interval_trigger),
+                'max_trigger': utils.trigger_state_dict(self.max_trigger)}
+
+    def load_state_dict(self, state):
+        self.count = state['count']
+        self.best = state['best']
+        utils.load_trigger_state_dict(self.interval_trigger, state['interval_trigger'])
+        utils.load_trigger_state_dict(self.max_trigger, state['max_trigger'])
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if '_reducer' not in state:
+            self._reducer = reporter.SummaryReducer()
+        if '_subscription' not in state:
+            self._subscription = None
+            self._value = None
+
     def get_training_length(self):
         return self.max_trigger.get_training_length()
@@ -1,3 +1,4 @@
+import math
 import warnings
 
 
@@ -77,6 +78,32 @@ class IntervalTrigger(object):
 
         return fire
 
+    def updates_until_fire(self, trainer):
+        """Returns a lower bound of the number of updates before the next fire.
+
+        The trainer uses it to skip polling the trigger on the iterations where
+        it cannot fire. The bound holds because an update advances the
+        iteration by at most one and the epoch detail by at most one batch.
+
+        Args:
+            trainer (Trainer): Trainer object that this trigger is associated
+                with. It must have been passed to the last call of this
+                trigger.
+
+        Returns:
+            int: Positive number of updates. The trigger does not fire before
+            that many updates have been made.
+
+        """
+        if self.unit == 'epoch':
+            epoch_detail = trainer.epoch_detail
+            boundary = (epoch_detail // self.period + 1) * self.period
+            length = len(trainer.get_iterator('train'))
+            return max(1, int(math.floor((boundary - epoch_detail) * length - 1e-6)))
+        else:
+            iteration = trainer.iteration
+            return max(1, (iteration // self.period + 1) * self.period - iteration)
+
     def serialize(self, serializer):
         try:
             self._previous_iteration = serializer(
@@ -103,5 +130,15 @@ class IntervalTrigger(object):
             # set a negative value for invalid
             self._previous_epoch_detail = -1.
 
+    def state_dict(self):
+        return {'previous_iteration': self._previous_iteration,
+                'previous_epoch_detail': self._previous_epoch_detail,
+                'count': self.count}
+
+    def load_state_dict(self, state):
+        self._previous_iteration = state['previous_iteration']
+        self._previous_epoch_detail = state['previous_epoch_detail']
+        self.count = state['count']
+
     def get_training_length(self):
         return (self.period, self.unit)
@@ -0,0 +1,146 @@
+import math
+import threading
+
+import numpy
+
+import karas.reporter as reporter
+from karas.training.triggers import utils
+
+
+class SuccessiveHalvingTrigger(object):
+    """Trigger stopping a trial whose value falls behind the other trials.
+
+    It wraps the stop trigger of a trainer with the stopping rule of the
+    asynchronous successive halving algorithm (ASHA). The training is
+    divided by rungs at ``grace_period * reduction_factor ** k`` epochs or
+    iterations. At each rung, the mean of the values of the key reported
+    since the previous rung is recorded in the records shared by all the
+    trials, and the training stops unless the value is among the best
+    ``1 / reduction_factor`` of the values recorded at this rung so far.
+    The values are accumulated as they are reported, through a subscription
+    to the reporter as :class:`BestValueTrigger` does.
+
+    Args:
+        key (str): Key of the value to compare.
+        mode (str): ``'max'`` or ``'min'``, whether larger or smaller values
+            are better.
+        grace_period (tuple): Length of the first rung, an integer or float
+            and either ``'epoch'`` or ``'iteration'``.
+        reduction_factor (int): Ratio of the lengths of consecutive rungs,
+            and inverse of the fraction of the trials going on at each rung.
+        records: Records of the rungs shared by the trials. It has a method
+            ``add(rung, score)`` recording a score, larger is better, and
+            returning all the scores recorded at the rung. If it is None, the
+            records are private to this process.
+        trigger: Stop trigger of the trial.
+
+    """
+
+    def __init__(self, key, mode='max', grace_period=(1, 'epoch'), reduction_factor=3, records=None,
+                 trigger=None):
+        if mode not in ('max', 'min'):
+            raise ValueError('mode must be either \'max\' or \'min\'')
+        if reduction_factor < 2:
+            raise ValueError('reduction_factor must be at least 2')
+        self.key = key
+        self.mode = mode
+        self.grace_period, self.unit = grace_period
+        self.reduction_factor = reduction_factor
+        self.records = LocalRecords() if records is None else records
+        self.trigger = utils.get_trigger(trigger)
+
+        self.history = []  # pairs of the rung lengths and the values
+        self.stopped = False
+        self._rung = 0
+        self._subscription = None
+        self._summary = reporter.DictSummary()
+
+    def initialize(self, trainer):
+        """Subscribes to the key on the reporter of the trainer."""
+        if self._subscription is not None:
+            self._subscription.cancel()
+        self._subscription = trainer.reporter.subscribe((self.key,), self._accumulate)
+        initialize = getattr(self.trigger, 'initialize', None)
+        if initialize:
+            initialize(trainer)
+
+    def _accumulate(self, key, value):
+        self._summary.add({key: value})
+
+    def __call__(self, trainer):
+        if self._subscription is None:
+            self.initialize(trainer)
+        if self.trigger(trainer):
+            return True
+
+        progress = trainer.epoch_detail if self.unit == 'epoch' else trainer.iteration
+        length = self.rung_length(self._rung)
+        if progress < length:
+            return False
+
+        stats = self._summary.compute_mean()
+        self._summary = reporter.DictSummary()
+        rung = self._rung
+        self._rung += 1
+        if self.key not in stats:
+            return False
+
+        value = float(stats[self.key])  # copy to CPU
+        self.history.append((length, value))
+        if math.isnan(value):
+            self.stopped = True
+            return True
+        score = value if self.mode == 'max' else -value
+        scores = self.records.add(rung, score)
+        cutoff = numpy.percentile(scores, 100 * (1 - 1.0 / self.reduction_factor))
+        self.stopped = bool(score < cutoff)
+        return self.stopped
+
+    def last_value(self):
+        """Returns the mean of the values since the last rung, or at the last rung."""
+        stats = self._summary.compute_mean()
+        if self.key in stats:
+            return float(stats[self.key])
+        if self.history:
+            return self.history[-1][1]
+        return None
+
+    def rung_length(self, rung):
+        """Returns the length of the training at the end of a rung."""
+        return self.grace_period * self.reduction_factor ** rung
+
+    def get_training_length(self):
+        return self.trigger.get_training_length()
+
+    def state_dict(self):
+        return {'rung': self._rung,
+                'history': list(self.history),
+                'summary': self._summary.state_dict(),
+                'trigger': utils.trigger_state_dict(self.trigger)}
+
+    def load_state_dict(self, state):
+        self._rung = state['rung']
+        self.history = list(state['history'])
+        self._summary.load_state_dict(state['summary'])
+        utils.load_trigger_state_dict(self.trigger, state['trigger'])
+
+
+class LocalRecords(object):
+    """Records of the rungs of :class:`SuccessiveHalvingTrigger` in one process."""
+
+    def __init__(self):
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def add(self, rung, score):
+        with self._lock:
+            scores = self._scores.setdefault(rung, [])
+            scores.append(score)
+            return list(scores)
+
+    def __getstate__(self):
+        return {'_scores': self._scores}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
@@ -41,3 +41,22 @@ def get_trigger(trigger):
 
 def _never_fire_trigger(trainer):
     return False
+
+
+def trigger_state_dict(trigger):
+    """Returns the state of a trigger, or None if it has no state.
+
+    Only triggers implementing ``state_dict`` have a state. Other callables
+    are considered stateless.
+
+    """
+    state_dict = getattr(trigger, 'state_dict', None)
+    if state_dict is None:
+        return None
+    return state_dict()
+
+
+def load_trigger_state_dict(trigger, state):
+    """Restores the state returned by :func:`trigger_state_dict`."""
+    if state is not None:
+        trigger.load_state_dict(state)
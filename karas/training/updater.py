@@ -1,3 +1,7 @@
+import torch
+from torch.nn.parallel import DistributedDataParallel
+
+
 class Updater(object):
     def __init__(self, **kwargs):
         self.device = kwargs.pop('device')
@@ -18,8 +22,35 @@ class Updater(object):
         else:
             raise ValueError('No {} key in optimizers' % name)
 
+    def get_models(self):
+        """Returns the modules held by the updater, keyed by attribute names."""
+        return {name: value for name, value in vars(self).items() if isinstance(value, torch.nn.Module)}
+
+    def state_dict(self):
+        """Returns the states of the models and the optimizers.
+
+        Models wrapped in :class:`~torch.nn.parallel.DistributedDataParallel`
+        are saved without the wrapper, so the state can be loaded with any
+        number of processes.
+        """
+        return {'models': {name: _unwrap(model).state_dict() for name, model in self.get_models().items()},
+                'optimizers': {name: optimizer.state_dict() for name, optimizer in self.optimizers.items()}}
+
+    def load_state_dict(self, state):
+        models = self.get_models()
+        for name, model_state in state['models'].items():
+            _unwrap(models[name]).load_state_dict(model_state)
+        for name, optimizer_state in state['optimizers'].items():
+            self.optimizers[name].load_state_dict(optimizer_state)
+
     def converter(self, batch):
         raise NotImplementedError
 
     def update(self, batch):
         raise NotImplementedError
+
+
+def _unwrap(model):
+    if isinstance(model, DistributedDataParallel):
+        return model.module
+    return model
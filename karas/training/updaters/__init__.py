@@ -0,0 +1 @@
+from karas.training.updaters.standard_updater import StandardUpdater
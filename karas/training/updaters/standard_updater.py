@@ -0,0 +1,110 @@
+import warnings
+
+import torch
+from torch.nn.parallel import DistributedDataParallel
+
+from karas import distributed
+from karas.training import updater
+
+
+class StandardUpdater(updater.Updater):
+    """Updater running the standard forward, backward and step sequence.
+
+    Each batch is converted by :meth:`converter`, the model is applied to the
+    input and the criterion to the output and the target. Then all the
+    optimizers are stepped with the gradients of the loss, and the loss is
+    reported as ``scalar/loss``.
+
+    In the autocast mode, the forward pass runs under :func:`torch.autocast`
+    with a reduced precision dtype (bfloat16 by default, which CPUs support),
+    while the parameters stay in float32 and act as master weights that the
+    optimizers update. The output is cast to float32 before the criterion, so
+    the loss and its reduction are computed in full precision. bfloat16 has
+    the exponent range of float32, so no loss scaling is needed.
+
+    When the default process group has several processes, the model is
+    wrapped in :class:`~torch.nn.parallel.DistributedDataParallel`, which
+    broadcasts the parameters of rank 0 and averages the gradients over the
+    processes during the backward pass. :attr:`model` is then the wrapper.
+
+    Args:
+        model (torch.nn.Module): Model to train. Its parameters must be
+            float32 in the autocast mode.
+        criterion: Callable computing the loss from the output and the
+            target.
+        autocast (bool): Whether the forward pass runs in the autocast mode.
+        autocast_dtype (torch.dtype): Reduced precision dtype of the autocast
+            mode.
+        channels_last (bool): Whether the model and four-dimensional inputs
+            use the ``channels_last`` memory format, which is faster for
+            convolutions on CPUs with oneDNN.
+        device: Device of the model and the batches.
+        optimizers (dict): Optimizers to step, keyed by names.
+
+    """
+
+    def __init__(self, model, criterion, autocast=False, autocast_dtype=torch.bfloat16, channels_last=False,
+                 **kwargs):
+        super(StandardUpdater, self).__init__(**kwargs)
+        self.device = torch.device(self.device)
+
+        if autocast:
+            for name, param in model.named_parameters():
+                if param.dtype != torch.float32:
+                    raise ValueError('autocast keeps float32 master weights, but {} is {}'.format(name, param.dtype))
+        if channels_last:
+            model = model.to(memory_format=torch.channels_last)
+        if distributed.get_world_size() > 1:
+            device_ids = [self.device] if self.device.type == 'cuda' else None
+            model = DistributedDataParallel(model, device_ids=device_ids)
+
+        self.model = model
+        self.criterion = criterion
+        self.autocast = autocast
+        self.autocast_dtype = autocast_dtype
+        self.channels_last = channels_last
+
+    @property
+    def options(self):
+        """Dictionary of the enabled precision and memory format options."""
+        return {'autocast': self.autocast,
+                'autocast_dtype': str(self.autocast_dtype).replace('torch.', ''),
+                'channels_last': self.channels_last}
+
+    def converter(self, batch):
+        input, target = batch
+        input = input.to(self.device)
+        if self.channels_last and input.dim() == 4:
+            input = input.contiguous(memory_format=torch.channels_last)
+        target = target.to(self.device)
+        return input, target
+
+    def update(self, batch):
+        input, target = self.converter(batch)
+
+        with torch.autocast(device_type=self.device.type, dtype=self.autocast_dtype, enabled=self.autocast):
+            output = self.model(input)
+        if output.is_floating_point():
+            output = output.float()
+        loss = self.criterion(output, target)
+
+        for optimizer in self.optimizers.values():
+            optimizer.zero_grad()
+        loss.backward()
+        for optimizer in self.optimizers.values():
+            optimizer.step()
+
+        with self.reporter.scope('scalar'):
+            self.reporter.report({'loss': loss})
+
+    def state_dict(self):
+        state = super(StandardUpdater, self).state_dict()
+        state['options'] = self.options
+        return state
+
+    def load_state_dict(self, state):
+        options = state.get('options')
+        if options is not None and options != self.options:
+            warnings.warn('the snapshot was taken with updater options {}, but the current ones are {}'
+                          .format(options, self.options))
+        super(StandardUpdater, self).load_state_dict(state)
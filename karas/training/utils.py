@@ -1,8 +1,15 @@
 import contextlib
+import copy
+import itertools
 import os
+import random
 import shutil
 import tempfile
 
+import numpy
+import six
+import torch
+
 if os.name == "nt":
     import ctypes
 
@@ -74,3 +81,67 @@ def tempdir(**kwargs):
         yield temp_dir
     finally:
         shutil.rmtree(temp_dir, ignore_errors=ignore_errors)
+
+
+def cpu_copy_module(module):
+    """Returns a copy of a module whose parameters and buffers are on CPU.
+
+    Unlike ``module.cpu()``, the given module is neither moved nor modified,
+    and only the parameters and buffers are copied from the device.
+
+    """
+    memo = {}
+    for tensor in itertools.chain(module.parameters(), module.buffers()):
+        copied = tensor.detach().to('cpu', copy=True)
+        if isinstance(tensor, torch.nn.Parameter):
+            copied = torch.nn.Parameter(copied, requires_grad=tensor.requires_grad)
+        memo[id(tensor)] = copied
+    return copy.deepcopy(module, memo)
+
+
+def copy_to_cpu(obj):
+    """Returns a copy of a nested state whose tensors are cloned on CPU.
+
+    Dictionaries, lists and tuples are copied recursively, and other values
+    are shared. It is used to take a consistent copy of a ``state_dict``.
+    The copy of a dictionary keeps its type and attributes, such as the
+    ``_metadata`` of the ``state_dict`` of a module and the factory of a
+    :class:`~collections.defaultdict`.
+
+    """
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        copied = copy.copy(obj)
+        for key, value in six.iteritems(obj):
+            copied[key] = copy_to_cpu(value)
+        return copied
+    if isinstance(obj, tuple) and hasattr(obj, '_fields'):
+        # named tuple
+        return type(obj)(*[copy_to_cpu(value) for value in obj])
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(copy_to_cpu(value) for value in obj)
+    return obj
+
+
+def get_rng_state():
+    """Returns the states of the Python, NumPy and PyTorch random generators."""
+    state = numpy.random.get_state(legacy=False)
+    state['state']['key'] = torch.from_numpy(state['state']['key'].astype(numpy.int64))
+    rng = {'python': random.getstate(),
+           'numpy': state,
+           'torch': torch.get_rng_state()}
+    if torch.cuda.is_available():
+        rng['cuda'] = torch.cuda.get_rng_state_all()
+    return rng
+
+
+def set_rng_state(rng):
+    """Restores the states returned by :func:`get_rng_state`."""
+    random.setstate(rng['python'])
+    state = copy.deepcopy(rng['numpy'])
+    state['state']['key'] = state['state']['key'].numpy().astype(numpy.uint32)
+    numpy.random.set_state(state)
+    torch.set_rng_state(rng['torch'])
+    if 'cuda' in rng and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(rng['cuda'])
@@ -0,0 +1,43 @@
+import pytest
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+from torch.utils.data import TensorDataset
+
+import karas.training.updater as updater
+from karas.training.trainer import Trainer
+
+
+class ClassifierUpdater(updater.Updater):
+
+    def __init__(self, model, **kwargs):
+        super(ClassifierUpdater, self).__init__(**kwargs)
+        self.model = model
+        self.criterion = nn.CrossEntropyLoss()
+
+    def update(self, batch):
+        x, t = batch
+        y = self.model(x)
+        loss = self.criterion(y, t)
+        self.optimizers['net'].zero_grad()
+        loss.backward()
+        self.optimizers['net'].step()
+        self.reporter.report({'loss': loss, 'accuracy': (y.argmax(1) == t).float().mean()})
+
+
+def build_trainer(out, stop=(3, 'epoch'), seed=0, **kwargs):
+    generator = torch.Generator().manual_seed(0)
+    dataset = TensorDataset(torch.randn(64, 8, generator=generator), torch.randint(0, 3, (64,), generator=generator))
+    torch.manual_seed(seed)
+    loaders = {'train': DataLoader(dataset, batch_size=8, shuffle=True)}
+    model = nn.Linear(8, 3)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+    up = ClassifierUpdater(model, optimizers={'net': optimizer}, device=torch.device('cpu'))
+    return Trainer(up, stop_trigger=stop, loaders=loaders, out=str(out), **kwargs)
+
+
+@pytest.fixture
+def make_trainer(tmp_path):
+    def make(name='result', **kwargs):
+        return build_trainer(tmp_path / name, **kwargs)
+    return make
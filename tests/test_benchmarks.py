@@ -0,0 +1,20 @@
+from benchmarks.__main__ import compare
+from benchmarks.__main__ import find_modules
+from benchmarks.common import measure
+
+
+def test_find_modules():
+    names = find_modules()
+    assert 'bench_trainer_loop' in names
+    assert all(name.startswith('bench_') for name in names)
+    assert find_modules(['trainer_loop', 'reporter']) == ['bench_reporter', 'bench_trainer_loop']
+
+
+def test_compare_flags_regressions(capsys):
+    results = {'fast': 1.0, 'slow': 1.5, 'new': 1.0}
+    assert compare(results, {'fast': 1.0, 'slow': 1.0}, threshold=0.1) == ['slow']
+    assert '(new)' in capsys.readouterr().out
+
+
+def test_measure():
+    assert measure(lambda: None, number=10, repeat=2) >= 0
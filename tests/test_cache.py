@@ -0,0 +1,74 @@
+import pickle
+
+import torch
+from torch.utils.data import DataLoader
+from torch.utils.data import Dataset
+
+from karas.datasets import CachedDataset
+from karas.datasets import CachedLoader
+from karas.datasets import compute_fingerprint
+
+
+class _Squares(Dataset):
+
+    def __init__(self, n=6):
+        self.n = n
+        self.loaded = 0
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, index):
+        self.loaded += 1
+        return {'x': torch.full((2,), float(index)) ** 2, 'label': index}
+
+    def __repr__(self):
+        return '_Squares({})'.format(self.n)
+
+
+def test_fingerprint_follows_the_dataset():
+    assert compute_fingerprint(_Squares()) == compute_fingerprint(_Squares())
+    assert compute_fingerprint(_Squares()) != compute_fingerprint(_Squares(7))
+    assert compute_fingerprint(_Squares()) != compute_fingerprint(_Squares(), 'v2')
+
+
+def test_cached_dataset_transforms_each_sample_once(tmp_path):
+    dataset = _Squares()
+    cached = CachedDataset(dataset, root=str(tmp_path))
+    first = [cached[i] for i in range(len(cached))]
+    loaded = dataset.loaded
+    assert cached.complete
+
+    restored = pickle.loads(pickle.dumps(cached))
+    second = [restored[i] for i in range(len(restored))]
+    assert restored.dataset.loaded == loaded
+    for a, b in zip(first, second):
+        assert torch.equal(a['x'], b['x'])
+        assert int(a['label']) == int(b['label'])
+
+    # a later run finds the cache of the same fingerprint
+    again = _Squares()
+    assert torch.equal(CachedDataset(again, root=str(tmp_path))[5]['x'], torch.full((2,), 25.))
+    assert again.loaded == 2  # only the first and the last samples, read by the fingerprint
+
+
+def test_cached_loader_replays_the_batches(tmp_path):
+    dataset = _Squares()
+    cached = CachedLoader(DataLoader(dataset, batch_size=4), root=str(tmp_path))
+    assert not cached.complete
+
+    first = list(cached)
+    loaded = dataset.loaded
+    assert cached.complete
+    assert len(cached) == 2
+    second = list(cached)
+    assert dataset.loaded == loaded
+    assert [batch['label'].tolist() for batch in second] == [[0, 1, 2, 3], [4, 5]]
+    for a, b in zip(first, second):
+        assert torch.equal(a['x'], b['x'])
+
+    torch.manual_seed(0)
+    cached.shuffle = True
+    batches = cached.sample_batches()
+    assert sorted(len(batch) for batch in batches) == [2, 4]
+    assert [batch['label'].tolist() for batch in cached.load_batches([[1, 3]])] == [[1, 3]]
@@ -0,0 +1,78 @@
+import os
+
+import torch
+
+from karas import checkpoint
+from karas.training.extensions import LogReport
+from karas.training.extensions import Snapshot
+
+
+def _equal(a, b):
+    if isinstance(a, torch.Tensor):
+        return torch.equal(a, b)
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_equal(a[key], b[key]) for key in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def test_components_round_trip():
+    state = {'updater': {'models': {'net/a': {'w': torch.ones(2)}}, 'optimizers': {}, 'scale': 2.0},
+             'extensions': {},
+             'elapsed_time': 1.0}
+    components = checkpoint.trainer_components(state)
+    assert sorted(components) == ['elapsed_time', 'extensions', 'updater/models/net%2Fa',
+                                  'updater/optimizers', 'updater/scale']
+    assert _equal(checkpoint.assemble(components), state)
+
+
+def test_resume_a_trainer_without_extensions(make_trainer, tmp_path):
+    trainer = make_trainer('first', stop=(1, 'epoch'))
+    trainer.run()
+    path = str(tmp_path / 'checkpoint')
+    checkpoint.save(checkpoint.trainer_components(trainer.state_dict()), path)
+    state = checkpoint.load(path)
+    assert state['extensions'] == {}
+
+    resumed = make_trainer('second', stop=(2, 'epoch'), seed=1)
+    resumed.load_state_dict(state)
+    assert resumed.iteration == trainer.iteration
+    assert _equal(resumed.updater.state_dict(), trainer.updater.state_dict())
+
+
+def test_resume_restores_extensions(make_trainer):
+    trainer = make_trainer('first', stop=(1, 'epoch'))
+    trainer.extend(LogReport(trigger=(4, 'iteration'), log_name=None))
+    trainer.extend(Snapshot(filename='snapshot', format='indexed'), trigger=(1, 'epoch'))
+    trainer.run()
+
+    resumed = make_trainer('second', stop=(2, 'epoch'))
+    resumed.extend(LogReport(trigger=(4, 'iteration'), log_name=None))
+    resumed.extend(Snapshot(filename='snapshot', format='indexed'), trigger=(1, 'epoch'))
+    resumed.load_state_dict(checkpoint.load(os.path.join(trainer.out, 'snapshot')))
+    assert list(resumed.get_extension('LogReport').log) == list(trainer.get_extension('LogReport').log)
+
+
+def test_resume_from_a_sharded_snapshot(make_trainer):
+    trainer = make_trainer('first', stop=(1, 'epoch'))
+    trainer.extend(Snapshot(filename='snapshot', format='sharded'), trigger=(1, 'epoch'))
+    trainer.run()
+    state = checkpoint.load_sharded(os.path.join(trainer.out, 'snapshot'))
+    assert _equal(state['updater'], trainer.updater.state_dict())
+
+    resumed = make_trainer('second', stop=(2, 'epoch'), seed=1)
+    resumed.extend(Snapshot(filename='snapshot', format='sharded'), trigger=(1, 'epoch'))
+    resumed.load_state_dict(state)
+    assert torch.equal(torch.get_rng_state(), state['rng']['torch'])
+    resumed.run()
+    assert resumed.iteration > trainer.iteration
+
+
+def test_shared_tensors_stay_shared(tmp_path):
+    x = torch.arange(6.)
+    checkpoint.save_sharded({'a': {'x': x, 'y': x}, 'b': x[:2].clone()}, str(tmp_path / 'ckpt'), shard_size=16)
+    components = checkpoint.load_sharded(str(tmp_path / 'ckpt'))
+    assert components['a']['x'] is components['a']['y']
+    assert torch.equal(components['a']['x'], x)
+    assert components['b'].storage_offset() == 0
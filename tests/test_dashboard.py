@@ -0,0 +1,32 @@
+import io
+import pickle
+
+from karas.training.extensions import Dashboard
+from karas.training.extensions import LogReport
+
+
+def test_rows_are_printed_below_one_header(make_trainer):
+    out = io.StringIO()
+    trainer = make_trainer(stop=(3, 'epoch'))
+    trainer.extend(LogReport(log_name=None))
+    trainer.extend(Dashboard(['epoch', 'iteration', 'train/loss'], refresh_interval=0.01, out=out))
+    trainer.run()
+
+    text = out.getvalue()
+    assert text.count('train/loss') == 1
+    lines = text.replace('\033[4A', '').replace('\033[J', '').splitlines()
+    rows = [line.split() for line in lines if line[:1].isdigit()]
+    assert [row[1] for row in rows] == ['8', '16', '24']
+    assert 'iters/sec' in text
+
+
+def test_pickle_drops_the_thread(make_trainer):
+    dashboard = Dashboard(['epoch'], refresh_interval=0.01, out=io.StringIO())
+    trainer = make_trainer()
+    dashboard.initialize(trainer)
+    try:
+        restored = pickle.loads(pickle.dumps(dashboard))
+    finally:
+        dashboard.finalize()
+    assert restored._thread is None
+    assert restored._rows is not dashboard._rows
@@ -0,0 +1,39 @@
+import os
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+from torch.utils.data import TensorDataset
+
+from karas import distributed
+from karas.training.extensions import LogReport
+from karas.training.trainer import Trainer
+from karas.training.updaters import StandardUpdater
+
+
+def _train(out):
+    generator = torch.Generator().manual_seed(0)
+    dataset = TensorDataset(torch.randn(64, 8, generator=generator), torch.randint(0, 3, (64,), generator=generator))
+    torch.manual_seed(distributed.get_rank())  # the ranks must not rely on equal seeds
+    model = nn.Linear(8, 3)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+    updater = StandardUpdater(model, F.cross_entropy, device='cpu', optimizers={'net': optimizer})
+    trainer = Trainer(updater, stop_trigger=(2, 'epoch'),
+                      loaders={'train': DataLoader(dataset, batch_size=8, shuffle=True)}, out=out)
+    trainer.extend(LogReport(trigger=(1, 'epoch')))
+    trainer.run()
+
+    torch.save({'iteration': trainer.iteration, 'weight': updater.model.module.weight.detach()},
+               os.path.join(out, 'rank{}.pth'.format(distributed.get_rank())))
+
+
+def test_data_parallel_training(tmp_path):
+    out = str(tmp_path)
+    distributed.launch(_train, 2, args=(out,), master_port=29517, num_threads=1)
+
+    states = [torch.load(os.path.join(out, 'rank{}.pth'.format(rank))) for rank in range(2)]
+    # each process runs half of the 8 batches of an epoch
+    assert [state['iteration'] for state in states] == [8, 8]
+    assert torch.equal(states[0]['weight'], states[1]['weight'])
+    assert os.path.exists(os.path.join(out, 'log'))
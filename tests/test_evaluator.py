@@ -0,0 +1,15 @@
+import pytest
+
+from karas.training.extensions import Evaluator
+from karas.training.extensions import LogReport
+
+
+@pytest.mark.parametrize('mode', ['sync', 'thread'])
+def test_results_are_logged_at_the_evaluated_iteration(make_trainer, mode):
+    trainer = make_trainer(stop=(2, 'epoch'))
+    trainer.extend(Evaluator(trainer.get_loader('train'), mode=mode), trigger=(3, 'iteration'))
+    trainer.extend(LogReport(['test/accuracy'], trigger=(3, 'iteration'), log_name=None))
+    trainer.run()
+    rows = [row for row in trainer.get_extension('LogReport').log if 'test/accuracy' in row]
+    # the last asynchronous evaluation may still be running at the end and be discarded
+    assert [row['iteration'] for row in rows][:4] == [3, 6, 9, 12]
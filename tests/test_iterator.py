@@ -0,0 +1,59 @@
+import pytest
+import torch
+
+from conftest import ClassifierUpdater
+from conftest import build_trainer
+from karas.iterators.iterator import Iterator
+
+
+class _RecordingUpdater(ClassifierUpdater):
+
+    def update(self, batch):
+        # like dropout, the update draws from the global generator
+        self.seen.append((batch[0].sum().item(), torch.rand(()).item()))
+        super(_RecordingUpdater, self).update(batch)
+
+
+def _record(trainer):
+    updater = trainer.updater
+    updater.__class__ = _RecordingUpdater
+    updater.seen = []
+    return updater.seen
+
+
+@pytest.mark.parametrize('prefetch', [0, 2])
+def test_resume_replays_the_batch_order(tmp_path, prefetch):
+    trainer = build_trainer(tmp_path / 'full', stop=(4, 'epoch'), prefetch=prefetch)
+    expected = _record(trainer)
+    trainer.run()
+    assert len(expected) > 24
+
+    trainer = build_trainer(tmp_path / 'first', stop=(12, 'iteration'), prefetch=prefetch)
+    seen = _record(trainer)
+    trainer.run()
+    state = trainer.state_dict()
+
+    trainer = build_trainer(tmp_path / 'second', stop=(4, 'epoch'), seed=1, prefetch=prefetch)
+    state['stop_trigger'] = trainer.state_dict()['stop_trigger']
+    trainer.load_state_dict(state)
+    resumed = _record(trainer)
+    trainer.run()
+    assert seen + resumed == expected
+
+
+class _Loader(object):
+
+    def __iter__(self):
+        return iter(torch.arange(4))
+
+    def __len__(self):
+        return 4
+
+
+def test_prefetching_iterator_without_replay_cannot_resume():
+    iterator = Iterator(_Loader(), repeat=True, prefetch=2)
+    state = iterator.state_dict()
+    next(iterator)
+    with pytest.raises(ValueError):
+        iterator.load_state_dict(state)
+    iterator.close()
@@ -0,0 +1,22 @@
+from karas import KeyMatcher
+from karas import compare_key
+
+KEYS = ['loss', 'test/accuracy', 'scalar/loss', 'train/images/input', 'main/loss']
+TAGS = ['train/scalar/loss', 'train/loss', 'test/scalar/accuracy', 'test/scalar/loss', 'train/images/input',
+        'train/main/loss', 'test/others/evaluation']
+
+
+def test_matcher_agrees_with_compare_key():
+    matcher = KeyMatcher(KEYS)
+    for tag in TAGS:
+        expected = tuple(key for key in KEYS if compare_key(key, tag))
+        assert matcher.match(tag) == expected
+        # memoized
+        assert matcher.match(tag) == expected
+
+
+def test_select_pairs_keys_with_tags():
+    matcher = KeyMatcher(['loss', 'test/accuracy'])
+    observation = {tag: None for tag in TAGS}
+    assert sorted(matcher.select(observation)) == [('loss', 'train/loss'), ('loss', 'train/scalar/loss'),
+                                                   ('test/accuracy', 'test/scalar/accuracy')]
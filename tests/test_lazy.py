@@ -0,0 +1,37 @@
+import subprocess
+import sys
+
+import torch
+from torch.utils.data import DataLoader
+from torch.utils.data import TensorDataset
+
+from karas.iterators.iterator import Iterator
+
+
+class _CountingDataset(TensorDataset):
+
+    loaded = 0
+
+    def __getitem__(self, index):
+        self.loaded += 1
+        return super(_CountingDataset, self).__getitem__(index)
+
+
+def test_extensions_do_not_import_tensorboardx():
+    code = ('import sys\n'
+            'import karas.training.extensions as extensions\n'
+            'from karas.training.trainer import Trainer\n'
+            'extensions.LogReport\n'
+            'assert "TensorBoard" in dir(extensions)\n'
+            'assert "tensorboardX" not in sys.modules\n')
+    subprocess.check_call([sys.executable, '-c', code])
+
+
+def test_iterator_starts_the_loader_on_the_first_batch():
+    dataset = _CountingDataset(torch.arange(4))
+    iterator = Iterator(DataLoader(dataset, batch_size=2))
+    assert dataset.loaded == 0
+
+    assert next(iterator)[0].tolist() == [0, 1]
+    assert next(iterator)[0].tolist() == [2, 3]
+    assert dataset.loaded == 4
@@ -0,0 +1,39 @@
+import json
+import os
+
+from karas.training.extension import Extension
+from karas.training.extensions import LogReport
+
+
+class _Reporter(Extension):
+
+    def __call__(self, trainer):
+        trainer.reporter.report({'value': float(trainer.iteration)})
+
+
+def test_log_report_averages_over_the_interval(make_trainer):
+    trainer = make_trainer(stop=(8, 'iteration'))
+    trainer.extend(_Reporter())
+    trainer.extend(LogReport(['test/value'], trigger=(4, 'iteration'), log_name=None))
+    trainer.run()
+    log = trainer.get_extension('LogReport').log
+    assert [row['test/value'] for row in log] == [2.5, 6.5]
+
+
+def test_streamed_log_is_truncated_on_resume(make_trainer):
+    trainer = make_trainer(stop=(8, 'iteration'))
+    trainer.extend(LogReport(['loss'], trigger=(4, 'iteration'), stream=True))
+    trainer.run()
+    state = trainer.state_dict()
+    path = os.path.join(trainer.out, 'log')
+    with open(path, 'a') as f:
+        f.write('{"loss": 1.0, "iter')  # torn by a crash
+
+    trainer = make_trainer(stop=(16, 'iteration'))
+    trainer.extend(LogReport(['loss'], trigger=(4, 'iteration'), stream=True))
+    trainer.load_state_dict(state)
+    trainer.run()
+    with open(path) as f:
+        rows = [json.loads(line) for line in f]
+    assert [row['iteration'] for row in rows] == [4, 8, 12, 16]
+    assert rows == list(trainer.get_extension('LogReport').log)
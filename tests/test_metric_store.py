@@ -0,0 +1,58 @@
+import numpy
+import pytest
+import torch
+
+from karas.metric_store import MetricStore
+
+
+def _fill(store):
+    store.append({'iteration': 1, 'loss': 3.0, 'name': 'a'})
+    store.append({'iteration': 2, 'loss': torch.tensor(1.0)})
+    store.append({'iteration': 3, 'loss': 2, 'accuracy': 0.5})
+
+
+def test_columns_and_rows():
+    store = MetricStore(capacity=1)
+    _fill(store)
+
+    assert len(store) == 3
+    assert store.keys() == ['iteration', 'loss', 'name', 'accuracy']
+    # the integer is promoted into the float column
+    assert store.column('loss').dtype == numpy.float64
+    assert store.values('accuracy').tolist() == [0.5]
+    assert store.rows[1] == {'iteration': 2, 'loss': 1.0}
+    assert store.rows[-1] == {'iteration': 3, 'loss': 2.0, 'accuracy': 0.5}
+    assert store.argmin('loss') == 1
+    assert store.argmax('loss') == 0
+    assert store.rolling('loss', 2).tolist() == [2.0, 1.5]
+    with pytest.raises(ValueError):
+        store.rolling('loss', 2, reduce='median')
+
+
+def test_drop_keeps_the_latest_rows():
+    store = MetricStore()
+    _fill(store)
+    store.drop(2)
+    assert list(store.rows) == [{'iteration': 3, 'loss': 2.0, 'accuracy': 0.5}]
+
+
+def test_state_dict_round_trip():
+    store = MetricStore()
+    _fill(store)
+    restored = MetricStore()
+    restored.load_state_dict(store.state_dict())
+    assert list(restored.rows) == list(store.rows)
+
+
+def test_flushed_store_is_reopened(tmp_path):
+    path = str(tmp_path / 'metrics')
+    store = MetricStore(path, capacity=2)
+    _fill(store)
+    store.flush()
+
+    reopened = MetricStore.load(path)
+    # object columns are not kept on the disk
+    assert list(reopened.rows) == [{'iteration': 1, 'loss': 3.0}, {'iteration': 2, 'loss': 1.0},
+                                   {'iteration': 3, 'loss': 2.0, 'accuracy': 0.5}]
+    reopened.append({'iteration': 4, 'loss': 0.5})
+    assert reopened.argmin('loss') == 3
@@ -0,0 +1,21 @@
+import json
+
+from karas.profiler import Profiler
+from karas.training.extensions import LogReport
+
+
+def test_phase_times_are_reported_and_traced(make_trainer, tmp_path):
+    profiler = Profiler(trace_window=(2, 4))
+    trainer = make_trainer(stop=(8, 'iteration'), profiler=profiler)
+    trainer.extend(LogReport(trigger=(4, 'iteration'), log_name=None))
+    trainer.run()
+
+    row = trainer.get_extension('LogReport').log[-1]
+    for phase in ('data', 'update', 'extension/LogReport'):
+        assert row['train/scalar/time/' + phase] >= 0
+    assert {iteration for _, _, _, iteration in profiler.events} == {2, 3}
+
+    path = str(tmp_path / 'trace.json')
+    profiler.export_chrome_trace(path)
+    with open(path) as f:
+        assert json.load(f)
@@ -0,0 +1,63 @@
+import torch
+
+from karas.reporter import DictSummary
+from karas.reporter import Reporter
+from karas.training.extension import Extension
+from karas.training.extensions import LogReport
+from karas.training.triggers import MaxValueTrigger
+
+
+class _Nothing(Extension):
+
+    def __call__(self, trainer):
+        pass
+
+
+def _logs(make_trainer, deferred, consumer):
+    trainer = make_trainer('deferred' if deferred else 'eager', deferred_report=deferred)
+    trainer.extend(LogReport(['epoch', 'iteration', 'loss', 'accuracy'], trigger=(4, 'iteration')))
+    if consumer:
+        trainer.extend(_Nothing(), trigger=MaxValueTrigger(key='accuracy', trigger=(2, 'iteration')))
+    trainer.run()
+    return [{key: row[key] for key in ('epoch', 'iteration', 'loss', 'accuracy')}
+            for row in trainer.get_extension('LogReport').log]
+
+
+def test_deferred_report_is_logged_as_eager(make_trainer):
+    eager = _logs(make_trainer, False, False)
+    assert len(eager) == 6
+    assert _logs(make_trainer, True, False) == eager
+    assert _logs(make_trainer, True, True) == eager
+
+
+def test_deferred_observation_holds_last_value():
+    reporter = Reporter(deferred=True)
+    received = []
+    reporter.subscribe(('x',), lambda key, value: received.append(float(value)))
+    with reporter.scope('train'):
+        reporter.report({'x': torch.tensor(1.0)})
+        reporter.report({'x': torch.tensor(3, dtype=torch.int64)})
+    assert received == [1.0, 3.0]
+    value = reporter.observation['train/x']
+    assert value.dtype == torch.int64
+    assert value.item() == 3
+
+
+def test_summary_of_subscribed_values():
+    reporter = Reporter(deferred=True)
+    summary = DictSummary()
+    reporter.subscribe(('x',), lambda key, value: summary.add({key: value}))
+    with reporter.scope('train'):
+        for value in (1.0, 2.0, 6.0):
+            reporter.report({'x': torch.tensor(value)})
+    assert summary.compute_mean() == {'x': 3.0}
+
+
+def test_recycle_keeps_scalars_and_drops_transient_values():
+    reporter = Reporter()
+    with reporter.scope('train'):
+        reporter.report({'loss': torch.tensor(1.0), 'count': 3, 'image': torch.zeros(3, 2, 2),
+                         'info': {'a': 1}, 'name': 'x'})
+        reporter.report({'accuracy': 0.5}, transient=True)
+    reporter.recycle()
+    assert sorted(reporter.observation) == ['train/count', 'train/loss']
@@ -0,0 +1,38 @@
+import os
+import pickle
+
+import pytest
+import torch
+
+from karas.training.extension import Extension
+from karas.training.extensions import Snapshot
+
+
+class _Weights(Extension):
+
+    def __init__(self):
+        self.weights = {}
+
+    def __call__(self, trainer):
+        self.weights[trainer.iteration] = trainer.updater.model.weight.detach().clone()
+
+
+@pytest.mark.parametrize('format', ['pickle', 'state_dict'])
+def test_async_snapshots_hold_the_state_of_their_iteration(make_trainer, format):
+    trainer = make_trainer(stop=(16, 'iteration'))
+    weights = _Weights()
+    trainer.extend(Snapshot(filename='snapshot_{.iteration}', format=format, async_write=True, max_pending=2),
+                   trigger=(4, 'iteration'))
+    trainer.extend(weights, trigger=(4, 'iteration'))
+    trainer.run()
+
+    names = sorted(name for name in os.listdir(trainer.out) if name.startswith('snapshot_'))
+    assert names == ['snapshot_12', 'snapshot_16', 'snapshot_4', 'snapshot_8']
+    for iteration, weight in weights.weights.items():
+        path = os.path.join(trainer.out, 'snapshot_{}'.format(iteration))
+        if format == 'pickle':
+            with open(path, 'rb') as f:
+                saved = pickle.load(f).updater.model.weight
+        else:
+            saved = torch.load(path, weights_only=False)['updater']['models']['model']['weight']
+        assert torch.equal(saved, weight)
@@ -0,0 +1,41 @@
+import collections
+import random
+
+import numpy
+import torch
+
+from karas.training import utils
+
+Pair = collections.namedtuple('Pair', ['first', 'second'])
+
+
+def test_copy_to_cpu_keeps_types_and_attributes():
+    state = torch.nn.Linear(2, 2).state_dict()
+    nested = {'model': state, 'pair': Pair(torch.ones(1), [torch.zeros(1)]),
+              'counts': collections.defaultdict(int, a=1)}
+    copied = utils.copy_to_cpu(nested)
+    assert copied['model']._metadata == state._metadata
+    assert isinstance(copied['pair'], Pair)
+    assert copied['counts'].default_factory is int
+    assert copied['model']['weight'] is not state['weight']
+    assert torch.equal(copied['model']['weight'], state['weight'])
+
+
+def test_rng_state_round_trip():
+    state = utils.get_rng_state()
+    expected = (random.random(), numpy.random.rand(), torch.rand(()).item())
+    utils.set_rng_state(state)
+    assert (random.random(), numpy.random.rand(), torch.rand(()).item()) == expected
+
+
+def test_trainer_state_round_trip(make_trainer):
+    trainer = make_trainer('first', stop=(12, 'iteration'))
+    trainer.run()
+    state = trainer.state_dict()
+
+    resumed = make_trainer('second', stop=(12, 'iteration'), seed=1)
+    resumed.load_state_dict(state)
+    assert resumed.iteration == trainer.iteration
+    assert resumed.epoch == trainer.epoch
+    for name, value in trainer.updater.model.state_dict().items():
+        assert torch.equal(resumed.updater.model.state_dict()[name], value)
@@ -0,0 +1,41 @@
+import numpy
+import pytest
+import torch
+
+from karas.reporter import DictSummary
+from karas.reporter import Summary
+
+
+def test_summary_is_stable():
+    values = 1e9 + numpy.arange(10, dtype=numpy.float64)
+    summary = Summary()
+    for value in values:
+        summary.add(value)
+    mean, std = summary.make_statistics()
+    assert mean == pytest.approx(values.mean())
+    assert std == pytest.approx(values.std())
+
+
+def test_dict_summary_statistics():
+    summary = DictSummary()
+    summary.add({'a': 1.0, 'b': torch.tensor(2.0), 'image': torch.zeros(2, 2), 'name': 'x'})
+    summary.add({'a': (3.0, 3), 'b': numpy.float32(4.0)})
+    stats = summary.make_statistics()
+    assert sorted(stats) == ['a', 'a.std', 'b', 'b.std']
+    assert stats['a'] == pytest.approx(2.5)
+    assert stats['a.std'] == pytest.approx(numpy.sqrt(0.75))
+    assert stats['b'] == pytest.approx(3.0)
+
+
+def test_dict_summary_merge_and_state():
+    values = numpy.random.RandomState(0).randn(20)
+    whole, first, second = DictSummary(), DictSummary(), DictSummary()
+    for i, value in enumerate(values):
+        whole.add({'x': value})
+        (first if i < 7 else second).add({'x': value, 'y': i})
+    first.merge(second)
+    assert first.make_statistics()['x.std'] == pytest.approx(whole.make_statistics()['x.std'])
+
+    restored = DictSummary()
+    restored.load_state_dict(first.state_dict())
+    assert restored.compute_mean() == pytest.approx(first.compute_mean())
@@ -0,0 +1,50 @@
+from conftest import build_trainer
+from karas.training.sweep import Sweep
+from karas.training.sweep import sample_configs
+from karas.training.triggers import SuccessiveHalvingTrigger
+from karas.training.triggers.successive_halving_trigger import LocalRecords
+
+
+def _build(config, out):
+    trainer = build_trainer(out, stop=(config['epochs'], 'epoch'))
+    for group in trainer.updater.optimizers['net'].param_groups:
+        group['lr'] = config['lr']
+    return trainer
+
+
+def test_sample_configs():
+    space = {'lr': lambda rng: rng.uniform(0, 1), 'width': [64, 128], 'epochs': 3}
+    configs = sample_configs(space, 4, seed=1)
+
+    assert configs == sample_configs(space, 4, seed=1)
+    assert all(config['width'] in (64, 128) and 0 <= config['lr'] < 1 and config['epochs'] == 3
+               for config in configs)
+
+
+def test_trial_behind_the_others_is_stopped(make_trainer):
+    records = LocalRecords()
+    for _ in range(2):
+        records.add(0, 0.0)  # two trials which reached a loss of zero
+
+    trainer = make_trainer(stop=(9, 'epoch'))
+    trigger = SuccessiveHalvingTrigger('train/loss', mode='min', records=records, trigger=trainer.stop_trigger)
+    trainer.stop_trigger = trigger
+    trainer.run()
+
+    assert trigger.stopped is True
+    assert trainer.iteration == 8  # one epoch of 8 batches
+    assert [length for length, _ in trigger.history] == [1]
+
+
+def test_sweep_runs_the_trials(tmp_path):
+    configs = [{'lr': 0.1, 'epochs': 3}, {'lr': 0.0, 'epochs': 3}, {'lr': 0.2, 'epochs': 3}]
+    # one worker runs the trials in order, so the rungs are reached in order too
+    sweep = Sweep(_build, configs, key='train/loss', mode='min', max_workers=1, out=str(tmp_path))
+    results = sweep.run()
+
+    assert all(result['error'] is None for result in results)
+    assert [result['trial'] for result in results] == [0, 1, 2]
+    assert [result['stopped'] for result in results] == [False, False, True]
+    assert [result['iteration'] for result in results] == [24, 24, 8]
+    # the trial which does not learn ends behind
+    assert results[0]['value'] < results[1]['value']
@@ -0,0 +1,47 @@
+import pytest
+import torch
+from torch.utils.data import DataLoader
+from torch.utils.data import TensorDataset
+
+from karas.datasets import TensorLoader
+from karas.iterators.iterator import Iterator
+
+
+def test_batches_match_the_dataloader():
+    x, t = torch.randn(10, 3), torch.arange(10)
+    loader = TensorLoader(x, t, batch_size=4)
+    expected = list(DataLoader(TensorDataset(x, t), batch_size=4))
+
+    assert len(loader) == 3
+    for batch, other in zip(loader, expected):
+        assert all(torch.equal(a, b) for a, b in zip(batch, other))
+    assert len(TensorLoader(x, t, batch_size=4, drop_last=True)) == 2
+    assert len(list(TensorLoader(x, t, batch_size=4, drop_last=True))) == 2
+
+
+def test_shuffled_epoch_covers_the_samples():
+    loader = TensorLoader(torch.arange(10), batch_size=4, shuffle=True, generator=torch.Generator().manual_seed(0))
+    batches = [batch for batch, in loader]
+    assert sorted(torch.cat(batches).tolist()) == list(range(10))
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+
+
+def test_sizes_must_match():
+    with pytest.raises(ValueError):
+        TensorLoader(torch.zeros(3), torch.zeros(4))
+
+
+def test_iterator_resumes_within_an_epoch():
+    torch.manual_seed(0)
+    iterator = Iterator(TensorLoader(torch.arange(10), batch_size=3, shuffle=True), repeat=True)
+    for _ in range(2):
+        next(iterator)
+    state = iterator.state_dict()
+    rng_state = torch.get_rng_state()  # saved by the trainer along with the iterator
+    expected = [next(iterator)[0].tolist() for _ in range(4)]
+
+    torch.manual_seed(1)
+    iterator = Iterator(TensorLoader(torch.arange(10), batch_size=3, shuffle=True), repeat=True)
+    iterator.load_state_dict(state)
+    torch.set_rng_state(rng_state)
+    assert [next(iterator)[0].tolist() for _ in range(4)] == expected
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+import torch
+
+from karas.training.extensions import TensorBoard
+from karas.training.extensions.tensorboard import _AsyncWriter
+from karas.training.extensions.tensorboard import reduce_images
+
+
+class _BlockedWriter(object):
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.calls = []
+
+    def add_scalar(self, tag, value, global_step):
+        self.released.wait()
+        self.calls.append((tag, global_step))
+
+    add_image = add_scalar
+
+    def close(self):
+        pass
+
+
+def test_reduce_images_tiles_the_kept_images():
+    images = torch.arange(5 * 3 * 4 * 4, dtype=torch.float32).reshape(5, 3, 4, 4)
+    grid = reduce_images(images, max_images=3)
+
+    # three images are tiled on a 2 x 2 grid, padded with zeros
+    assert grid.shape == (3, 8, 8)
+    assert torch.equal(grid[:, :4, :4], images[0])
+    assert torch.equal(grid[:, :4, 4:], images[1])
+    assert torch.equal(grid[:, 4:, :4], images[2])
+    assert not grid[:, 4:, 4:].any()
+
+
+def test_reduce_images_downsamples():
+    images = torch.randint(0, 256, (2, 1, 8, 4), dtype=torch.uint8)
+    grid = reduce_images(images, image_size=4)
+
+    assert grid.dtype == torch.uint8
+    assert grid.shape == (1, 4, 4)
+    assert reduce_images(torch.ones(3)) is None
+
+
+def test_async_writer_drops_images_over_budget():
+    writer = _BlockedWriter()
+    image = torch.zeros(1, 4, 4)  # 64 bytes
+    with pytest.warns(UserWarning):
+        async_writer = _AsyncWriter(writer, max_bytes=100)
+        async_writer.add_scalar('scalar', 1.0, 0)
+        async_writer.add_image('a', image, 0)
+        async_writer.add_image('a', image, 1)
+        async_writer.add_image('b', image, 1)
+        writer.released.set()
+        async_writer.close()
+
+    # the second image of 'a' replaces the first, and the one of 'b' does not fit
+    assert writer.calls == [('scalar', 0), ('a', 1)]
+    assert async_writer.dropped == 2
+
+
+def test_rate_limits():
+    extension = TensorBoard(rate_limits={'images/input': 3})
+    allowed = [iteration for iteration in range(1, 8) if extension._allow('train/images/input', iteration)]
+    assert allowed == [1, 4, 7]
+    assert extension._allow('train/scalar/loss', 2)
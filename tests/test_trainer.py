@@ -0,0 +1,42 @@
+from karas.training.extension import Extension
+from karas.training.triggers import IntervalTrigger
+
+
+class _Recorder(Extension):
+
+    def __init__(self):
+        self.iterations = []
+
+    def __call__(self, trainer):
+        self.iterations.append(trainer.iteration)
+
+
+class _PolledTrigger(object):
+    """Trigger without ``updates_until_fire``, polled on every iteration."""
+
+    def __init__(self, trigger):
+        self.trigger = trigger
+        self.polls = 0
+
+    def __call__(self, trainer):
+        self.polls += 1
+        return self.trigger(trainer)
+
+
+class _ScheduledTrigger(_PolledTrigger):
+
+    def updates_until_fire(self, trainer):
+        return self.trigger.updates_until_fire(trainer)
+
+
+def test_calendar_fires_as_polling(make_trainer):
+    trainer = make_trainer(stop=(3, 'epoch'))
+    polled, scheduled = _Recorder(), _Recorder()
+    polled_trigger = _PolledTrigger(IntervalTrigger(3, 'iteration'))
+    scheduled_trigger = _ScheduledTrigger(IntervalTrigger(3, 'iteration'))
+    trainer.extend(polled, name='polled', trigger=polled_trigger)
+    trainer.extend(scheduled, name='scheduled', trigger=scheduled_trigger)
+    trainer.run()
+    assert scheduled.iterations == polled.iterations
+    assert len(polled.iterations) > 5
+    assert scheduled_trigger.polls < polled_trigger.polls
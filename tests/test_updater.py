@@ -0,0 +1,41 @@
+import pytest
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from karas.reporter import Reporter
+from karas.training.updaters import StandardUpdater
+
+
+def _updater(model, **kwargs):
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+    updater = StandardUpdater(model, F.cross_entropy, device='cpu', optimizers={'net': optimizer}, **kwargs)
+    updater.reporter = Reporter()
+    return updater
+
+
+def test_autocast_keeps_float32_weights():
+    torch.manual_seed(0)
+    model = nn.Linear(8, 3)
+    before = model.weight.detach().clone()
+    updater = _updater(model, autocast=True)
+
+    with updater.reporter.scope('train'):
+        updater.update((torch.randn(16, 8), torch.randint(0, 3, (16,))))
+
+    assert model.weight.dtype == torch.float32
+    assert not torch.equal(model.weight, before)
+    loss = updater.reporter.observation['train/scalar/loss']
+    assert loss.dtype == torch.float32
+    assert torch.isfinite(loss)
+
+
+def test_autocast_rejects_reduced_precision_weights():
+    with pytest.raises(ValueError):
+        _updater(nn.Linear(8, 3).to(torch.bfloat16), autocast=True)
+
+
+def test_options_mismatch_warns():
+    state = _updater(nn.Linear(8, 3), autocast=True).state_dict()
+    with pytest.warns(UserWarning):
+        _updater(nn.Linear(8, 3)).load_state_dict(state)